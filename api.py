@@ -1,34 +1,98 @@
-from fastapi import FastAPI, HTTPException, Request, Query
+from fastapi import FastAPI, HTTPException, Request, Query, Path
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import uvicorn
 import logging
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Awaitable, AsyncIterator, List, Tuple, NamedTuple
 from functools import lru_cache
+from contextlib import asynccontextmanager
 import time
+import math
 
-from MoviesApi import HomeMoviesApi
-from gogoanime import search_anime, gogo_play, bsoup, base_url
-import requests
+from MoviesApi import AsyncHomeMoviesApi
+from gogoanime import search_anime_async, gogo_play_async, parse_details, parse_episode_servers, base_url
+import parsing
+from parsing import run_parse
+import upstream
+import httpx
+from cache import CacheEntry, CachedBody, content_hash, create_backend, dumps
+from config import settings
+from utils import SingleFlight, SingleFlightBusy, RateLimitMiddleware, rate_limiter, route_rate_limiters
+from models import BatchItem, BatchRequest, BatchItemResult, BatchResponse
+from warmer import CacheWarmer
+from catalog import CATALOGS, CatalogCrawler, CatalogIndex
+import metrics
+from metrics import CACHE_REQUESTS
+import tracing
+from tracing import span
+import re
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the pooled upstream client, cache sweeper, parse workers and catalog crawler on startup and stop them on shutdown"""
+    await upstream.start_client()
+    sweeper = asyncio.ensure_future(cache.run_sweeper(settings.CACHE_SWEEP_INTERVAL))
+    parsing.start_parse_pool(settings.PARSE_WORKERS)
+    warming = asyncio.ensure_future(warmer.run()) if settings.WARMER_ENABLED else None
+    crawling = asyncio.ensure_future(crawler.run()) if crawler else None
+    rate_sweepers = [
+        asyncio.ensure_future(limiter.run_sweeper(settings.RATE_LIMIT_SWEEP_INTERVAL))
+        for limiter in (rate_limiter, *route_rate_limiters.values())
+    ] if settings.RATE_LIMIT_ENABLED else []
+    yield
+    for task in rate_sweepers:
+        task.cancel()
+    if warming:
+        warming.cancel()
+    if crawling:
+        crawling.cancel()
+    parsing.shutdown_parse_pool()
+    sweeper.cancel()
+    await cache.close()
+    await upstream.close_client()
+
 # Initialize FastAPI with metadata
 app = FastAPI(
     title="Movies & Anime API",
     description="A comprehensive API for movies, TV shows, and anime content",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
+# Per-stage timings in a Server-Timing header; the route class marks when each endpoint returns
+if settings.TRACING_ENABLED:
+    app.router.route_class = tracing.TracedRoute
+    app.add_middleware(
+        tracing.TracingMiddleware,
+        sample_rate=settings.TRACE_LOG_SAMPLE_RATE,
+        slow_ms=settings.TRACE_LOG_SLOW_MS,
+    )
+
+# Per-client and per-route request limits
+if settings.RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware,
+        limiter=rate_limiter,
+        route_limiters=route_rate_limiters,
+        exempt=settings.RATE_LIMIT_EXEMPT,
+        trust_forwarded=settings.RATE_LIMIT_TRUST_FORWARDED,
+    )
+
 # Security middleware
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 
+# Request latency per route, exported at /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # CORS configuration
 origins = [
     "http://localhost:3000",
@@ -45,23 +109,226 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Simple in-memory cache
-cache = {}
-CACHE_TTL = 300  # 5 minutes
+# Response cache
+#
+# Entries are fresh for CACHE_TTL seconds. After that they are served stale while
+# a background refresh runs (CACHE_STALE_WHILE_REVALIDATE), and when the upstream
+# scrape fails they keep being served for CACHE_STALE_IF_ERROR seconds past expiry.
+# The backend holds each entry until the longer of those windows has passed, either
+# in this process or, with CACHE_BACKEND=redis/tiered, in a store shared by all workers.
+CACHE_TTL = settings.CACHE_TTL
+CACHE_RETENTION = CACHE_TTL + max(settings.CACHE_STALE_WHILE_REVALIDATE, settings.CACHE_STALE_IF_ERROR)
+cache = create_backend(CACHE_RETENTION)
+
+class CacheResult(NamedTuple):
+    data: Any
+    cached: bool
+    stale: bool = False
+    digest: Optional[str] = None  # content hash of the cache entry, None for fresh loads
+    age: float = 0.0
+    body: Optional[CachedBody] = None  # prepared response body of the cache entry
 
-def get_cached_data(key: str) -> Optional[Dict[Any, Any]]:
+async def get_cache_entry(key: str) -> Optional[CacheEntry]:
+    """Get an entry from cache, including stale entries still within their grace windows"""
+    with span("cache"):
+        return await cache.get_entry(key)
+
+async def get_cached_data(key: str) -> Optional[Dict[Any, Any]]:
     """Get data from cache if not expired"""
-    if key in cache:
-        data, timestamp = cache[key]
-        if time.time() - timestamp < CACHE_TTL:
-            return data
-        else:
-            del cache[key]
+    entry = await get_cache_entry(key)
+    if entry and entry.age < CACHE_TTL:
+        return entry.value
     return None
 
-def set_cache_data(key: str, data: Dict[Any, Any]) -> None:
+async def set_cache_data(key: str, data: Dict[Any, Any]) -> None:
     """Set data in cache with timestamp"""
-    cache[key] = (data, time.time())
+    with span("cache_write"):
+        await cache.set(key, data)
+
+# Concurrent misses for the same cache key share one upstream fetch
+inflight = SingleFlight(max_waiters=settings.SINGLEFLIGHT_MAX_WAITERS)
+_background_refreshes = set()
+
+def refresh_in_background(cache_key: str, load: Callable[[], Awaitable[Any]], route: str) -> None:
+    """Refresh a stale entry without making the current request wait"""
+    async def refresh():
+        try:
+            await inflight.do(cache_key, load, route)
+        except Exception as e:
+            logger.warning(f"Background refresh of {cache_key} failed: {str(e)}")
+    
+    if cache_key in inflight.calls:
+        return
+    task = asyncio.ensure_future(refresh())
+    _background_refreshes.add(task)
+    task.add_done_callback(_background_refreshes.discard)
+
+# Keys loaded from a single upstream page are refreshed conditionally: when the
+# page is unchanged (a 304, or the same bytes as last time) it is not parsed
+# again and the current entry only gets a new TTL.
+REVALIDATE_PREFIXES = tuple(settings.CACHE_REVALIDATE_PREFIXES)
+
+def storing(
+    cache_key: str, loader: Callable[[], Awaitable[Any]], current: Optional[CacheEntry] = None
+) -> Callable[[], Awaitable[Any]]:
+    """Wrap a loader so that what it loads is written to the cache
+
+    current is the entry being refreshed, kept when its upstream page has not changed.
+    """
+    if not cache_key.startswith(REVALIDATE_PREFIXES):
+        async def load():
+            data = await loader()
+            await set_cache_data(cache_key, data)
+            return data
+        return load
+    
+    async def revalidating_load():
+        conditional = current is not None and bool(current.value)
+        try:
+            with upstream.revalidation(conditional) as validators:
+                data = await loader()
+        except upstream.NotModified:
+            with span("cache_write"):
+                if not await cache.touch(cache_key):
+                    await cache.set(cache_key, current.value)
+            return current.value
+        await set_cache_data(cache_key, data)
+        # Only a page that parsed and was stored may count as unchanged next time
+        validators.commit()
+        return data
+    return revalidating_load
+
+async def get_or_fetch(cache_key: str, loader: Callable[[], Awaitable[Any]], route: str,
+                       count_hit: bool = True) -> CacheResult:
+    """Return cached, stale or freshly loaded data for a cache key, loading it at most once across concurrent requests
+
+    count_hit=False keeps bulk reads, such as catalog streams, out of the warmer's hot-key ranking.
+    """
+    if count_hit:
+        warmer.record_hit(cache_key)
+    
+    entry = await get_cache_entry(cache_key)
+    load = storing(cache_key, loader, entry)
+    if entry and entry.value:
+        age = entry.age
+        if age < CACHE_TTL:
+            CACHE_REQUESTS.inc(route, "hit")
+            return CacheResult(entry.value, True, digest=entry.digest, age=age, body=entry.body)
+        if age < CACHE_TTL + settings.CACHE_STALE_WHILE_REVALIDATE:
+            CACHE_REQUESTS.inc(route, "stale")
+            refresh_in_background(cache_key, load, route)
+            return CacheResult(entry.value, True, stale=True, digest=entry.digest, age=age)
+    
+    try:
+        result = CacheResult(await inflight.do(cache_key, load, route), False)
+        CACHE_REQUESTS.inc(route, "miss")
+        return result
+    except Exception as e:
+        if entry and entry.value and entry.age < CACHE_TTL + settings.CACHE_STALE_IF_ERROR:
+            CACHE_REQUESTS.inc(route, "stale_error")
+            logger.warning(f"Serving stale {cache_key} after upstream error: {str(e)}")
+            return CacheResult(entry.value, True, stale=True, digest=entry.digest, age=entry.age)
+        CACHE_REQUESTS.inc(route, "miss")
+        if isinstance(e, SingleFlightBusy):
+            raise HTTPException(status_code=503, detail=str(e))
+        if isinstance(e, upstream.UpstreamUnavailable):
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+        raise
+
+def build_response(result: CacheResult, **fresh_fields) -> Dict[str, Any]:
+    """Response body for a cache result; fresh_fields are only included for freshly loaded data"""
+    response = {"data": result.data, "cached": result.cached}
+    if result.stale:
+        response["stale"] = True
+    if not result.cached:
+        response.update(fresh_fields)
+    return response
+
+# Conditional GET and content negotiation
+#
+# A response body is a function of the cache entry, whether it was cached or
+# stale, the URL and the content coding, so the entry's content hash plus those
+# is a strong validator. Cache-Control tells clients and the CDN how long the
+# entry stays fresh here, and how long it may be served stale after that.
+#
+# A plain cache hit is sent straight from the entry's prepared body; every other
+# body is serialized here with orjson and sent uncompressed.
+ENCODING_PREFERENCE = ("br", "gzip")
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Dict[str, bytes]) -> Optional[str]:
+    """Preferred content coding that the client accepts and a body is available in, None for identity"""
+    if not accept_encoding or not available:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        params = params.strip()
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    for coding in ENCODING_PREFERENCE:
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+def cache_headers(result: CacheResult, encoding: Optional[str] = None) -> Dict[str, str]:
+    """ETag, Cache-Control and Vary headers for a cache result sent in a content coding"""
+    digest = result.digest or content_hash(dumps(result.data))
+    state = "s" if result.stale else "c" if result.cached else "f"
+    if encoding:
+        state += f"-{encoding}"
+    if result.stale:
+        max_age = 0
+        stale_for = max(int(CACHE_TTL + settings.CACHE_STALE_WHILE_REVALIDATE - result.age), 0)
+    else:
+        max_age = max(int(CACHE_TTL - result.age), 0)
+        stale_for = settings.CACHE_STALE_WHILE_REVALIDATE
+    return {
+        "ETag": f'"{digest}-{state}"',
+        "Cache-Control": (
+            f"public, max-age={max_age}, stale-while-revalidate={stale_for}, "
+            f"stale-if-error={settings.CACHE_STALE_IF_ERROR}"
+        ),
+        "Vary": "Accept-Encoding",
+    }
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag; weak validators compare equal to strong ones here"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+def cached_response(
+    request: Request, result: CacheResult, extra: Optional[Dict[str, Any]] = None, **fresh_fields
+) -> Response:
+    """Send a cache result with its validators, or an empty 304 when the client already holds it
+
+    extra fields go into every body, fresh_fields only into freshly loaded ones
+    (see build_response). Either keeps a hit from using the prepared body.
+    """
+    prepared = result.body if result.cached and not result.stale and not extra else None
+    encoding = None
+    if prepared is not None:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"), prepared.encoded)
+    headers = cache_headers(result, encoding)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    with span("serialize"):
+        if prepared is None:
+            content = dumps({**build_response(result, **fresh_fields), **(extra or {})})
+        elif encoding:
+            content = prepared.encoded[encoding]
+            headers["Content-Encoding"] = encoding
+        else:
+            content = prepared.identity
+    return Response(content, media_type="application/json", headers=headers)
 
 # Global exception handler
 @app.exception_handler(Exception)
@@ -83,250 +350,431 @@ async def root():
             "docs": "/docs",
             "movies": "/api/movies/{page}",
             "tv_shows": "/api/tv-shows/{page}",
+            "home": "/api/home",
+            "batch": "POST /api/batch",
+            "catalog_search": "/api/catalog/search?q={title}&year={year}&sort={sort}",
+            "metrics": "/metrics",
             "anime_search": "/search?name={anime_name}"
         }
     }
 
+# Catalog index
+#
+# Every catalog page parsed from upstream is also written to a local SQLite index,
+# which answers filtered, sorted and full-text queries over all pages seen so far
+# without contacting upstream.
+catalog_index = CatalogIndex(settings.CATALOG_INDEX_PATH) if settings.CATALOG_INDEX_ENABLED else None
+
+async def index_catalog_page(catalog: str, page: int, items: List[Dict[str, Any]]) -> None:
+    """Add the cards of a parsed catalog page to the index; failures are logged, never raised"""
+    if catalog_index is None:
+        return
+    try:
+        with span("catalog_index"):
+            await asyncio.to_thread(catalog_index.index_page, catalog, page, items)
+    except Exception as e:
+        logger.warning(f"Indexing {catalog} page {page} failed: {str(e)}")
+
+# Loaders: each fetches and parses one cacheable resource, raising HTTPException
+# when the upstream has nothing for it
+async def load_movies_page(page: int):
+    logger.info(f"Fetching movies page {page}")
+    movies_data = await AsyncHomeMoviesApi.Movies(page)
+    if not movies_data:
+        raise HTTPException(status_code=404, detail="No movies found for this page")
+    await index_catalog_page("movies", page, movies_data)
+    return movies_data
+
+async def load_tv_shows_page(page: int):
+    logger.info(f"Fetching TV shows page {page}")
+    tv_data = await AsyncHomeMoviesApi.TV(page)
+    if not tv_data:
+        raise HTTPException(status_code=404, detail="No TV shows found for this page")
+    await index_catalog_page("tv_shows", page, tv_data)
+    return tv_data
+
+async def load_top_imdb_movies_page(page: int):
+    logger.info(f"Fetching top IMDB movies page {page}")
+    imdb_movies = await AsyncHomeMoviesApi.TOPIMDBMOVIES(page)
+    if not imdb_movies:
+        raise HTTPException(status_code=404, detail="No top IMDB movies found for this page")
+    await index_catalog_page("top_imdb_movies", page, imdb_movies)
+    return imdb_movies
+
+async def load_top_imdb_tv_page(page: int):
+    logger.info(f"Fetching top IMDB TV shows page {page}")
+    imdb_tv = await AsyncHomeMoviesApi.TOPIMDBTV(page)
+    if not imdb_tv:
+        raise HTTPException(status_code=404, detail="No top IMDB TV shows found for this page")
+    await index_catalog_page("top_imdb_tv", page, imdb_tv)
+    return imdb_tv
+
+async def load_home_snapshot():
+    logger.info("Fetching homepage snapshot")
+    return await AsyncHomeMoviesApi.homepage()
+
+async def load_movie_details(movie_id: str):
+    logger.info(f"Fetching movie details for: {movie_id}")
+    movie_data = await AsyncHomeMoviesApi.moviesEpisode(movie_id=movie_id)
+    if not movie_data:
+        raise HTTPException(status_code=404, detail=f"Movie with ID '{movie_id}' not found")
+    return movie_data
+
+async def load_tv_details(tv_id: str):
+    logger.info(f"Fetching TV show details for: {tv_id}")
+    tv_data = await AsyncHomeMoviesApi.tvEpisode(tv_id=tv_id)
+    if not tv_data:
+        raise HTTPException(status_code=404, detail=f"TV show with ID '{tv_id}' not found")
+    return tv_data
+
+async def load_anime_search(name: str):
+    logger.info(f"Searching anime: {name}")
+    search_results = await search_anime_async(name)
+    if not search_results:
+        raise HTTPException(status_code=404, detail=f"No anime found for search term: {name}")
+    return search_results
+
+async def load_anime_details(slug: str):
+    logger.info(f"Fetching anime details for: {slug}")
+    details_url = f"{base_url}category/{slug}"
+    html = await upstream.fetch(details_url)
+    
+    if html.status_code != 200:
+        raise HTTPException(status_code=404, detail=f"Anime with slug '{slug}' not found")
+    
+    # Extract anime information with error handling
+    try:
+        data = await run_parse(parse_details, html.text)
+    except Exception as parse_error:
+        logger.error(f"Error parsing anime details for {slug}: {str(parse_error)}")
+        raise HTTPException(status_code=500, detail="Failed to parse anime information")
+    
+    if not data:
+        raise HTTPException(status_code=404, detail="Anime information not found")
+    
+    return data
+
+def with_episodes(details: Dict[str, Any], slug: str, host: str, offset: int, limit: int) -> Dict[str, Any]:
+    """Anime details with the episode count, link template and links for one range of episodes
+    
+    Links are built per response from the count, so the cached details stay the
+    same size however long the show runs and do not depend on the requesting host.
+    """
+    try:
+        ep_end = max(int(details.get("total_episodes")), 0)
+    except (ValueError, TypeError):
+        ep_end = 0
+    prefix = f"http://{host}/episode?slug={slug}&ep="
+    return {
+        **details,
+        "ep_end": ep_end,
+        "episode_url_template": prefix + "{ep}",
+        "episodes": [{f"episode_{ep}": f"{prefix}{ep}"} for ep in range(offset + 1, min(offset + limit, ep_end) + 1)],
+    }
+
+async def resolve_stream_link(index: int, data_video: str) -> Dict[str, Any]:
+    """Resolve one server's stream URL within the per-server timeout"""
+    stream_url = await asyncio.wait_for(gogo_play_async(data_video), timeout=settings.EPISODE_SERVER_TIMEOUT)
+    return {
+        "link": stream_url,
+        "server": f"Server_{index+1}" if index > 0 else "GGA",
+        "quality": "HD"  # Default quality
+    }
+
+async def resolve_stream_links(servers: List[str], min_links: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Resolve servers concurrently, returning once min_links have answered (or all have finished)"""
+    tasks = {
+        asyncio.ensure_future(resolve_stream_link(i, data_video)): i
+        for i, data_video in enumerate(servers) if data_video
+    }
+    resolved = {}
+    pending = set(tasks)
+    try:
+        while pending and (min_links is None or len(resolved) < min_links):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    resolved[tasks[task]] = task.result()
+                except Exception as link_error:
+                    logger.warning(f"Failed to process streaming link {tasks[task]}: {str(link_error) or type(link_error).__name__}")
+    finally:
+        for task in pending:
+            task.cancel()
+    # Keep the page's server order whatever order they answered in
+    return [resolved[i] for i in sorted(resolved)]
+
+async def load_episode_links(slug: str, ep: int, servers: Optional[int] = 3, min_links: Optional[int] = None):
+    """Load stream links from the first `servers` servers (all when None)"""
+    logger.info(f"Fetching episode links for: {slug} episode {ep}")
+    episode_url = f"{base_url}{slug}-episode-{ep}"
+    html = await upstream.fetch(episode_url)
+    
+    if html.status_code != 200:
+        raise HTTPException(status_code=404, detail=f"Episode {ep} not found for anime '{slug}'")
+    
+    links = await run_parse(parse_episode_servers, html.text)
+    
+    if links is None:
+        raise HTTPException(status_code=404, detail="No streaming links found for this episode")
+    
+    if not links:
+        raise HTTPException(status_code=404, detail="No streaming servers available")
+    
+    stream_links = await resolve_stream_links(links[:servers], min_links)
+    
+    if not stream_links:
+        raise HTTPException(status_code=404, detail="No valid streaming links found")
+    
+    return {
+        "anime_slug": slug,
+        "episode_number": ep,
+        "stream_links": stream_links,
+        "total_servers": len(stream_links)
+    }
+
+# Catalog streams
+#
+# Declared before the /{page} routes, which would otherwise take "stream" as a page.
+async def stream_catalog(catalog: str, first: int, last: int, concurrency: int) -> AsyncIterator[bytes]:
+    """NDJSON lines for the items of catalog pages first..last, written as each page is ready
+    
+    At most `concurrency` pages are fetched at once. When one finishes, the next
+    fetch starts before its items are written, so the window stays full, and
+    memory is bounded by the window plus the page being written rather than by
+    the range. Pages come out in completion order, each item as {"page", "data"};
+    a page that fails is one {"page", "status", "error"} line, and a final
+    "done" line sums up. Closing the stream cancels the fetches still
+    outstanding.
+    """
+    pages = iter(range(first, last + 1))
+    pending: Dict[asyncio.Future, int] = {}
+    items = errors = 0
+    
+    def start_next() -> None:
+        page = next(pages, None)
+        if page is None:
+            return
+        cache_key, loader, route = batch_target(BatchItem(type=catalog, page=page))
+        
+        def abandon(task: asyncio.Future) -> None:
+            # get_or_fetch shields the shared fetch; drop it too unless another request wants it
+            if task.cancelled():
+                inflight.cancel_abandoned(cache_key)
+        
+        task = asyncio.ensure_future(get_or_fetch(cache_key, loader, route, count_hit=False))
+        task.add_done_callback(abandon)
+        pending[task] = page
+    
+    try:
+        for _ in range(concurrency):
+            start_next()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page = pending.pop(task)
+                start_next()
+                try:
+                    result = task.result()
+                except HTTPException as e:
+                    errors += 1
+                    yield dumps({"page": page, "status": e.status_code, "error": str(e.detail)}) + b"\n"
+                    continue
+                except Exception as e:
+                    errors += 1
+                    status = 503 if isinstance(e, httpx.HTTPError) else 500
+                    logger.error(f"Error streaming {catalog} page {page}: {str(e)}")
+                    yield dumps({"page": page, "status": status, "error": str(e)}) + b"\n"
+                    continue
+                items += len(result.data)
+                yield b"".join(dumps({"page": page, "data": item}) + b"\n" for item in result.data)
+        yield dumps({"done": True, "pages": last - first + 1, "items": items, "errors": errors}) + b"\n"
+    finally:
+        for task in pending:
+            task.cancel()
+
+def catalog_stream(catalog: str, first: int, last: int, concurrency: int) -> StreamingResponse:
+    if last < first:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+    if last - first + 1 > settings.STREAM_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"A stream can cover at most {settings.STREAM_MAX_PAGES} pages")
+    return StreamingResponse(stream_catalog(catalog, first, last, concurrency), media_type="application/x-ndjson")
+
+FROM_PAGE = Query(1, alias="from", ge=1, description="First page")
+TO_PAGE = Query(..., alias="to", ge=1, description="Last page")
+STREAM_CONCURRENCY = Query(
+    settings.STREAM_CONCURRENCY, ge=1, le=settings.STREAM_MAX_CONCURRENCY, description="Pages fetched at once"
+)
+
+@app.get('/api/movies/stream')
+async def stream_movies(first: int = FROM_PAGE, last: int = TO_PAGE, concurrency: int = STREAM_CONCURRENCY):
+    """Stream the movies of a range of catalog pages as NDJSON"""
+    return catalog_stream("movies", first, last, concurrency)
+
+@app.get('/api/tv-shows/stream')
+async def stream_tv_shows(first: int = FROM_PAGE, last: int = TO_PAGE, concurrency: int = STREAM_CONCURRENCY):
+    """Stream the TV shows of a range of catalog pages as NDJSON"""
+    return catalog_stream("tv_shows", first, last, concurrency)
+
+@app.get('/api/top-imdb/movies/stream')
+async def stream_top_imdb_movies(first: int = FROM_PAGE, last: int = TO_PAGE, concurrency: int = STREAM_CONCURRENCY):
+    """Stream the top IMDB rated movies of a range of pages as NDJSON"""
+    return catalog_stream("top_imdb_movies", first, last, concurrency)
+
+@app.get('/api/top-imdb/tv-shows/stream')
+async def stream_top_imdb_tv(first: int = FROM_PAGE, last: int = TO_PAGE, concurrency: int = STREAM_CONCURRENCY):
+    """Stream the top IMDB rated TV shows of a range of pages as NDJSON"""
+    return catalog_stream("top_imdb_tv", first, last, concurrency)
+
 @app.get('/api/movies/{page}')
-async def get_movies(page: int = Query(..., ge=1, description="Page number (minimum 1)")):
+async def get_movies(request: Request, page: int = Path(..., ge=1, description="Page number (minimum 1)")):
     """Get paginated movies list with caching"""
     try:
-        cache_key = f"movies_page_{page}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(f"movies_page_{page}", lambda: load_movies_page(page), "movies")
+        if result.cached:
             logger.info(f"Cache hit for movies page {page}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching movies page {page}")
-        movies_data = HomeMoviesApi.Movies(page)
-        
-        if not movies_data:
-            raise HTTPException(status_code=404, detail="No movies found for this page")
-        
-        set_cache_data(cache_key, movies_data)
-        return {"data": movies_data, "cached": False, "page": page}
+        return cached_response(request, result, page=page)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching movies page {page}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch movies: {str(e)}")
 
 @app.get('/api/tv-shows/{page}')
-async def get_tv_shows(page: int = Query(..., ge=1, description="Page number (minimum 1)")):
+async def get_tv_shows(request: Request, page: int = Path(..., ge=1, description="Page number (minimum 1)")):
     """Get paginated TV shows list with caching"""
     try:
-        cache_key = f"tv_shows_page_{page}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(f"tv_shows_page_{page}", lambda: load_tv_shows_page(page), "tv_shows")
+        if result.cached:
             logger.info(f"Cache hit for TV shows page {page}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching TV shows page {page}")
-        tv_data = HomeMoviesApi.TV(page)
-        
-        if not tv_data:
-            raise HTTPException(status_code=404, detail="No TV shows found for this page")
-        
-        set_cache_data(cache_key, tv_data)
-        return {"data": tv_data, "cached": False, "page": page}
+        return cached_response(request, result, page=page)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching TV shows page {page}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch TV shows: {str(e)}")
 
 @app.get('/api/top-imdb/movies/{page}')
-async def get_top_imdb_movies(page: int = Query(..., ge=1, description="Page number (minimum 1)")):
+async def get_top_imdb_movies(request: Request, page: int = Path(..., ge=1, description="Page number (minimum 1)")):
     """Get top IMDB rated movies with caching"""
     try:
-        cache_key = f"top_imdb_movies_page_{page}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(
+            f"top_imdb_movies_page_{page}", lambda: load_top_imdb_movies_page(page), "top_imdb_movies"
+        )
+        if result.cached:
             logger.info(f"Cache hit for top IMDB movies page {page}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching top IMDB movies page {page}")
-        imdb_movies = HomeMoviesApi.TOPIMDBMOVIES(page)
-        
-        if not imdb_movies:
-            raise HTTPException(status_code=404, detail="No top IMDB movies found for this page")
-        
-        set_cache_data(cache_key, imdb_movies)
-        return {"data": imdb_movies, "cached": False, "page": page}
+        return cached_response(request, result, page=page)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching top IMDB movies page {page}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch top IMDB movies: {str(e)}")
 
 @app.get('/api/top-imdb/tv-shows/{page}')
-async def get_top_imdb_tv(page: int = Query(..., ge=1, description="Page number (minimum 1)")):
+async def get_top_imdb_tv(request: Request, page: int = Path(..., ge=1, description="Page number (minimum 1)")):
     """Get top IMDB rated TV shows with caching"""
     try:
-        cache_key = f"top_imdb_tv_page_{page}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(
+            f"top_imdb_tv_page_{page}", lambda: load_top_imdb_tv_page(page), "top_imdb_tv"
+        )
+        if result.cached:
             logger.info(f"Cache hit for top IMDB TV shows page {page}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching top IMDB TV shows page {page}")
-        imdb_tv = HomeMoviesApi.TOPIMDBTV(page)
-        
-        if not imdb_tv:
-            raise HTTPException(status_code=404, detail="No top IMDB TV shows found for this page")
-        
-        set_cache_data(cache_key, imdb_tv)
-        return {"data": imdb_tv, "cached": False, "page": page}
+        return cached_response(request, result, page=page)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching top IMDB TV shows page {page}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch top IMDB TV shows: {str(e)}")
 
 
 
-@app.get('/api/trending_movies')
-async def get_trending_movies():
-    """Get trending movies with caching"""
+# Homepage snapshot: one fetch and parse of the homepage feeds every section route
+HOME_SNAPSHOT_KEY = "home_snapshot"
+
+async def get_home_snapshot() -> CacheResult:
+    """Return the cache result holding the homepage snapshot"""
+    return await get_or_fetch(HOME_SNAPSHOT_KEY, load_home_snapshot, "home")
+
+async def home_section(request: Request, section: str, label: str) -> Response:
+    """Serve one homepage section from the snapshot"""
     try:
-        cache_key = "trending_movies"
-        cached_data = get_cached_data(cache_key)
+        result = await get_home_snapshot()
+        if result.cached:
+            logger.info(f"Cache hit for {label}")
         
-        if cached_data:
-            logger.info("Cache hit for trending movies")
-            return {"data": cached_data, "cached": True}
+        section_data = result.data.get(section)
+        if not section_data:
+            raise HTTPException(status_code=404, detail=f"No {label} found")
         
-        logger.info("Fetching trending movies")
-        trending_data = HomeMoviesApi.trendingMovies(None)
-        
-        if not trending_data:
-            raise HTTPException(status_code=404, detail="No trending movies found")
-        
-        set_cache_data(cache_key, trending_data)
-        return {"data": trending_data, "cached": False}
+        return cached_response(request, result._replace(data=section_data, body=None))
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching trending movies: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch trending movies: {str(e)}")
+        logger.error(f"Error fetching {label}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch {label}: {str(e)}")
 
-@app.get('/api/trending_tv')
-async def get_trending_tv():
-    """Get trending TV shows with caching"""
+@app.get('/api/home')
+async def get_home(request: Request):
+    """Get every homepage section in one response"""
     try:
-        cache_key = "trending_tv"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
-            logger.info("Cache hit for trending TV shows")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info("Fetching trending TV shows")
-        trending_data = HomeMoviesApi.trendingTV(None)
-        
-        if not trending_data:
-            raise HTTPException(status_code=404, detail="No trending TV shows found")
-        
-        set_cache_data(cache_key, trending_data)
-        return {"data": trending_data, "cached": False}
+        result = await get_home_snapshot()
+        if not any(result.data.values()):
+            raise HTTPException(status_code=404, detail="No homepage sections found")
+        return cached_response(request, result)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching trending TV shows: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch trending TV shows: {str(e)}")
+        logger.error(f"Error fetching homepage: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch homepage: {str(e)}")
+
+@app.get('/api/trending_movies')
+async def get_trending_movies(request: Request):
+    """Get trending movies with caching"""
+    return await home_section(request, "trending_movies", "trending movies")
+
+@app.get('/api/trending_tv')
+async def get_trending_tv(request: Request):
+    """Get trending TV shows with caching"""
+    return await home_section(request, "trending_tv", "trending TV shows")
 
 @app.get('/api/popular_movies')
-async def get_popular_movies():
+async def get_popular_movies(request: Request):
     """Get popular movies with caching"""
-    try:
-        cache_key = "popular_movies"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
-            logger.info("Cache hit for popular movies")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info("Fetching popular movies")
-        popular_data = HomeMoviesApi.popularMovies(None)
-        
-        if not popular_data:
-            raise HTTPException(status_code=404, detail="No popular movies found")
-        
-        set_cache_data(cache_key, popular_data)
-        return {"data": popular_data, "cached": False}
-        
-    except Exception as e:
-        logger.error(f"Error fetching popular movies: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch popular movies: {str(e)}")
+    return await home_section(request, "popular_movies", "popular movies")
 
 @app.get('/api/popular_tv')
-async def get_popular_tv():
+async def get_popular_tv(request: Request):
     """Get popular TV shows with caching"""
-    try:
-        cache_key = "popular_tv"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
-            logger.info("Cache hit for popular TV shows")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info("Fetching popular TV shows")
-        popular_data = HomeMoviesApi.popularTV(None)
-        
-        if not popular_data:
-            raise HTTPException(status_code=404, detail="No popular TV shows found")
-        
-        set_cache_data(cache_key, popular_data)
-        return {"data": popular_data, "cached": False}
-        
-    except Exception as e:
-        logger.error(f"Error fetching popular TV shows: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch popular TV shows: {str(e)}")
+    return await home_section(request, "popular_tv", "popular TV shows")
 
 @app.get('/api/latest_movies')
-async def get_latest_movies():
+async def get_latest_movies(request: Request):
     """Get latest movies with caching"""
-    try:
-        cache_key = "latest_movies"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
-            logger.info("Cache hit for latest movies")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info("Fetching latest movies")
-        latest_data = HomeMoviesApi.latestMovies(None)
-        
-        if not latest_data:
-            raise HTTPException(status_code=404, detail="No latest movies found")
-        
-        set_cache_data(cache_key, latest_data)
-        return {"data": latest_data, "cached": False}
-        
-    except Exception as e:
-        logger.error(f"Error fetching latest movies: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to fetch latest movies: {str(e)}")
+    return await home_section(request, "latest_movies", "latest movies")
+
+@app.get('/api/latest_tv')
+async def get_latest_tv(request: Request):
+    """Get latest TV shows with caching"""
+    return await home_section(request, "latest_tv", "latest TV shows")
 
 @app.get('/api/movie/{movie_id}')
-async def get_movie_details(movie_id: str):
+async def get_movie_details(movie_id: str, request: Request):
     """Get detailed movie information with caching"""
     try:
         if not movie_id or len(movie_id.strip()) == 0:
             raise HTTPException(status_code=400, detail="Movie ID is required")
         
-        cache_key = f"movie_details_{movie_id}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(
+            f"movie_details_{movie_id}", lambda: load_movie_details(movie_id), "movie_details"
+        )
+        if result.cached:
             logger.info(f"Cache hit for movie details: {movie_id}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching movie details for: {movie_id}")
-        movie_data = HomeMoviesApi.moviesEpisode(movie_id=movie_id)
-        
-        if not movie_data:
-            raise HTTPException(status_code=404, detail=f"Movie with ID '{movie_id}' not found")
-        
-        set_cache_data(cache_key, movie_data)
-        return {"data": movie_data, "cached": False, "movie_id": movie_id}
+        return cached_response(request, result, movie_id=movie_id)
         
     except HTTPException:
         raise
@@ -335,55 +783,38 @@ async def get_movie_details(movie_id: str):
         raise HTTPException(status_code=500, detail=f"Failed to fetch movie details: {str(e)}")
 
 @app.get('/api/tv/{tv_id}')
-async def get_tv_details(tv_id: str):
+async def get_tv_details(tv_id: str, request: Request):
     """Get detailed TV show information with caching"""
     try:
         if not tv_id or len(tv_id.strip()) == 0:
             raise HTTPException(status_code=400, detail="TV show ID is required")
         
-        cache_key = f"tv_details_{tv_id}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(
+            f"tv_details_{tv_id}", lambda: load_tv_details(tv_id), "tv_details"
+        )
+        if result.cached:
             logger.info(f"Cache hit for TV show details: {tv_id}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching TV show details for: {tv_id}")
-        tv_data = HomeMoviesApi.tvEpisode(tv_id=tv_id)
-        
-        if not tv_data:
-            raise HTTPException(status_code=404, detail=f"TV show with ID '{tv_id}' not found")
-        
-        set_cache_data(cache_key, tv_data)
-        return {"data": tv_data, "cached": False, "tv_id": tv_id}
+        return cached_response(request, result, tv_id=tv_id)
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching TV show details for {tv_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch TV show details: {str(e)}")
+
 @app.get('/search')
-async def search_anime_endpoint(name: str = Query(..., min_length=1, description="Anime name to search for")):
+async def search_anime_endpoint(request: Request, name: str = Query(..., min_length=1, description="Anime name to search for")):
     """Search for anime with caching and validation"""
     try:
         if not name or len(name.strip()) == 0:
             raise HTTPException(status_code=400, detail="Search name is required")
         
-        cache_key = f"anime_search_{name.lower().strip()}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(
+            f"anime_search_{name.lower().strip()}", lambda: load_anime_search(name), "anime_search"
+        )
+        if result.cached:
             logger.info(f"Cache hit for anime search: {name}")
-            return {"data": cached_data, "cached": True, "query": name}
-        
-        logger.info(f"Searching anime: {name}")
-        search_results = search_anime(name)
-        
-        if not search_results:
-            raise HTTPException(status_code=404, detail=f"No anime found for search term: {name}")
-        
-        set_cache_data(cache_key, search_results)
-        return {"data": search_results, "cached": False, "query": name, "count": len(search_results)}
+        return cached_response(request, result, {"query": name}, count=len(result.data))
         
     except HTTPException:
         raise
@@ -392,84 +823,28 @@ async def search_anime_endpoint(name: str = Query(..., min_length=1, description
         raise HTTPException(status_code=500, detail=f"Failed to search anime: {str(e)}")
 
 @app.get('/details')
-async def get_anime_details(slug: str = Query(..., min_length=1, description="Anime slug identifier"), request: Request = None):
-    """Get detailed anime information with caching and error handling"""
+async def get_anime_details(
+    request: Request,
+    slug: str = Query(..., min_length=1, description="Anime slug identifier"),
+    offset: int = Query(0, ge=0, description="Episodes to skip before the listed ones"),
+    limit: int = Query(
+        settings.DETAILS_EPISODE_LIMIT, ge=1, le=settings.DETAILS_EPISODE_MAX_LIMIT, description="Episodes to list"
+    )
+):
+    """Get detailed anime information and one range of episode links with caching and error handling"""
     try:
         if not slug or len(slug.strip()) == 0:
             raise HTTPException(status_code=400, detail="Anime slug is required")
         
-        cache_key = f"anime_details_{slug}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        result = await get_or_fetch(f"anime_details_{slug}", lambda: load_anime_details(slug), "anime_details")
+        if result.cached:
             logger.info(f"Cache hit for anime details: {slug}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching anime details for: {slug}")
-        details_url = f"{base_url}category/{slug}"
-        html = requests.get(details_url, timeout=10)
-        
-        if html.status_code != 200:
-            raise HTTPException(status_code=404, detail=f"Anime with slug '{slug}' not found")
-        
-        soup = bsoup(html.text)
-        
-        # Extract anime information with error handling
-        try:
-            anime_info = soup.find('div', attrs={"class": "anime_info_body_bg"})
-            if not anime_info:
-                raise HTTPException(status_code=404, detail="Anime information not found")
-            
-            title = anime_info.h1.text if anime_info.h1 else "Unknown Title"
-            thumbnail = anime_info.img.get('src') if anime_info.img else ""
-            
-            episode_page = soup.find('ul', attrs={"id": "episode_page"})
-            ep_end = episode_page.find('li').a.get("ep_end") if episode_page else "1"
-            
-            desc_info = anime_info.find_all('p', attrs={"class": "type"})
-            
-            # Safely extract information with defaults
-            anime_type = desc_info[0].text.replace('\n', '').strip().replace('Type: ', '') if len(desc_info) > 0 else "Unknown"
-            desc = desc_info[1].text.replace('\n', '').strip().replace('Plot Summary: ', '') if len(desc_info) > 1 else "No description available"
-            genre = desc_info[2].text.replace('\n', '').strip().replace('Genre: ', '') if len(desc_info) > 2 else "Unknown"
-            released = desc_info[3].text.replace('\n', '').strip().replace('Released: ', '') if len(desc_info) > 3 else "Unknown"
-            status = desc_info[4].text.replace('\n', '').strip().replace('Status: ', '') if len(desc_info) > 4 else "Unknown"
-            other_name = desc_info[5].text.replace('\n', '').strip().replace('Other name: ', '') if len(desc_info) > 5 else ""
-            
-            # Generate episode links
-            episodes = []
-            try:
-                ep_count = int(ep_end)
-                base_host = request.url.hostname if request else "localhost:8080"
-                episodes = [{
-                    f'episode_{x}': f"http://{base_host}/episode?slug={slug}&ep={x}"
-                } for x in range(1, min(ep_count + 1, 1000))]  # Limit to 1000 episodes max
-            except (ValueError, TypeError):
-                episodes = []
-            
-            data = {
-                "title": title,
-                "thumbnail": thumbnail,
-                "type": anime_type,
-                "summary": desc,
-                "genre": genre,
-                "release_year": released,
-                "status": status,
-                "other_name": other_name,
-                "total_episodes": ep_end,
-                "episodes": episodes
-            }
-            
-            set_cache_data(cache_key, data)
-            return {"data": data, "cached": False, "slug": slug}
-            
-        except Exception as parse_error:
-            logger.error(f"Error parsing anime details for {slug}: {str(parse_error)}")
-            raise HTTPException(status_code=500, detail="Failed to parse anime information")
+        details = with_episodes(result.data, slug, request.url.hostname, offset, limit)
+        return cached_response(request, result._replace(data=details, body=None), slug=slug)
         
     except HTTPException:
         raise
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Network error fetching anime details for {slug}: {str(e)}")
         raise HTTPException(status_code=503, detail="Service temporarily unavailable")
     except Exception as e:
@@ -478,73 +853,227 @@ async def get_anime_details(slug: str = Query(..., min_length=1, description="An
 
 @app.get('/episode')
 async def get_episode_links(
+    request: Request,
     slug: str = Query(..., min_length=1, description="Anime slug identifier"),
-    ep: int = Query(..., ge=1, description="Episode number (minimum 1)")
+    ep: int = Query(..., ge=1, description="Episode number (minimum 1)"),
+    servers: str = Query("3", pattern=r"^(all|[1-9][0-9]*)$", description="Number of servers to resolve, or 'all'"),
+    min_links: Optional[int] = Query(None, ge=1, description="Return as soon as this many servers have answered")
 ):
     """Get streaming links for specific anime episode with caching"""
     try:
+        server_count = None if servers == "all" else int(servers)
         cache_key = f"episode_{slug}_{ep}"
-        cached_data = get_cached_data(cache_key)
-        
-        if cached_data:
+        if servers != "3" or min_links:
+            cache_key += f"_{servers}_{min_links or 0}"
+        result = await get_or_fetch(
+            cache_key, lambda: load_episode_links(slug, ep, server_count, min_links), "episode"
+        )
+        if result.cached:
             logger.info(f"Cache hit for episode: {slug} ep {ep}")
-            return {"data": cached_data, "cached": True}
-        
-        logger.info(f"Fetching episode links for: {slug} episode {ep}")
-        episode_url = f"{base_url}{slug}-episode-{ep}"
-        html = requests.get(episode_url, timeout=10)
-        
-        if html.status_code != 200:
-            raise HTTPException(status_code=404, detail=f"Episode {ep} not found for anime '{slug}'")
-        
-        soup = bsoup(html.text)
-        links_div = soup.find('div', attrs={"class": "anime_muti_link"})
-        
-        if not links_div:
-            raise HTTPException(status_code=404, detail="No streaming links found for this episode")
-        
-        links = links_div.find_all('a')
-        if not links:
-            raise HTTPException(status_code=404, detail="No streaming servers available")
-        
-        stream_links = []
-        for i, link in enumerate(links[:3]):  # Limit to first 3 servers
-            try:
-                data_video = link.get('data-video')
-                if data_video:
-                    stream_url = gogo_play(data_video)
-                    server_name = f"Server_{i+1}" if i > 0 else "GGA"
-                    stream_links.append({
-                        "link": stream_url,
-                        "server": server_name,
-                        "quality": "HD"  # Default quality
-                    })
-            except Exception as link_error:
-                logger.warning(f"Failed to process streaming link {i}: {str(link_error)}")
-                continue
-        
-        if not stream_links:
-            raise HTTPException(status_code=404, detail="No valid streaming links found")
-        
-        response_data = {
-            "anime_slug": slug,
-            "episode_number": ep,
-            "stream_links": stream_links,
-            "total_servers": len(stream_links)
-        }
-        
-        set_cache_data(cache_key, response_data)
-        return {"data": response_data, "cached": False}
+        return cached_response(request, result)
         
     except HTTPException:
         raise
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Network error fetching episode {ep} for {slug}: {str(e)}")
         raise HTTPException(status_code=503, detail="Service temporarily unavailable")
     except Exception as e:
         logger.error(f"Error fetching episode {ep} for {slug}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch episode links: {str(e)}")
 
+# Batch lookups
+def batch_target(item: BatchItem) -> Tuple[str, Callable[[], Awaitable[Any]], str]:
+    """Cache key, loader and route label of the endpoint a batch item stands for"""
+    if item.type == "movies":
+        return f"movies_page_{item.page}", lambda: load_movies_page(item.page), "movies"
+    if item.type == "tv_shows":
+        return f"tv_shows_page_{item.page}", lambda: load_tv_shows_page(item.page), "tv_shows"
+    if item.type == "top_imdb_movies":
+        return f"top_imdb_movies_page_{item.page}", lambda: load_top_imdb_movies_page(item.page), "top_imdb_movies"
+    if item.type == "top_imdb_tv":
+        return f"top_imdb_tv_page_{item.page}", lambda: load_top_imdb_tv_page(item.page), "top_imdb_tv"
+    if item.type == "movie":
+        return f"movie_details_{item.id}", lambda: load_movie_details(item.id), "movie_details"
+    if item.type == "tv":
+        return f"tv_details_{item.id}", lambda: load_tv_details(item.id), "tv_details"
+    if item.type == "home":
+        return HOME_SNAPSHOT_KEY, load_home_snapshot, "home"
+    if item.type == "anime_search":
+        return f"anime_search_{item.name.lower().strip()}", lambda: load_anime_search(item.name), "anime_search"
+    if item.type == "anime_details":
+        return f"anime_details_{item.slug}", lambda: load_anime_details(item.slug), "anime_details"
+    return f"episode_{item.slug}_{item.ep}", lambda: load_episode_links(item.slug, item.ep), "episode"
+
+@app.post('/api/batch', response_model=BatchResponse, response_model_exclude_none=True)
+async def batch_lookup(batch: BatchRequest, request: Request):
+    """Run several lookups in one round trip, sharing the cache and in-flight fetches of the single endpoints"""
+    if len(batch.requests) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch can hold at most {settings.BATCH_MAX_ITEMS} requests")
+    
+    # Only upstream loads take a slot, so cache hits never queue behind scrapes
+    upstream_slots = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+    base_host = request.url.hostname
+    
+    async def run(item: BatchItem) -> BatchItemResult:
+        cache_key, loader, route = batch_target(item)
+        
+        async def bounded_load():
+            async with upstream_slots:
+                return await loader()
+        
+        try:
+            result = await get_or_fetch(cache_key, bounded_load, route)
+        except HTTPException as e:
+            return BatchItemResult(type=item.type, status=e.status_code, error=str(e.detail))
+        except httpx.HTTPError as e:
+            logger.error(f"Network error in batch item {cache_key}: {str(e)}")
+            return BatchItemResult(type=item.type, status=503, error="Service temporarily unavailable")
+        except Exception as e:
+            logger.error(f"Error in batch item {cache_key}: {str(e)}")
+            return BatchItemResult(type=item.type, status=500, error=str(e))
+        data = result.data
+        if item.type == "anime_details":
+            data = with_episodes(data, item.slug, base_host, 0, settings.DETAILS_EPISODE_LIMIT)
+        return BatchItemResult(
+            type=item.type, status=200, data=data, cached=result.cached, stale=result.stale or None
+        )
+    
+    results = await asyncio.gather(*[run(item) for item in batch.requests])
+    succeeded = sum(1 for r in results if r.status == 200)
+    return BatchResponse(results=results, succeeded=succeeded, failed=len(results) - succeeded)
+
+# Cache warming
+#
+# Hot keys are refreshed through the same loaders as their endpoints. Keys are
+# mapped back to a batch item.
+WARMABLE_KEYS = [
+    (re.compile(r"^movies_page_(\d+)$"), lambda m: BatchItem(type="movies", page=int(m[1]))),
+    (re.compile(r"^tv_shows_page_(\d+)$"), lambda m: BatchItem(type="tv_shows", page=int(m[1]))),
+    (re.compile(r"^top_imdb_movies_page_(\d+)$"), lambda m: BatchItem(type="top_imdb_movies", page=int(m[1]))),
+    (re.compile(r"^top_imdb_tv_page_(\d+)$"), lambda m: BatchItem(type="top_imdb_tv", page=int(m[1]))),
+    (re.compile(r"^movie_details_(.+)$"), lambda m: BatchItem(type="movie", id=m[1])),
+    (re.compile(r"^tv_details_(.+)$"), lambda m: BatchItem(type="tv", id=m[1])),
+    (re.compile(r"^home_snapshot$"), lambda m: BatchItem(type="home")),
+    (re.compile(r"^anime_search_(.+)$"), lambda m: BatchItem(type="anime_search", name=m[1])),
+    (re.compile(r"^anime_details_(.+)$"), lambda m: BatchItem(type="anime_details", slug=m[1])),
+    (re.compile(r"^episode_([^_]+)_(\d+)$"), lambda m: BatchItem(type="episode", slug=m[1], ep=int(m[2]))),
+]
+
+def item_for_key(cache_key: str) -> Optional[BatchItem]:
+    """The lookup that fills a cache key, or None if the key cannot be warmed"""
+    for pattern, item in WARMABLE_KEYS:
+        match = pattern.match(cache_key)
+        if match:
+            return item(match)
+    return None
+
+async def warm_key(cache_key: str) -> None:
+    _, loader, route = batch_target(item_for_key(cache_key))
+    await inflight.do(cache_key, storing(cache_key, loader, await cache.get_entry(cache_key)), route)
+
+async def cache_age(cache_key: str) -> Optional[float]:
+    entry = await cache.get_entry(cache_key)
+    return entry.age if entry else None
+
+warmer = CacheWarmer(
+    refresh=warm_key,
+    age_of=cache_age,
+    accepts=lambda key: item_for_key(key) is not None,
+    ttl=CACHE_TTL,
+    keys=settings.WARMER_KEYS,
+    max_keys=settings.WARMER_MAX_KEYS,
+    refresh_ahead=settings.WARMER_REFRESH_AHEAD,
+    interval=settings.WARMER_INTERVAL,
+    concurrency=settings.WARMER_CONCURRENCY,
+    spacing=settings.WARMER_SPACING,
+    max_backoff=settings.WARMER_MAX_BACKOFF,
+    max_failures=settings.WARMER_MAX_FAILURES,
+)
+
+@app.get('/api/warmer/stats')
+async def warmer_stats():
+    """Hot keys, their hit counts and the latest refreshes of the cache warmer"""
+    return {
+        "enabled": settings.WARMER_ENABLED,
+        **warmer.stats(),
+        "timestamp": time.time()
+    }
+
+# Catalog search
+#
+# The crawler walks the catalogs through the response cache, so pages that are
+# still fresh are indexed from memory and only expired pages are fetched again,
+# conditionally.
+async def crawl_catalog_page(catalog: str, page: int) -> Optional[int]:
+    """Index one catalog page, returning its item count, or None past the last page"""
+    cache_key, loader, route = batch_target(BatchItem(type=catalog, page=page))
+    entry = await cache.get_entry(cache_key)
+    if entry and entry.value and entry.age < CACHE_TTL:
+        data = entry.value
+    else:
+        try:
+            data = await inflight.do(cache_key, storing(cache_key, loader, entry), route)
+        except HTTPException as e:
+            if e.status_code == 404:
+                return None
+            raise
+    await index_catalog_page(catalog, page, data)
+    return len(data)
+
+async def prune_catalog(older_than: float) -> int:
+    return await asyncio.to_thread(catalog_index.prune, older_than)
+
+crawler = CatalogCrawler(
+    crawl=crawl_catalog_page,
+    prune=prune_catalog,
+    max_pages=settings.CATALOG_CRAWL_PAGES,
+    interval=settings.CATALOG_CRAWL_INTERVAL,
+    spacing=settings.CATALOG_CRAWL_SPACING,
+    max_age=settings.CATALOG_INDEX_MAX_AGE,
+) if catalog_index is not None and settings.CATALOG_CRAWL_ENABLED else None
+
+@app.get('/api/catalog/search')
+async def search_catalog(
+    q: Optional[str] = Query(None, description="Words the title must contain"),
+    catalog: Optional[str] = Query(None, description=f"Only items listed in this catalog: {', '.join(CATALOGS)}"),
+    type: Optional[str] = Query(None, description="Card type, e.g. Movie or TV"),
+    year: Optional[int] = Query(None, description="Release year"),
+    year_from: Optional[int] = Query(None, description="Earliest release year"),
+    year_to: Optional[int] = Query(None, description="Latest release year"),
+    sort: Optional[str] = Query(
+        None, description="title, year or duration (prefix - for descending), relevance or position (catalog order)"
+    ),
+    limit: int = Query(20, ge=1, le=settings.CATALOG_SEARCH_MAX_LIMIT, description="Items to return"),
+    offset: int = Query(0, ge=0, description="Items to skip"),
+):
+    """Filter, sort and search every catalog item indexed so far, without upstream requests"""
+    if catalog_index is None:
+        raise HTTPException(status_code=404, detail="The catalog index is disabled")
+    started = time.perf_counter()
+    try:
+        total, items = await asyncio.to_thread(
+            catalog_index.search, q, catalog, type, year, year_from, year_to, sort, limit, offset
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(dumps({
+        "data": items,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2),
+    }), media_type="application/json")
+
+@app.get('/api/catalog/stats')
+async def catalog_stats():
+    """Size of the catalog index and progress of the background crawler"""
+    return {
+        "enabled": catalog_index is not None,
+        "index": await asyncio.to_thread(catalog_index.stats) if catalog_index else None,
+        "crawler": crawler.stats() if crawler else None,
+        "timestamp": time.time()
+    }
+
 # Additional utility endpoints
 @app.get('/api/health')
 async def health_check():
@@ -552,16 +1081,38 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": time.time(),
-        "cache_size": len(cache),
+        "cache_size": await cache.size(),
+        "cache": await cache.stats(),
+        "coalesced_requests": inflight.stats(),
+        "parse_pool": parsing.parse_pool_stats(),
+        "rate_limit": {
+            "enabled": settings.RATE_LIMIT_ENABLED,
+            **rate_limiter.stats(),
+            "routes": {prefix: limiter.stats() for prefix, limiter in route_rate_limiters.items()},
+        },
         "version": "2.0.0"
     }
 
+@app.get('/metrics', include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get('/api/upstream/stats')
+async def upstream_stats():
+    """Upstream connection pool statistics"""
+    return {
+        "pool": upstream.client_stats(),
+        "timestamp": time.time()
+    }
+
 @app.get('/api/cache/clear')
 async def clear_cache():
     """Clear all cached data (admin endpoint)"""
     global cache
-    cache_size = len(cache)
-    cache.clear()
+    cache_size = await cache.clear()
     logger.info(f"Cache cleared, removed {cache_size} entries")
     return {
         "message": f"Cache cleared successfully",
@@ -0,0 +1,66 @@
+"""
+Microbenchmark: CacheEngine against the previous dict-scan CacheManager
+
+Usage: python benchmarks/bench_cache.py [entries]
+"""
+import os
+import sys
+import time
+from typing import Any, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import CacheEngine  # noqa: E402
+
+PAYLOAD = [{"title": "Movie", "id": "12345", "poster": "https://img.example/poster.jpg", "year": "2021"}]
+
+
+class LegacyCacheManager:
+    """The CacheManager this engine replaced: full scan for the oldest key on every insert when full"""
+
+    def __init__(self, ttl: int = 300, max_size: int = 1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache = {}
+
+    def get(self, key: str) -> Optional[Any]:
+        if key in self.cache:
+            data, timestamp = self.cache[key]
+            if time.time() - timestamp < self.ttl:
+                return data
+            del self.cache[key]
+        return None
+
+    def set(self, key: str, data: Any) -> None:
+        if len(self.cache) >= self.max_size:
+            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
+            del self.cache[oldest_key]
+        self.cache[key] = (data, time.time())
+
+
+def ops_per_sec(count: int, func) -> float:
+    start = time.perf_counter()
+    for i in range(count):
+        func(i)
+    return count / (time.perf_counter() - start)
+
+
+def bench(name: str, cache, capacity: int, ops: int) -> None:
+    for i in range(capacity):
+        cache.set(f"key_{i}", PAYLOAD)
+    get = ops_per_sec(ops, lambda i: cache.get(f"key_{i % capacity}"))
+    # Inserting new keys into a full cache forces an eviction each time
+    evicting_set = ops_per_sec(ops, lambda i: cache.set(f"new_{i}", PAYLOAD))
+    print(f"{name:<18} get {get:>12,.0f} ops/s   set+evict {evicting_set:>12,.0f} ops/s")
+
+
+def main() -> None:
+    capacity = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{capacity:,} entries")
+    bench("CacheEngine", CacheEngine(ttl=300, max_entries=capacity), capacity, 100_000)
+    # The legacy eviction scans every entry, so only a few hundred inserts are timed
+    bench("legacy dict scan", LegacyCacheManager(ttl=300, max_size=capacity), capacity, 200)
+
+
+if __name__ == "__main__":
+    main()
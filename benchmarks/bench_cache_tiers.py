@@ -0,0 +1,76 @@
+"""
+Microbenchmark: cache hit latency per tier
+
+Usage: python benchmarks/bench_cache_tiers.py [redis_url]
+
+Without a URL the Redis tiers run against the in-process stand-in server, so
+their numbers include loopback TCP but not a real server's command handling.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import MemoryBackend, RedisBackend, TieredBackend  # noqa: E402
+from benchmarks.redis_standin import RedisStandIn  # noqa: E402
+
+# One parsed catalog page, roughly what /api/movies/{page} caches
+PAYLOAD = [
+    {"title": f"Movie {i}", "id": str(10000 + i), "poster": f"https://img.example/{i}.jpg", "year": "2021"}
+    for i in range(32)
+]
+KEYS = 1000
+LOOKUPS = 5000
+
+
+async def hit_latencies(backend, prime=None):
+    for i in range(KEYS):
+        await backend.set(f"movies_page_{i}", PAYLOAD)
+    samples = []
+    for i in range(LOOKUPS):
+        if prime is not None:
+            prime()
+        start = time.perf_counter()
+        entry = await backend.get_entry(f"movies_page_{i % KEYS}")
+        samples.append(time.perf_counter() - start)
+        assert entry is not None
+    await backend.clear()
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1e6
+    p99 = samples[int(len(samples) * 0.99)] * 1e6
+    print(f"{name:<22} p50 {p50:>9.1f} us   p99 {p99:>9.1f} us")
+
+
+async def main(url):
+    ttl = 3600
+    report("memory", await hit_latencies(MemoryBackend(ttl)))
+
+    redis = RedisBackend(url, ttl, prefix="bench:")
+    report("redis", await hit_latencies(redis))
+
+    tiered = TieredBackend(MemoryBackend(ttl), RedisBackend(url, ttl, prefix="bench:"), l1_ttl=ttl)
+    report("tiered, L1 hit", await hit_latencies(tiered))
+
+    # Emptying L1 before each lookup forces the L2 read and promotion
+    tiered = TieredBackend(MemoryBackend(ttl), RedisBackend(url, ttl, prefix="bench:"), l1_ttl=ttl)
+    report("tiered, L2 hit", await hit_latencies(tiered, prime=tiered.l1.engine.clear))
+    await redis.close()
+    await tiered.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        asyncio.run(main(sys.argv[1]))
+    else:
+        server = RedisStandIn().start()
+        try:
+            asyncio.run(main(server.url))
+        finally:
+            server.stop()
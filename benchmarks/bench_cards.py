@@ -0,0 +1,95 @@
+"""
+Microbenchmark: card extraction throughput
+
+Usage: python benchmarks/bench_cards.py [rounds]
+
+Pages are parsed once up front, so the numbers are for extraction alone: the
+shared card schemas against the hand-written find() chains they replaced.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MoviesApi  # noqa: E402
+from parsing import make_soup  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+
+def legacy_movie_card(x):
+    id = x.find('a')['data-id']
+    url = x.find('a')['href']
+    title = x.find('h3', 'film-name').text.strip()
+    image = x.find('img')['data-src']
+    duration = x.find('span', "fdi-duration").text
+    type = x.find('span', 'fdi-type').text
+    year = x.find('span', 'fdi-item').text
+    return {"title": title, "id": id, 'url': f"https://lookmoviess.com{url}", "image": image,
+            "duration": duration, "type": type, "year": year}
+
+
+def legacy_tv_card(i):
+    image = i.img['data-src']
+    url = i.a['href']
+    id = i.a['data-id']
+    title = i.h3.text
+    fdi_items = i.find_all('span', 'fdi-item')
+    season = fdi_items[0].text
+    eps = fdi_items[1].text
+    mv = i.find('span', 'float-right fdi-type').text
+    return {'title': title.strip(), 'image': image, 'season': season, 'eps': eps, 'type': mv,
+            'id': id, 'url': f"https://lookmoviess.com{url}"}
+
+
+def legacy_gogo_item(x):
+    title = x.find('p', 'name').text
+    image_url = x.find('img')['src']
+    url = x.find('a')['href'].replace('/category/', '')
+    released = x.find('p', 'released').text.strip()
+    return {"title": f"{title}", "image_url": f"{image_url}", "url": f"{url}", "released": f"{released}"}
+
+
+def flw_items(soup):
+    return soup.find_all('div', 'flw-item')
+
+
+def popular_movies(soup):
+    return soup.find(id='popular-movies').find_all('div', 'flw-item')
+
+
+def gogo_items(soup):
+    return soup.find('div', 'last_episodes').find_all('li')
+
+
+CASES = [
+    ("movie cards", "lookmovies_movies.html", flw_items, legacy_movie_card, MoviesApi.MOVIE_CARD.extract),
+    ("tv cards", "lookmovies_tv.html", flw_items, legacy_tv_card, MoviesApi.TV_CARD.extract),
+    ("home movie cards", "lookmovies_home.html", popular_movies, legacy_movie_card, MoviesApi.MOVIE_CARD.extract),
+    ("gogo items", "gogoanime_search.html", gogo_items, legacy_gogo_item, MoviesApi.GOGO_ITEM.extract),
+]
+
+
+def cards_per_sec(cards, extract, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for card in cards:
+            extract(card)
+    return len(cards) * rounds / (time.perf_counter() - start)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{'page':<18}{'cards':>6}{'legacy cards/s':>16}{'schema cards/s':>16}{'speedup':>9}")
+    for name, fixture, select, legacy, schema in CASES:
+        with open(os.path.join(FIXTURES_DIR, fixture), encoding="utf-8") as f:
+            cards = select(make_soup(f.read()))
+        assert [legacy(c) for c in cards] == [schema(c) for c in cards]
+        before = cards_per_sec(cards, legacy, rounds)
+        after = cards_per_sec(cards, schema, rounds)
+        print(f"{name:<18}{len(cards):>6}{before:>16,.0f}{after:>16,.0f}{after / before:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
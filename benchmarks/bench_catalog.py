@@ -0,0 +1,107 @@
+"""
+Benchmark: catalog queries answered by the local index
+
+Usage: python benchmarks/bench_catalog.py [pages]
+
+Builds pages of each catalog from the recorded list pages, with titles, ids
+and years varied so every card is distinct, and indexes them. Each query is
+then timed against the index and against the fastest option without one: a
+Python scan over every page already in the response cache. Without the cache
+the same queries need one upstream fetch per catalog page.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import CatalogIndex  # noqa: E402
+from MoviesApi import parse_movie_list, parse_tv_list  # noqa: E402
+from benchmarks.stub_upstream import load_fixture  # noqa: E402
+
+WORDS = ["Broken", "Crown", "Dream", "Edge", "Fire", "Ghost", "Glass", "Hunter", "Kingdom", "Last", "Lost",
+         "Night", "Secret", "Silent", "Winter", "Empire", "River", "Shadow", "Storm", "Iron"]
+
+
+def build_pages(pages):
+    rng = random.Random(7)
+    templates = {
+        "movies": parse_movie_list(load_fixture("lookmovies_movies.html")),
+        "tv_shows": parse_tv_list(load_fixture("lookmovies_tv.html")),
+    }
+    catalog = {}
+    serial = 0
+    for name, cards in templates.items():
+        for page in range(1, pages + 1):
+            items = []
+            for card in cards:
+                serial += 1
+                title = " ".join(rng.sample(WORDS, rng.randint(1, 4)))
+                item = {**card, "id": str(serial), "title": title, "url": f"{card['url']}-{serial}"}
+                if "year" in item:
+                    item["year"] = str(rng.randint(1960, 2024))
+                items.append(item)
+            catalog[(name, page)] = items
+    return catalog
+
+
+def scan(pages, q=None, catalog=None, type=None, year=None, sort="title", limit=20):
+    """Filter and sort every cached page in Python, as a handler without an index would"""
+    matches = []
+    for (name, _), items in pages.items():
+        if catalog and name != catalog:
+            continue
+        for item in items:
+            if q and not all(term.lower() in item["title"].lower() for term in q.split()):
+                continue
+            if type and item.get("type", "").lower() != type.lower():
+                continue
+            if year and item.get("year") != str(year):
+                continue
+            matches.append(item)
+    matches.sort(key=lambda item: item["title"].lower())
+    return len(matches), matches[:limit]
+
+
+def ms_per_query(run, repeat=50):
+    run()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    catalog = build_pages(pages)
+    items = sum(len(cards) for cards in catalog.values())
+
+    index = CatalogIndex()
+    start = time.perf_counter()
+    for (name, page), cards in catalog.items():
+        index.index_page(name, page, cards)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for (name, page), cards in catalog.items():
+        index.index_page(name, page, cards)
+    recrawl = time.perf_counter() - start
+    print(f"{items:,} items on {len(catalog):,} pages, {index.stats()['bytes']:,} bytes")
+    print(f"index {build / len(catalog) * 1000:.2f} ms/page, unchanged re-crawl {recrawl / len(catalog) * 1000:.2f} ms/page")
+
+    queries = [
+        ("title contains 'ghost'", {"q": "ghost"}),
+        ("'storm iron' by title", {"q": "storm iron"}),
+        ("Movie from 2021 by title", {"type": "Movie", "year": 2021}),
+        ("tv_shows by title", {"catalog": "tv_shows"}),
+    ]
+    print(f"{'query':<28}{'matches':>9}{'scan ms':>10}{'index ms':>10}")
+    for label, query in queries:
+        total, _ = index.search(**query, sort="title")
+        scan_ms = ms_per_query(lambda: scan(catalog, **query))
+        index_ms = ms_per_query(lambda: index.search(**query, sort="title"))
+        print(f"{label:<28}{total:>9,}{scan_ms:>10.2f}{index_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: /details response size and cache cost for a long-running show
+
+Usage: python benchmarks/bench_details.py [episodes]
+
+Parses the recorded category page with its episode count raised, then
+compares the previous loader, which stored one link dict per episode (up to
+999) in the cached details, against the cached metadata with links built
+per response for the default range. "cache bytes" is what the memory cache
+accounts (payload plus prepared bodies); "heap bytes" is the Python memory
+allocated for the cached value on top of the parsed detail fields.
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api  # noqa: E402
+from cache import CacheEngine, dumps  # noqa: E402
+from gogoanime import parse_details  # noqa: E402
+from benchmarks.stub_upstream import load_fixture  # noqa: E402
+
+SLUG = "long-show"
+HOST = "api.example.com"
+
+
+def materialized(details, episodes):
+    """What the previous loader cached"""
+    links = [{f"episode_{x}": f"http://{HOST}/episode?slug={SLUG}&ep={x}"} for x in range(1, min(episodes + 1, 1000))]
+    return {**details, "episodes": links}
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    objects = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    engine = CacheEngine(ttl=60, prepare_bodies=True)
+    engine.set("anime_details", value)
+    return value, objects, engine.bytes
+
+
+def main():
+    episodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    details = {**parse_details(load_fixture("gogoanime_category.html")), "total_episodes": str(episodes)}
+
+    before, before_objects, before_cached = measure(lambda: materialized(details, episodes))
+    before_response = len(dumps({"data": before, "cached": True, "slug": SLUG}))
+    after, after_objects, after_cached = measure(lambda: dict(details))
+    window = api.with_episodes(after, SLUG, HOST, 0, api.settings.DETAILS_EPISODE_LIMIT)
+    after_response = len(dumps({"data": window, "cached": True, "slug": SLUG}))
+
+    print(f"{episodes} episodes, default range of {api.settings.DETAILS_EPISODE_LIMIT}")
+    print(f"{'':<8}{'response bytes':>16}{'cache bytes':>14}{'heap bytes':>14}")
+    print(f"{'before':<8}{before_response:>16,}{before_cached:>14,}{before_objects:>14,}")
+    print(f"{'after':<8}{after_response:>16,}{after_cached:>14,}{after_objects:>14,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Microbenchmark: warm restart cost of the disk cache
+
+Usage: python benchmarks/bench_disk_cache.py [entries]
+
+Builds a store, then times what a restarted worker pays before serving its
+first hits: opening the store lazily versus reading every row up front.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import DiskStore, dumps, loads  # noqa: E402
+
+PAYLOAD = dumps([
+    {"title": f"Movie {i}", "id": str(10000 + i), "poster": f"https://img.example/{i}.jpg", "year": "2021"}
+    for i in range(32)
+])
+
+
+def main() -> None:
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "cache.db")
+        store = DiskStore(path)
+        now = time.time()
+        store.set_many((f"movies_page_{i}", PAYLOAD, now, now + 3600) for i in range(entries))
+        store.close()
+        print(f"{entries:,} entries, {os.path.getsize(path) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        store = DiskStore(path)
+        opened = time.perf_counter() - start
+        for i in range(0, entries, entries // 100):
+            assert store.get(f"movies_page_{i}") is not None
+        first_hits = time.perf_counter() - start
+        store.close()
+        print(f"lazy open        {opened * 1000:>9.1f} ms   open + 100 lookups {first_hits * 1000:>9.1f} ms")
+
+        start = time.perf_counter()
+        db = sqlite3.connect(path)
+        loaded = {key: loads(value) for key, value in db.execute("SELECT key, value FROM entries")}
+        eager = time.perf_counter() - start
+        db.close()
+        print(f"eager full read  {eager * 1000:>9.1f} ms   ({len(loaded):,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Microbenchmark: cost of recording metrics on the request path
+
+Usage: python benchmarks/bench_metrics.py [iterations]
+
+Reports the time per counter increment and histogram observation, and the
+time MetricsMiddleware adds around a trivial ASGI app.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics  # noqa: E402
+
+
+class Route:
+    path = "/api/movies/{page}"
+
+
+async def trivial_app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def send(message):
+    pass
+
+
+async def seconds_per_call(app, iterations):
+    scope = {"type": "http", "method": "GET", "path": "/api/movies/1"}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(dict(scope), None, send)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    counter = metrics.Counter("bench_total", "Bench", ("prefix", "result"))
+    histogram = metrics.Histogram("bench_seconds", "Bench", ("host",))
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        counter.inc("movies", "hit")
+    print(f"{'counter inc':<24}{(time.perf_counter() - start) / iterations * 1e9:>10.0f} ns")
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        histogram.observe(i % 1000 / 1000, "lookmoviess.com")
+    print(f"{'histogram observe':<24}{(time.perf_counter() - start) / iterations * 1e9:>10.0f} ns")
+
+    bare = asyncio.run(seconds_per_call(trivial_app, iterations))
+    wrapped = asyncio.run(seconds_per_call(metrics.MetricsMiddleware(trivial_app), iterations))
+    print(f"{'middleware overhead':<24}{(wrapped - bare) * 1e9:>10.0f} ns per request")
+
+
+if __name__ == "__main__":
+    main()
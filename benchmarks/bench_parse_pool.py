@@ -0,0 +1,49 @@
+"""
+Throughput benchmark: detail page parsing with 1, 2, 4 and 8 parse workers
+
+Usage: python benchmarks/bench_parse_pool.py [pages]
+
+Submits the recorded TV detail page (all seasons and episodes) concurrently,
+the way simultaneous /api/tv/{id} misses do, and reports pages/sec for the
+thread fallback and for each process pool size. Scaling is bounded by the
+number of CPU cores on the machine.
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import parsing  # noqa: E402
+from MoviesApi import parse_tv_details  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "lookmovies_tv_detail.html")
+
+
+async def throughput(page: bytes, pages: int) -> float:
+    # Workers are spawned on demand, so start all of them before timing
+    warmup = max(parsing.parse_pool_stats()["workers"], 1)
+    await asyncio.gather(*[parsing.run_parse_heavy(parse_tv_details, page) for _ in range(warmup)])
+    start = time.perf_counter()
+    await asyncio.gather(*[parsing.run_parse_heavy(parse_tv_details, page) for _ in range(pages)])
+    return pages / (time.perf_counter() - start)
+
+
+def main() -> None:
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    with open(FIXTURE, "rb") as f:
+        page = f.read()
+    print(f"{os.cpu_count()} CPUs, {pages} pages of {len(page) / 1024:.0f} KB")
+    print(f"{'threads':<12}{asyncio.run(throughput(page, pages)):>10.1f} pages/s")
+    for workers in (1, 2, 4, 8):
+        parsing.start_parse_pool(workers)
+        try:
+            rate = asyncio.run(throughput(page, pages))
+        finally:
+            parsing.shutdown_parse_pool()
+        print(f"{f'{workers} workers':<12}{rate:>10.1f} pages/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Microbenchmark: listing page parse time and peak memory
+
+Usage: python benchmarks/bench_parsers.py [rounds]
+
+Runs each parser over its recorded fixture page twice: as shipped (fastest
+backend, strained to the needed subtree) and the way the scrapers used to
+parse (html.parser over the whole document).
+"""
+import os
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import MoviesApi  # noqa: E402
+import gogoanime  # noqa: E402
+from parsing import PARSER_BACKEND  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+CASES = [
+    ("Movies", MoviesApi.parse_movie_list, "lookmovies_movies.html"),
+    ("TV", MoviesApi.parse_tv_list, "lookmovies_tv.html"),
+    ("TOPIMDBMOVIES", MoviesApi.parse_movie_list, "lookmovies_top_imdb_movies.html"),
+    ("TOPIMDBTV", MoviesApi.parse_tv_list, "lookmovies_top_imdb_tv.html"),
+    ("trendingMovies", lambda r: MoviesApi.parse_movie_section(r, "trending-movies"), "lookmovies_home.html"),
+    ("latestTV", lambda r: MoviesApi.parse_tv_section(r, 5), "lookmovies_home.html"),
+    ("homepage", MoviesApi.parse_homepage, "lookmovies_home.html"),
+    ("gogo search", gogoanime.parse_search, "gogoanime_search.html"),
+    ("gogo recent", MoviesApi.parse_gogo_recent, "gogoanime_recent.html"),
+]
+
+
+def legacy_soup(markup, parse_only=None):
+    return BeautifulSoup(markup, "html.parser")
+
+
+def measure(func, page, rounds):
+    func(page)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(page)
+    elapsed = (time.perf_counter() - start) / rounds
+    tracemalloc.start()
+    func(page)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f"backend: {PARSER_BACKEND}, {rounds} rounds")
+    print(f"{'parser':<16}{'legacy ms':>11}{'now ms':>9}{'speedup':>9}{'legacy KB':>11}{'now KB':>9}")
+    for name, func, fixture in CASES:
+        with open(os.path.join(FIXTURES_DIR, fixture), encoding="utf-8") as f:
+            page = f.read()
+        new_time, new_peak = measure(func, page, rounds)
+        with mock.patch.object(MoviesApi, "make_soup", legacy_soup), \
+                mock.patch.object(gogoanime, "make_soup", legacy_soup):
+            old_time, old_peak = measure(func, page, rounds)
+        print(
+            f"{name:<16}{old_time * 1000:>11.2f}{new_time * 1000:>9.2f}{old_time / new_time:>8.1f}x"
+            f"{old_peak / 1024:>11.0f}{new_peak / 1024:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Microbenchmark: per-request rate limit cost as the number of clients grows
+
+Usage: python benchmarks/bench_rate_limit.py [checks]
+
+Fills the limiter with N distinct clients, then times checks spread across
+them, for the token-bucket RateLimiter and for the previous limiter that
+rebuilt its whole client dict on every call.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import RateLimiter  # noqa: E402
+
+
+class LegacyRateLimiter:
+    def __init__(self, max_requests=100, window_seconds=60):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.requests = {}
+
+    def is_allowed(self, identifier):
+        current_time = time.time()
+        self.requests = {
+            k: v for k, v in self.requests.items()
+            if current_time - v['first_request'] < self.window_seconds
+        }
+        if identifier not in self.requests:
+            self.requests[identifier] = {'count': 1, 'first_request': current_time}
+            return True
+        if self.requests[identifier]['count'] < self.max_requests:
+            self.requests[identifier]['count'] += 1
+            return True
+        return False
+
+
+def fill(limiter, clients):
+    if isinstance(limiter, LegacyRateLimiter):
+        now = time.time()
+        limiter.requests = {f"10.0.{i}": {'count': 1, 'first_request': now} for i in range(clients)}
+    else:
+        for i in range(clients):
+            limiter.check(f"10.0.{i}")
+
+
+def us_per_check(limiter, clients, checks):
+    identifiers = [f"10.0.{i * 7919 % clients}" for i in range(checks)]
+    start = time.perf_counter()
+    for identifier in identifiers:
+        limiter.is_allowed(identifier)
+    return (time.perf_counter() - start) / checks * 1e6
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{'clients':>8}{'legacy us/check':>18}{'token bucket us/check':>24}")
+    for clients in (1_000, 10_000, 100_000):
+        legacy = LegacyRateLimiter()
+        fill(legacy, clients)
+        # The legacy limiter is O(clients) per call, so time fewer calls
+        legacy_us = us_per_check(legacy, clients, max(checks * 100 // clients, 20))
+        bucket = RateLimiter()
+        fill(bucket, clients)
+        bucket_us = us_per_check(bucket, clients, checks)
+        print(f"{clients:>8}{legacy_us:>18,.1f}{bucket_us:>24,.2f}")
+
+
+if __name__ == "__main__":
+    main()
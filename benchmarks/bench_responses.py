@@ -0,0 +1,78 @@
+"""
+Benchmark: requests/sec of a warm /api/tv/{id} cache hit
+
+Usage: python benchmarks/bench_responses.py [requests]
+
+Seeds the cache with the recorded TV details page, then drives the ASGI app
+in-process (full middleware stack, no sockets) and compares:
+  before  the previous handler, returning a dict that FastAPI runs through
+          jsonable_encoder and stdlib json on every hit
+  after   the prepared body of the cache entry, uncompressed and as br/gzip
+"""
+import asyncio
+import os
+import sys
+import time
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("WARMER_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api  # noqa: E402
+from MoviesApi import parse_tv_details  # noqa: E402
+from benchmarks.stub_upstream import load_fixture  # noqa: E402
+
+TV_ID = "bench-show"
+
+
+@api.app.get("/bench/before/tv/{tv_id}")
+async def before(tv_id: str):
+    result = await api.get_or_fetch(f"tv_details_{tv_id}", lambda: api.load_tv_details(tv_id), "tv_details")
+    return api.build_response(result, tv_id=tv_id)
+
+
+async def requests_per_second(path, accept_encoding, requests):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 50000), "server": ("testserver", 80),
+        "headers": [(b"host", b"testserver"), (b"accept-encoding", accept_encoding.encode())],
+    }
+    sizes = set()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            sizes.add(len(message["body"]))
+
+    for _ in range(50):
+        await api.app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await api.app(dict(scope), receive, send)
+    return requests / (time.perf_counter() - start), max(sizes)
+
+
+async def run(requests):
+    await api.cache.set(f"tv_details_{TV_ID}", parse_tv_details(load_fixture("lookmovies_tv_detail.html")))
+    cases = [
+        ("before", f"/bench/before/tv/{TV_ID}", "identity"),
+        ("after identity", f"/api/tv/{TV_ID}", "identity"),
+        ("after gzip", f"/api/tv/{TV_ID}", "gzip"),
+        ("after br", f"/api/tv/{TV_ID}", "br, gzip"),
+    ]
+    print(f"{'case':<18}{'req/s':>10}{'body bytes':>12}")
+    for name, path, accept in cases:
+        rps, size = await requests_per_second(path, accept, requests)
+        print(f"{name:<18}{rps:>10,.0f}{size:>12,}")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    asyncio.run(run(requests))
+
+
+if __name__ == "__main__":
+    main()
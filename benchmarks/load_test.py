@@ -0,0 +1,189 @@
+"""
+Offline load test: drive the API against the local fixture stub
+
+Usage:
+    python benchmarks/load_test.py [--requests 200] [--concurrency 20]
+        [--latency 0.05] [--jitter 0.02] [--error-rate 0] [--workers 1]
+        [--endpoints movies,tv_details] [--output results.json] [--compare previous.json]
+
+Starts StubUpstream, runs the API under uvicorn in a subprocess with
+UPSTREAM_OVERRIDE pointing at the stub, and measures each endpoint twice:
+- cold: cache cleared and a distinct cache key per request, so every request scrapes
+- warm: the same few keys, loaded once before timing, so requests are cache hits
+Reports requests/sec and p50/p95/p99 latency and writes them as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_upstream import StubUpstream  # noqa: E402
+
+# endpoint -> path for the nth distinct key; single-key endpoints ignore n
+ENDPOINTS: Dict[str, Callable[[int], str]] = {
+    "movies": lambda n: f"/api/movies/{n}",
+    "tv_shows": lambda n: f"/api/tv-shows/{n}",
+    "top_imdb_movies": lambda n: f"/api/top-imdb/movies/{n}",
+    "movie_details": lambda n: f"/api/movie/watch-movie-{n}",
+    "tv_details": lambda n: f"/api/tv/watch-show-{n}",
+    "home": lambda n: "/api/home",
+    "trending_movies": lambda n: "/api/trending_movies",
+    "anime_search": lambda n: f"/search?name=naruto{n}",
+    "anime_details": lambda n: f"/details?slug=naruto-{n}",
+    "episode": lambda n: f"/episode?slug=naruto&ep={n}",
+}
+WARM_KEYS = 5
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+async def drive(client: httpx.AsyncClient, paths: List[str], concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue = list(reversed(paths))
+
+    async def worker():
+        while queue:
+            path = queue.pop()
+            start = time.perf_counter()
+            try:
+                status = str((await client.get(path)).status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": len(paths),
+        "statuses": statuses,
+        "rps": round(len(paths) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+async def run_suite(base_url: str, endpoints: List[str], requests: int, concurrency: int) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        for name in endpoints:
+            path = ENDPOINTS[name]
+            await client.get("/api/cache/clear")
+            cold = await drive(client, [path(n) for n in range(1, requests + 1)], concurrency)
+
+            await client.get("/api/cache/clear")
+            warm_paths = [path(n) for n in range(1, WARM_KEYS + 1)]
+            for warm_path in dict.fromkeys(warm_paths):
+                await client.get(warm_path)
+            warm = await drive(client, [warm_paths[n % WARM_KEYS] for n in range(requests)], concurrency)
+
+            results[name] = {"cold": cold, "warm": warm}
+            print(
+                f"{name:<16} cold {cold['rps']:>8.1f} rps  p50 {cold['p50_ms']:>7.1f}  p95 {cold['p95_ms']:>7.1f}"
+                f"  p99 {cold['p99_ms']:>7.1f} ms | warm {warm['rps']:>8.1f} rps  p50 {warm['p50_ms']:>6.1f}"
+                f"  p95 {warm['p95_ms']:>6.1f}  p99 {warm['p99_ms']:>6.1f} ms"
+            )
+    return results
+
+
+def start_api(stub_url: str, port: int, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ, "UPSTREAM_OVERRIDE": stub_url, "WARMER_ENABLED": "false", "RATE_LIMIT_ENABLED": "false",
+        "CATALOG_CRAWL_ENABLED": "false",
+    }
+    command = [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("API did not start within 60 seconds")
+
+
+def compare(results: Dict[str, Dict], previous_path: str) -> None:
+    with open(previous_path) as f:
+        previous = json.load(f)["endpoints"]
+    print(f"\nChange against {previous_path}:")
+    for name, modes in results.items():
+        for mode, current in modes.items():
+            before = previous.get(name, {}).get(mode)
+            if not before:
+                continue
+            rps = (current["rps"] - before["rps"]) / before["rps"] * 100
+            p95 = (current["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            print(f"{name:<16} {mode:<5} rps {rps:>+7.1f}%  p95 {p95:>+7.1f}%")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline load test against the fixture stub")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and mode")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", f"load_{int(time.time())}.json"))
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    stub = StubUpstream(args.latency, args.jitter, args.error_rate).start()
+    port = free_port()
+    api = start_api(stub.url, port, args.workers)
+    try:
+        results = asyncio.run(run_suite(f"http://127.0.0.1:{port}", endpoints, args.requests, args.concurrency))
+    finally:
+        api.terminate()
+        api.wait()
+        stub.stop()
+
+    report = {
+        "timestamp": time.time(),
+        "config": {**vars(args), "python": platform.python_version(), "cpus": os.cpu_count()},
+        "stub": {"requests": stub.requests, "errors": stub.errors},
+        "endpoints": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
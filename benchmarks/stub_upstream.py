@@ -0,0 +1,121 @@
+"""
+Local stand-in for the scraped sites, serving the recorded fixture pages
+
+Start the API with UPSTREAM_OVERRIDE pointing here; the upstream client then
+sends every request to this server with the real host in X-Upstream-Host.
+Latency and error injection make it usable for load tests:
+
+    python benchmarks/stub_upstream.py --port 8765 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+# URL fragment -> recorded page, checked in order
+FIXTURE_ROUTES = [
+    ("top-imdb?type=movie", "lookmovies_top_imdb_movies.html"),
+    ("top-imdb?type=tv", "lookmovies_top_imdb_tv.html"),
+    ("/movies?", "lookmovies_movies.html"),
+    ("/tv-shows?", "lookmovies_tv.html"),
+    ("/movie/", "lookmovies_movie_detail.html"),
+    ("/tv/", "lookmovies_tv_detail.html"),
+    ("animetitans.com", "animetitans_anime.html"),
+    ("lookmoviess.com", "lookmovies_home.html"),
+    ("/ajax.php", "gogoanime_ajax.json"),
+    ("search.html", "gogoanime_search.html"),
+    ("/category/", "gogoanime_category.html"),
+    ("-episode-", "gogoanime_episode.html"),
+]
+
+
+def load_fixture(name: str) -> str:
+    """Read a recorded upstream page"""
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def fixture_for(url: str) -> Optional[str]:
+    """Name of the recorded page for an upstream URL, or None if there is none"""
+    for fragment, name in FIXTURE_ROUTES:
+        if fragment in url:
+            return name
+    return None
+
+
+class StubUpstream:
+    """Fixture server with injectable latency and errors, run on a background thread"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.port: Optional[int] = None
+        self._random = random.Random(seed)
+        self._pages = {name: load_fixture(name).encode() for _, name in FIXTURE_ROUTES}
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = Starlette(routes=[Route("/{path:path}", self.handle)])
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def handle(self, request: Request) -> Response:
+        self.requests += 1
+        host = request.headers.get("x-upstream-host", request.url.hostname)
+        url = f"https://{host}{request.url.path}" + (f"?{request.url.query}" if request.url.query else "")
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return Response("Injected upstream error", status_code=502)
+        name = fixture_for(url)
+        if name is None:
+            return Response("Not found", status_code=404)
+        media_type = "application/json" if name.endswith(".json") else "text/html"
+        return Response(self._pages[name], media_type=media_type)
+
+    def start(self, port: int = 0) -> "StubUpstream":
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 502")
+    args = parser.parse_args()
+    stub = StubUpstream(args.latency, args.jitter, args.error_rate).start(args.port)
+    print(f"Serving fixtures on {stub.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,805 @@
+"""
+Bounded in-memory cache engine for API responses
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, cached bodies then only get a gzip variant
+    brotli = None
+
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # only needed for the redis and tiered backends
+    aioredis = None
+    RedisError = OSError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize a cached value to JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=str)
+        except TypeError:
+            pass
+    return json.dumps(value, default=str).encode()
+
+
+def loads(raw: bytes) -> Any:
+    """Deserialize a value written by dumps"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory cost of a cached value as its serialized size in bytes"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode())
+    return len(dumps(value))
+
+
+def content_hash(payload: bytes) -> str:
+    """Digest of a serialized value, identical wherever the same value is cached"""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+# Shared-store records are the entry's store time followed by the JSON payload,
+# so a reader gets the age without a second field or round trip
+_STORED_AT = struct.Struct("!d")
+
+
+def encode_entry(value: Any, stored_at: float) -> bytes:
+    return _STORED_AT.pack(stored_at) + dumps(value)
+
+
+def decode_entry(raw: bytes) -> Tuple[float, Any]:
+    return _STORED_AT.unpack_from(raw)[0], loads(raw[_STORED_AT.size:])
+
+
+# A cache hit is answered with exactly these bytes around the entry's payload
+BODY_PREFIX = b'{"data":'
+BODY_SUFFIX = b',"cached":true}'
+
+
+class CachedBody:
+    """The response body of a cache hit, serialized once, with compressed variants
+
+    encoded maps a content coding (br, gzip) to the compressed body. It is
+    empty for bodies under RESPONSE_COMPRESS_MIN_BYTES, and for bodies built
+    on a read from a shared store, where compressing would cost every request.
+    """
+
+    __slots__ = ("identity", "encoded")
+
+    def __init__(self, payload: bytes, compress: bool = True):
+        self.identity = BODY_PREFIX + payload + BODY_SUFFIX
+        self.encoded: Dict[str, bytes] = {}
+        if compress and len(self.identity) >= settings.RESPONSE_COMPRESS_MIN_BYTES:
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(self.identity, quality=settings.RESPONSE_BROTLI_QUALITY)
+            self.encoded["gzip"] = gzip.compress(self.identity, compresslevel=settings.RESPONSE_GZIP_LEVEL, mtime=0)
+
+    @property
+    def payload(self) -> bytes:
+        return self.identity[len(BODY_PREFIX):-len(BODY_SUFFIX)]
+
+    @property
+    def size(self) -> int:
+        return len(self.identity) + sum(len(variant) for variant in self.encoded.values())
+
+
+class CacheEntry:
+    """A cached value with its timestamps, accounted size, content digest and prepared body
+
+    The digest is taken from the serialized payload wherever one already exists
+    (on write to the memory engine, on read from redis or disk), and otherwise
+    computed on first use.
+    """
+
+    __slots__ = ("value", "stored_at", "expires_at", "size", "slot", "_digest", "body", "checked_at")
+
+    def __init__(
+        self,
+        value: Any,
+        stored_at: float,
+        expires_at: float,
+        size: int,
+        digest: Optional[str] = None,
+        body: Optional[CachedBody] = None,
+    ):
+        self.value = value
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.size = size
+        self.slot = -1
+        self._digest = digest
+        self.body = body
+        self.checked_at = time.time()  # when this copy was stored or last found current
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = content_hash(dumps(self.value))
+        return self._digest
+
+
+class CacheEngine:
+    """LRU cache with per-entry TTL and a memory budget, all operations O(1)
+
+    Recency is kept by an OrderedDict, so get/set/evict never scan the cache.
+    Expiry uses a hashed timing wheel: each entry sits in the slot of the tick it
+    expires on, and the sweeper only visits the slots whose tick has passed.
+    Expired entries are also dropped lazily when read.
+
+    With prepare_bodies, JSON values also keep a CachedBody, built once on set
+    and counted against the memory budget.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        resolution: float = 1.0,
+        slots: int = 4096,
+        prepare_bodies: bool = False,
+    ):
+        self.ttl = ttl
+        self.prepare_bodies = prepare_bodies
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.resolution = resolution
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._wheel: List[Set[str]] = [set() for _ in range(slots)]
+        self._tick = self._tick_for(time.time())
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _tick_for(self, timestamp: float) -> int:
+        return int(timestamp / self.resolution)
+
+    def _unlink(self, key: str, entry: CacheEntry) -> None:
+        self._wheel[entry.slot].discard(key)
+        self.bytes -= entry.size
+
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Get the entry for key, or None if it is missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self.delete(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get a value if present and not expired"""
+        entry = self.get_entry(key)
+        return entry.value if entry else None
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        size: Optional[int] = None,
+        stored_at: Optional[float] = None,
+        payload: Optional[bytes] = None,
+    ) -> bool:
+        """Store a value, evicting least recently used entries to stay within budget
+
+        payload is the value already serialized by dumps, when the caller has it.
+        """
+        if payload is None and (size is None or self.prepare_bodies) and \
+                not isinstance(value, (bytes, bytearray, str)):
+            # The size estimate serializes the value anyway, so digest the same bytes
+            payload = dumps(value)
+        if size is None:
+            size = len(payload) if payload is not None else estimate_size(value)
+        digest = body = None
+        if payload is not None:
+            digest = content_hash(payload)
+            if self.prepare_bodies:
+                body = CachedBody(payload)
+                size += body.size
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.warning(f"Not caching {key}: {size} bytes exceeds the cache budget")
+            self.delete(key)
+            return False
+
+        stored_at = time.time() if stored_at is None else stored_at
+        entry = CacheEntry(value, stored_at, stored_at + (self.ttl if ttl is None else ttl), size, digest, body)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._unlink(key, old)
+
+        # Ticks up to self._tick were already swept, so never schedule into them
+        entry.slot = max(self._tick_for(entry.expires_at), self._tick + 1) % len(self._wheel)
+        self._wheel[entry.slot].add(key)
+        self._entries[key] = entry
+        self.bytes += size
+
+        while (self.max_bytes is not None and self.bytes > self.max_bytes) or \
+                (self.max_entries is not None and len(self._entries) > self.max_entries):
+            old_key, old_entry = self._entries.popitem(last=False)
+            self._unlink(old_key, old_entry)
+            self.evictions += 1
+        return True
+
+    def touch(self, key: str, stored_at: Optional[float] = None) -> bool:
+        """Restart an entry's TTL from stored_at without replacing its value, returning whether it was present"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        stored_at = time.time() if stored_at is None else stored_at
+        self._wheel[entry.slot].discard(key)
+        entry.expires_at = stored_at + (entry.expires_at - entry.stored_at)
+        entry.stored_at = stored_at
+        entry.checked_at = time.time()
+        entry.slot = max(self._tick_for(entry.expires_at), self._tick + 1) % len(self._wheel)
+        self._wheel[entry.slot].add(key)
+        self._entries.move_to_end(key)
+        return True
+
+    def delete(self, key: str) -> bool:
+        """Remove a key, returning whether it was present"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._unlink(key, entry)
+        return True
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop entries whose expiry tick has passed, returning how many were removed"""
+        now = time.time() if now is None else now
+        target = self._tick_for(now)
+        # Past a full rotation every slot is due, so visit each one once
+        start = max(self._tick + 1, target - len(self._wheel) + 1)
+        removed = 0
+        for tick in range(start, target + 1):
+            slot = self._wheel[tick % len(self._wheel)]
+            for key in [k for k in slot if self._entries[k].expires_at <= now]:
+                self.delete(key)
+                removed += 1
+        self._tick = max(self._tick, target)
+        self.expirations += removed
+        return removed
+
+    async def run_sweeper(self, interval: float = 1.0) -> None:
+        """Sweep expired entries periodically until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def clear(self) -> int:
+        """Remove every entry and return how many there were"""
+        count = len(self._entries)
+        self._entries.clear()
+        for slot in self._wheel:
+            slot.clear()
+        self.bytes = 0
+        return count
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def stats(self) -> Dict[str, Any]:
+        """Occupancy and hit/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CacheBackend:
+    """Storage behind the response cache
+
+    Methods are coroutines so that stores shared between worker processes fit
+    behind the same interface as the in-process engine.
+    """
+
+    name = "base"
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        raise NotImplementedError
+
+    async def touch(self, key: str, stored_at: Optional[float] = None) -> bool:
+        """Mark an entry as stored at stored_at (now by default), returning whether it was present"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> int:
+        raise NotImplementedError
+
+    async def size(self) -> int:
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def run_sweeper(self, interval: float = 1.0) -> None:
+        """Expire entries in the background; shared stores expire keys themselves"""
+
+    async def close(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process cache held in a CacheEngine"""
+
+    name = "memory"
+
+    def __init__(self, ttl: float, max_bytes: Optional[int] = None):
+        self.engine = CacheEngine(ttl=ttl, max_bytes=max_bytes, prepare_bodies=True)
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        return self.engine.get_entry(key)
+
+    async def set(self, key: str, value: Any, stored_at: Optional[float] = None, size: Optional[int] = None) -> None:
+        self.engine.set(key, value, size=size, stored_at=stored_at)
+
+    async def touch(self, key: str, stored_at: Optional[float] = None) -> bool:
+        return self.engine.touch(key, stored_at)
+
+    async def delete(self, key: str) -> None:
+        self.engine.delete(key)
+
+    async def clear(self) -> int:
+        return self.engine.clear()
+
+    async def size(self) -> int:
+        return len(self.engine)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, **self.engine.stats()}
+
+    async def run_sweeper(self, interval: float = 1.0) -> None:
+        await self.engine.run_sweeper(interval)
+
+
+class RedisBackend(CacheBackend):
+    """Cache shared by every worker through a Redis-protocol server
+
+    Keys expire on the server after the retention TTL. Connection errors are
+    logged and treated as misses so an unavailable store only costs hit rate.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl: float, prefix: str = ""):
+        if aioredis is None:
+            raise RuntimeError("The redis cache backend requires the 'redis' package")
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _redis(self):
+        # Connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = aioredis.Redis.from_url(self.url)
+            self._client_loop = loop
+        return self._client
+
+    def _error(self, action: str, key: str, error: Exception) -> None:
+        self.errors += 1
+        logger.warning(f"Cache {action} for {key} failed: {str(error)}")
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        try:
+            raw = await self._redis().get(self.prefix + key)
+        except (RedisError, OSError) as e:
+            self._error("read", key, e)
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        stored_at, value = decode_entry(raw)
+        payload = raw[_STORED_AT.size:]
+        return CacheEntry(value, stored_at, stored_at + self.ttl, len(raw), content_hash(payload),
+                          CachedBody(payload, compress=False))
+
+    async def set_encoded(self, key: str, record: bytes, stored_at: float) -> None:
+        """Store a record produced by encode_entry"""
+        remaining = stored_at + self.ttl - time.time()
+        try:
+            if remaining <= 0:
+                await self._redis().delete(self.prefix + key)
+            else:
+                await self._redis().set(self.prefix + key, record, px=max(int(remaining * 1000), 1))
+        except (RedisError, OSError) as e:
+            self._error("write", key, e)
+
+    async def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        stored_at = time.time() if stored_at is None else stored_at
+        await self.set_encoded(key, encode_entry(value, stored_at), stored_at)
+
+    async def touch(self, key: str, stored_at: Optional[float] = None) -> bool:
+        # Rewrites the record's timestamp header; the payload is sent back as read
+        try:
+            raw = await self._redis().get(self.prefix + key)
+        except (RedisError, OSError) as e:
+            self._error("read", key, e)
+            return False
+        if raw is None:
+            return False
+        stored_at = time.time() if stored_at is None else stored_at
+        await self.set_encoded(key, _STORED_AT.pack(stored_at) + raw[_STORED_AT.size:], stored_at)
+        return True
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._redis().delete(self.prefix + key)
+        except (RedisError, OSError) as e:
+            self._error("delete", key, e)
+
+    async def _keys(self) -> List[bytes]:
+        return [key async for key in self._redis().scan_iter(match=self.prefix + "*", count=1000)]
+
+    async def clear(self) -> int:
+        try:
+            keys = await self._keys()
+            for start in range(0, len(keys), 1000):
+                await self._redis().delete(*keys[start:start + 1000])
+            return len(keys)
+        except (RedisError, OSError) as e:
+            self._error("clear", self.prefix + "*", e)
+            return 0
+
+    async def size(self) -> int:
+        try:
+            return len(await self._keys())
+        except (RedisError, OSError) as e:
+            self._error("scan", self.prefix + "*", e)
+            return 0
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "entries": await self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "errors": self.errors,
+        }
+
+    async def close(self) -> None:
+        if self._client is not None and self._client_loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
+        self._client_loop = None
+
+
+class TieredBackend(CacheBackend):
+    """In-process L1 in front of a shared L2
+
+    L1 answers on its own for l1_ttl seconds after it copied or last checked an
+    entry, whatever the entry's age. After that the copy is checked against L2,
+    because another worker may already have refreshed the entry there, and
+    when L2 has nothing newer the copy is trusted for another l1_ttl. Values
+    are encoded once per write: the same bytes go to L2 and size the L1 entry,
+    and L1 keeps the decoded object so its hits never deserialize.
+    """
+
+    name = "tiered"
+
+    def __init__(self, l1: MemoryBackend, l2: RedisBackend, l1_ttl: float):
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        local = self.l1.engine.get_entry(key)
+        if local is not None and time.time() - local.checked_at < self.l1_ttl:
+            return local
+        shared = await self.l2.get_entry(key)
+        if shared is None or (local is not None and local.stored_at >= shared.stored_at):
+            if local is not None:
+                local.checked_at = time.time()
+            return local
+        self.l1.engine.set(key, shared.value, size=shared.size, stored_at=shared.stored_at, payload=shared.body.payload)
+        return shared
+
+    async def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        stored_at = time.time() if stored_at is None else stored_at
+        record = encode_entry(value, stored_at)
+        self.l1.engine.set(key, value, size=len(record), stored_at=stored_at, payload=record[_STORED_AT.size:])
+        await self.l2.set_encoded(key, record, stored_at)
+
+    async def touch(self, key: str, stored_at: Optional[float] = None) -> bool:
+        stored_at = time.time() if stored_at is None else stored_at
+        local = self.l1.engine.touch(key, stored_at)
+        return await self.l2.touch(key, stored_at) or local
+
+    async def delete(self, key: str) -> None:
+        self.l1.engine.delete(key)
+        await self.l2.delete(key)
+
+    async def clear(self) -> int:
+        self.l1.engine.clear()
+        return await self.l2.clear()
+
+    async def size(self) -> int:
+        return await self.l2.size()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "l1": await self.l1.stats(), "l2": await self.l2.stats()}
+
+    async def run_sweeper(self, interval: float = 1.0) -> None:
+        await self.l1.run_sweeper(interval)
+
+    async def close(self) -> None:
+        await self.l2.close()
+
+
+class DiskStore:
+    """SQLite file holding cache entries across restarts
+
+    Opening the store reads nothing but the schema; entries are fetched one key
+    at a time through the primary key index, so startup cost does not grow with
+    the number of entries. compact() deletes expired rows, trims the store to
+    max_entries and returns the freed pages to the filesystem.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = None):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+        self.compacted = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, stored_at, expires_at FROM entries WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        raw, stored_at, expires_at = row
+        return CacheEntry(loads(raw), stored_at, expires_at, len(raw), content_hash(raw), CachedBody(raw, compress=False))
+
+    def set(self, key: str, payload: bytes, stored_at: float, expires_at: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, stored_at, expires_at, value) VALUES (?, ?, ?, ?)",
+                (key, stored_at, expires_at, payload),
+            )
+
+    def set_many(self, rows: Iterable[Tuple[str, bytes, float, float]]) -> None:
+        """Store (key, payload, stored_at, expires_at) rows in one transaction"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at, expires_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._db.execute("COMMIT")
+
+    def touch(self, key: str, stored_at: float, expires_at: float) -> bool:
+        with self._lock:
+            return self._db.execute(
+                "UPDATE entries SET stored_at = ?, expires_at = ? WHERE key = ?", (stored_at, expires_at, key)
+            ).rowcount > 0
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Drop expired and excess entries and reclaim their space, returning how many were removed"""
+        now = time.time() if now is None else now
+        with self._lock:
+            removed = self._db.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+            if self.max_entries is not None:
+                # The entries closest to expiry go first
+                removed += self._db.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    "SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            self._db.execute("PRAGMA incremental_vacuum")
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compactions += 1
+        self.compacted += removed
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM entries").rowcount
+            self._db.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            page_count = self._db.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "path": self.path,
+            "entries": self.count(),
+            "file_bytes": page_count * page_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "compactions": self.compactions,
+            "compacted_entries": self.compacted,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class PersistentBackend(CacheBackend):
+    """Cache backend whose entries for selected key prefixes are also kept on disk
+
+    Misses in the wrapped backend fall through to the disk store, and disk hits
+    are copied back with their original store time, so TTLs and stale windows
+    carry over a restart unchanged. SQLite calls run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        front: CacheBackend,
+        store: DiskStore,
+        ttl: float,
+        prefixes: Tuple[str, ...],
+        compact_interval: float = 600.0,
+    ):
+        self.front = front
+        self.store = store
+        self.ttl = ttl
+        self.prefixes = tuple(prefixes)
+        self.compact_interval = compact_interval
+        self.name = f"{front.name}+disk"
+
+    def _persists(self, key: str) -> bool:
+        return key.startswith(self.prefixes)
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        entry = await self.front.get_entry(key)
+        if entry is not None or not self._persists(key):
+            return entry
+        entry = await asyncio.to_thread(self.store.get, key)
+        if entry is not None:
+            await self.front.set(key, entry.value, stored_at=entry.stored_at)
+        return entry
+
+    async def set(self, key: str, value: Any, stored_at: Optional[float] = None) -> None:
+        stored_at = time.time() if stored_at is None else stored_at
+        await self.front.set(key, value, stored_at=stored_at)
+        if self._persists(key):
+            await asyncio.to_thread(self.store.set, key, dumps(value), stored_at, stored_at + self.ttl)
+
+    async def touch(self, key: str, stored_at: Optional[float] = None) -> bool:
+        stored_at = time.time() if stored_at is None else stored_at
+        touched = await self.front.touch(key, stored_at)
+        if self._persists(key):
+            touched = await asyncio.to_thread(self.store.touch, key, stored_at, stored_at + self.ttl) or touched
+        return touched
+
+    async def delete(self, key: str) -> None:
+        await self.front.delete(key)
+        await asyncio.to_thread(self.store.delete, key)
+
+    async def clear(self) -> int:
+        await asyncio.to_thread(self.store.clear)
+        return await self.front.clear()
+
+    async def size(self) -> int:
+        return await self.front.size()
+
+    async def stats(self) -> Dict[str, Any]:
+        return {**await self.front.stats(), "backend": self.name, "disk": await asyncio.to_thread(self.store.stats)}
+
+    async def run_compactor(self) -> None:
+        """Compact the disk store periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.compact_interval)
+            removed = await asyncio.to_thread(self.store.compact)
+            logger.info(f"Compacted disk cache, removed {removed} entries")
+
+    async def run_sweeper(self, interval: float = 1.0) -> None:
+        await asyncio.gather(self.front.run_sweeper(interval), self.run_compactor())
+
+    async def close(self) -> None:
+        await self.front.close()
+        self.store.close()
+
+
+def create_backend(ttl: float) -> CacheBackend:
+    """Build the cache backend selected by CACHE_BACKEND, on disk too when CACHE_DISK_PATH is set"""
+    kind = settings.CACHE_BACKEND
+    if kind == "memory":
+        backend = MemoryBackend(ttl, max_bytes=settings.CACHE_MAX_BYTES)
+    elif kind in ("redis", "tiered"):
+        backend = RedisBackend(settings.CACHE_REDIS_URL, ttl, prefix=settings.CACHE_KEY_PREFIX)
+        if kind == "tiered":
+            backend = TieredBackend(MemoryBackend(ttl, max_bytes=settings.CACHE_MAX_BYTES), backend, settings.CACHE_L1_TTL)
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND {kind!r}, expected memory, redis or tiered")
+
+    if settings.CACHE_DISK_PATH:
+        store = DiskStore(settings.CACHE_DISK_PATH, max_entries=settings.CACHE_DISK_MAX_ENTRIES)
+        backend = PersistentBackend(
+            backend, store, ttl, tuple(settings.CACHE_DISK_PREFIXES), settings.CACHE_DISK_COMPACT_INTERVAL
+        )
+    return backend
@@ -0,0 +1,391 @@
+"""
+Local index of the movie and TV catalogs for filtering and search without upstream calls
+"""
+import asyncio
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from cache import content_hash, dumps, loads
+
+logger = logging.getLogger(__name__)
+
+CATALOGS = ("movies", "tv_shows", "top_imdb_movies", "top_imdb_tv")
+
+# Sort name -> (column, nullable); a leading "-" on the name sorts descending, items without a value go last
+SORTS = {
+    "title": ("items.title COLLATE NOCASE", False),
+    "year": ("items.year", True),
+    "duration": ("items.duration", True),
+}
+
+_NUMBER = re.compile(r"\d+")
+
+
+def _number(value: Any) -> Optional[int]:
+    """The first number in a card field such as "89m" or "2021", None if there is none"""
+    match = _NUMBER.search(str(value or ""))
+    return int(match[0]) if match else None
+
+
+def _like(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class CatalogIndex:
+    """SQLite index of the catalog cards parsed from upstream list pages
+
+    Items are keyed by their URL, so a title listed in several catalogs (or
+    moving between pages) is stored once, with one listing row per catalog
+    recording where it was last seen. The card JSON is kept apart from the
+    filter and sort columns, so queries only read it for the rows returned.
+    Titles are also in an FTS5 table with the trigram tokenizer, which answers
+    "title contains X" from the index; terms shorter than three characters, or
+    SQLite builds without trigram support, fall back to LIKE. A page whose
+    items hash the same as when it was last indexed is not rewritten, only
+    marked as seen.
+    """
+
+    def __init__(self, path: str = ""):
+        self.path = path or ":memory:"
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA foreign_keys=ON")
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " item INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, title TEXT NOT NULL,"
+            " type TEXT, year INTEGER, duration INTEGER, seen_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS items_title ON items (title COLLATE NOCASE);"
+            "CREATE INDEX IF NOT EXISTS items_type_year ON items (type COLLATE NOCASE, year);"
+            "CREATE INDEX IF NOT EXISTS items_year ON items (year);"
+            "CREATE INDEX IF NOT EXISTS items_seen_at ON items (seen_at);"
+            "CREATE TABLE IF NOT EXISTS cards ("
+            " item INTEGER PRIMARY KEY REFERENCES items (item) ON DELETE CASCADE, data BLOB NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " catalog TEXT NOT NULL, item INTEGER NOT NULL REFERENCES items (item) ON DELETE CASCADE,"
+            " page INTEGER NOT NULL, position INTEGER NOT NULL, PRIMARY KEY (catalog, item));"
+            "CREATE INDEX IF NOT EXISTS listings_order ON listings (catalog, page, position);"
+            "CREATE INDEX IF NOT EXISTS listings_item ON listings (item);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " catalog TEXT NOT NULL, page INTEGER NOT NULL, digest TEXT NOT NULL, indexed_at REAL NOT NULL,"
+            " PRIMARY KEY (catalog, page));"
+        )
+        try:
+            self._db.executescript(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5("
+                " title, content='items', content_rowid='item', tokenize='trigram');"
+                "CREATE TRIGGER IF NOT EXISTS items_fts_insert AFTER INSERT ON items BEGIN"
+                " INSERT INTO items_fts (rowid, title) VALUES (new.item, new.title); END;"
+                "CREATE TRIGGER IF NOT EXISTS items_fts_delete AFTER DELETE ON items BEGIN"
+                " INSERT INTO items_fts (items_fts, rowid, title) VALUES ('delete', old.item, old.title); END;"
+                "CREATE TRIGGER IF NOT EXISTS items_fts_update AFTER UPDATE OF title ON items BEGIN"
+                " INSERT INTO items_fts (items_fts, rowid, title) VALUES ('delete', old.item, old.title);"
+                " INSERT INTO items_fts (rowid, title) VALUES (new.item, new.title); END;"
+            )
+            self.fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite has no FTS5 trigram tokenizer, catalog search falls back to LIKE: {str(e)}")
+            self.fts = False
+        self.pages_indexed = 0
+        self.pages_unchanged = 0
+        self.searches = 0
+
+    def index_page(self, catalog: str, page: int, items: Iterable[Dict[str, Any]], now: Optional[float] = None) -> bool:
+        """Record the cards of one catalog page, returning False when the page had not changed"""
+        items = [item for item in items if item.get("url") and item.get("title")]
+        digest = content_hash(dumps(items))
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM pages WHERE catalog = ? AND page = ?", (catalog, page)
+            ).fetchone()
+            self._db.execute("BEGIN")
+            try:
+                if row is not None and row[0] == digest:
+                    self._db.execute(
+                        "UPDATE items SET seen_at = ? WHERE item IN ("
+                        "SELECT item FROM listings WHERE catalog = ? AND page = ?)",
+                        (now, catalog, page),
+                    )
+                    self._db.execute(
+                        "UPDATE pages SET indexed_at = ? WHERE catalog = ? AND page = ?", (now, catalog, page)
+                    )
+                else:
+                    self._db.execute("DELETE FROM listings WHERE catalog = ? AND page = ?", (catalog, page))
+                    for position, item in enumerate(items):
+                        item_id = self._db.execute(
+                            "INSERT INTO items (url, title, type, year, duration, seen_at)"
+                            " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET"
+                            " title = excluded.title, type = excluded.type, year = excluded.year,"
+                            " duration = excluded.duration, seen_at = excluded.seen_at"
+                            " RETURNING item",
+                            (item["url"], item["title"], item.get("type"), _number(item.get("year")),
+                             _number(item.get("duration")), now),
+                        ).fetchone()[0]
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO cards (item, data) VALUES (?, ?)", (item_id, dumps(item))
+                        )
+                        self._db.execute(
+                            "INSERT OR REPLACE INTO listings (catalog, item, page, position) VALUES (?, ?, ?, ?)",
+                            (catalog, item_id, page, position),
+                        )
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO pages (catalog, page, digest, indexed_at) VALUES (?, ?, ?, ?)",
+                        (catalog, page, digest, now),
+                    )
+                    # Pages whose items all moved here are rewritten when next seen
+                    self._db.execute(
+                        "DELETE FROM pages WHERE catalog = ? AND page != ? AND NOT EXISTS ("
+                        "SELECT 1 FROM listings WHERE listings.catalog = pages.catalog AND listings.page = pages.page)",
+                        (catalog, page),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        changed = row is None or row[0] != digest
+        if changed:
+            self.pages_indexed += 1
+        else:
+            self.pages_unchanged += 1
+        return changed
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        catalog: Optional[str] = None,
+        type: Optional[str] = None,
+        year: Optional[int] = None,
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None,
+        sort: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """Total matches and one page of item cards for a filtered, sorted query
+
+        sort is title, year or duration (prefix "-" for descending),
+        relevance when searching by q, or position (catalog order) when a
+        catalog is given. Raises ValueError for a sort that does not apply.
+        """
+        joins, join_params, where, params = [], [], [], []
+        terms = (q or "").split()
+        matched = [term for term in terms if len(term) >= 3] if self.fts else []
+        if matched:
+            joins.append("JOIN items_fts ON items_fts.rowid = items.item")
+            where.append("items_fts MATCH ?")
+            params.append(" ".join('"' + term.replace('"', '""') + '"' for term in matched))
+        for term in terms:
+            if term not in matched:
+                where.append("items.title LIKE ? ESCAPE '\\'")
+                params.append(_like(term))
+        if catalog is not None:
+            if catalog not in CATALOGS:
+                raise ValueError(f"Unknown catalog {catalog!r}, expected one of {', '.join(CATALOGS)}")
+            joins.append("JOIN listings ON listings.item = items.item AND listings.catalog = ?")
+            join_params.append(catalog)
+        if type is not None:
+            where.append("items.type = ? COLLATE NOCASE")
+            params.append(type)
+        if year is not None:
+            where.append("items.year = ?")
+            params.append(year)
+        if year_from is not None:
+            where.append("items.year >= ?")
+            params.append(year_from)
+        if year_to is not None:
+            where.append("items.year <= ?")
+            params.append(year_to)
+
+        sort = sort or ("relevance" if matched else "position" if catalog else "title")
+        if sort == "relevance":
+            if not matched:
+                raise ValueError("sort=relevance needs a search term of at least 3 characters")
+            order = ["bm25(items_fts)"]
+        elif sort == "position":
+            if catalog is None:
+                raise ValueError("sort=position needs a catalog")
+            order = ["listings.page", "listings.position"]
+        else:
+            if (sort[1:] if sort.startswith("-") else sort) not in SORTS:
+                raise ValueError(f"Unknown sort {sort!r}, expected one of title, year, duration, "
+                                 "relevance or position, with '-' for descending")
+            column, nullable = SORTS[sort.lstrip("-")]
+            # A bare column lets SQLite walk its index in order instead of sorting every match
+            order = [f"{column} IS NULL"] if nullable else []
+            order.append(f"{column} DESC" if sort.startswith("-") else column)
+        order.append("items.item")
+        filtered = len(where) > (1 if matched else 0)
+        params = join_params + params
+
+        source = "FROM items " + " ".join(joins) + (" WHERE " + " AND ".join(where) if where else "")
+        # A match count that needs no item columns is taken from the FTS table or listings alone
+        if matched and catalog is None and not filtered:
+            count = "SELECT COUNT(*) FROM items_fts WHERE items_fts MATCH ?"
+        elif catalog is not None and not matched and not filtered:
+            count = "SELECT COUNT(*) FROM listings WHERE catalog = ?"
+        else:
+            count = f"SELECT COUNT(*) {source}"
+        with self._lock:
+            total = self._db.execute(count, params).fetchone()[0]
+            ids = [row[0] for row in self._db.execute(
+                f"SELECT items.item {source} ORDER BY {', '.join(order)} LIMIT ? OFFSET ?", (*params, limit, offset)
+            )]
+            cards = dict(self._db.execute(
+                f"SELECT item, data FROM cards WHERE item IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()) if ids else {}
+        self.searches += 1
+        return total, [loads(cards[item]) for item in ids]
+
+    def prune(self, older_than: float) -> int:
+        """Drop items no crawl or request has seen since older_than, returning how many were removed"""
+        with self._lock:
+            removed = self._db.execute("DELETE FROM items WHERE seen_at < ?", (older_than,)).rowcount
+            self._db.execute(
+                "DELETE FROM pages WHERE NOT EXISTS ("
+                "SELECT 1 FROM listings WHERE listings.catalog = pages.catalog AND listings.page = pages.page)"
+            )
+            # Refresh the planner statistics now that a crawl pass has filled the tables
+            self._db.execute("PRAGMA optimize")
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = self._db.execute("DELETE FROM items").rowcount
+            self._db.execute("DELETE FROM pages")
+        return removed
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            catalogs = dict(self._db.execute("SELECT catalog, COUNT(*) FROM listings GROUP BY catalog").fetchall())
+            pages = dict(self._db.execute("SELECT catalog, COUNT(*) FROM pages GROUP BY catalog").fetchall())
+            page_count = self._db.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "path": self.path,
+            "full_text": self.fts,
+            "items": self.count(),
+            "catalogs": {name: {"items": catalogs.get(name, 0), "pages": pages.get(name, 0)} for name in CATALOGS},
+            "bytes": page_count * page_size,
+            "pages_indexed": self.pages_indexed,
+            "pages_unchanged": self.pages_unchanged,
+            "searches": self.searches,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class CatalogCrawler:
+    """Walks the catalogs page by page in the background so the index covers pages nobody requested
+
+    Each pass visits pages 1..max_pages of every catalog, one page at a time
+    and spacing seconds apart, and stops a catalog early at its first missing
+    page. crawl(catalog, page) fetches and indexes a page, returning its item
+    count, or None when the catalog has no such page; pages still fresh in
+    the response cache cost no upstream request. After a full pass, items not
+    seen for max_age seconds are pruned.
+    """
+
+    def __init__(
+        self,
+        crawl: Callable[[str, int], Awaitable[Optional[int]]],
+        prune: Callable[[float], Awaitable[int]],
+        catalogs: Iterable[str] = CATALOGS,
+        max_pages: int = 50,
+        interval: float = 3600.0,
+        spacing: float = 1.0,
+        max_age: float = 7 * 86400.0,
+    ):
+        self.crawl = crawl
+        self.prune = prune
+        self.catalogs = list(catalogs)
+        self.max_pages = max_pages
+        self.interval = interval
+        self.spacing = spacing
+        self.max_age = max_age
+        self.passes = 0
+        self.pages = 0
+        self.items = 0
+        self.errors = 0
+        self.pruned = 0
+        self.current: Optional[Tuple[str, int]] = None
+        self.last_pass: Optional[Dict[str, Any]] = None
+        self.recent_errors: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+    async def crawl_catalog(self, catalog: str) -> int:
+        """Crawl one catalog up to max_pages or its first missing page, returning the pages visited"""
+        for page in range(1, self.max_pages + 1):
+            if page > 1:
+                await asyncio.sleep(self.spacing)
+            self.current = (catalog, page)
+            try:
+                items = await self.crawl(catalog, page)
+            except Exception as e:
+                self.errors += 1
+                error = str(e) or type(e).__name__
+                self.recent_errors.append({"catalog": catalog, "page": page, "error": error, "at": time.time()})
+                logger.warning(f"Crawling {catalog} page {page} failed: {error}")
+                continue
+            finally:
+                self.current = None
+            if items is None:
+                return page - 1
+            self.pages += 1
+            self.items += items
+        return self.max_pages
+
+    async def run_pass(self) -> Dict[str, Any]:
+        """Crawl every catalog once, then prune items that have dropped out of them"""
+        started = time.time()
+        visited = {}
+        for catalog in self.catalogs:
+            visited[catalog] = await self.crawl_catalog(catalog)
+        removed = await self.prune(started - self.max_age)
+        self.passes += 1
+        self.pruned += removed
+        self.last_pass = {
+            "started_at": started,
+            "duration_s": round(time.time() - started, 1),
+            "pages": visited,
+            "pruned": removed,
+        }
+        return self.last_pass
+
+    async def run(self) -> None:
+        """Crawl until cancelled"""
+        while True:
+            try:
+                await self.run_pass()
+            except Exception as e:
+                logger.error(f"Catalog crawl pass failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "pages_crawled": self.pages,
+            "items_seen": self.items,
+            "errors": self.errors,
+            "pruned_items": self.pruned,
+            "crawling": {"catalog": self.current[0], "page": self.current[1]} if self.current else None,
+            "last_pass": self.last_pass,
+            "recent_errors": list(self.recent_errors),
+        }
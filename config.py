@@ -2,8 +2,11 @@
 Configuration settings for Movies & Anime API
 """
 import os
-from typing import List
-from pydantic import BaseSettings
+from typing import Dict, List
+try:
+    from pydantic_settings import BaseSettings
+except ImportError:  # pydantic v1
+    from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     """Application settings with environment variable support"""
@@ -27,15 +30,121 @@ class Settings(BaseSettings):
     
     # Cache Configuration
     CACHE_TTL: int = 300  # 5 minutes
+    CACHE_STALE_WHILE_REVALIDATE: int = 600  # serve stale and refresh in background
+    CACHE_STALE_IF_ERROR: int = 3600  # serve stale when the upstream scrape fails
     MAX_CACHE_SIZE: int = 1000
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # memory budget of the response cache
+    CACHE_SWEEP_INTERVAL: float = 1.0  # seconds between expiry sweeps
+    CACHE_BACKEND: str = "memory"  # memory, redis or tiered (in-process L1 in front of redis)
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "ent_api:"
+    CACHE_L1_TTL: float = 30.0  # seconds a tiered L1 copy is served without checking redis
+    CACHE_DISK_PATH: str = ""  # SQLite file that keeps entries across restarts, disabled when empty
+    CACHE_DISK_PREFIXES: List[str] = [
+        "movies_page_", "tv_shows_page_", "top_imdb_movies_page_", "top_imdb_tv_page_",
+        "movie_details_", "tv_details_", "anime_details_",
+    ]
+    CACHE_DISK_MAX_ENTRIES: int = 200000
+    CACHE_DISK_COMPACT_INTERVAL: float = 600.0  # seconds between disk compactions
+    SINGLEFLIGHT_MAX_WAITERS: int = 1000  # requests allowed to wait on one in-flight fetch
+    CACHE_REVALIDATE_PREFIXES: List[str] = [  # keys loaded from one upstream page, refreshed conditionally
+        "movies_page_", "tv_shows_page_", "top_imdb_movies_page_", "top_imdb_tv_page_",
+        "home_snapshot", "movie_details_", "tv_details_",
+    ]
+    RESPONSE_COMPRESS_MIN_BYTES: int = 1024  # smaller cached bodies are only kept uncompressed
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 5  # 0-11; higher is smaller but slower to build
     
     # Request Configuration
     REQUEST_TIMEOUT: int = 10
     MAX_RETRIES: int = 3
     
+    # Upstream HTTP client
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE: int = 40
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_HTTP2: bool = True
+    UPSTREAM_DNS_TTL: int = 300  # seconds
+    UPSTREAM_HOST_LIMITS: Dict[str, int] = {
+        "lookmoviess.com": 20,
+        "gogoanime.ai": 10,
+        "gogoanime.lu": 10,
+        "streamsb.net": 5,
+        "animetitans.com": 5,
+    }
+    UPSTREAM_DEFAULT_HOST_LIMIT: int = 20  # in-flight cap for hosts not listed above
+    UPSTREAM_MIN_HOST_LIMIT: int = 1  # the adaptive limit never shrinks below this
+    UPSTREAM_SLOW_SECONDS: float = 5.0  # responses slower than this shrink the host's limit
+    UPSTREAM_MAX_QUEUE: int = 100  # fetches waiting per host before new ones are refused
+    UPSTREAM_BREAKER_ENABLED: bool = True
+    UPSTREAM_BREAKER_WINDOW: int = 20  # recent outcomes per host the breaker looks at
+    UPSTREAM_BREAKER_MIN_REQUESTS: int = 10
+    UPSTREAM_BREAKER_FAILURE_RATIO: float = 0.5
+    UPSTREAM_BREAKER_OPEN_SECONDS: float = 30.0
+    UPSTREAM_OVERRIDE: str = ""  # base URL that receives every upstream request, e.g. the load-test stub
+    UPSTREAM_VALIDATORS_MAX: int = 10000  # pages whose ETag, Last-Modified and body hash are remembered
+    
+    # Cache warmer
+    WARMER_ENABLED: bool = True
+    WARMER_KEYS: List[str] = [
+        "home_snapshot", "movies_page_1", "tv_shows_page_1", "top_imdb_movies_page_1", "top_imdb_tv_page_1",
+    ]
+    WARMER_MAX_KEYS: int = 50  # configured keys plus the most requested ones
+    WARMER_REFRESH_AHEAD: float = 30.0  # seconds before expiry a hot key is refreshed
+    WARMER_INTERVAL: float = 5.0  # seconds between scheduler checks
+    WARMER_CONCURRENCY: int = 2  # refreshes running at once
+    WARMER_SPACING: float = 0.5  # seconds between refresh starts
+    WARMER_MAX_BACKOFF: float = 600.0  # longest wait before retrying a key whose refreshes fail
+    WARMER_MAX_FAILURES: int = 5  # consecutive failures before a requested key stops being warmed
+    
+    # Catalog streams
+    STREAM_CONCURRENCY: int = 4  # pages a stream fetches at once by default
+    STREAM_MAX_CONCURRENCY: int = 16
+    STREAM_MAX_PAGES: int = 1000  # pages one stream may cover
+    
+    # Catalog index
+    CATALOG_INDEX_ENABLED: bool = True  # index catalog pages for /api/catalog/search
+    CATALOG_INDEX_PATH: str = ""  # SQLite file of the index, kept in memory when empty
+    CATALOG_INDEX_MAX_AGE: float = 7 * 86400  # seconds before items no crawl has seen are dropped
+    CATALOG_SEARCH_MAX_LIMIT: int = 100
+    CATALOG_CRAWL_ENABLED: bool = False  # enable in one process only, with a shared CATALOG_INDEX_PATH
+    CATALOG_CRAWL_PAGES: int = 50  # pages of each catalog a crawl pass visits
+    CATALOG_CRAWL_INTERVAL: float = 3600.0  # seconds between crawl passes
+    CATALOG_CRAWL_SPACING: float = 1.0  # seconds between page fetches of a pass
+    
+    # Batch endpoint
+    BATCH_MAX_ITEMS: int = 50
+    BATCH_CONCURRENCY: int = 8  # upstream loads one batch may run at once
+    
+    # Episode stream resolution
+    EPISODE_SERVER_TIMEOUT: float = 5.0  # seconds each streaming server gets to answer
+    DETAILS_EPISODE_LIMIT: int = 50  # episode links /details lists when no limit is given
+    DETAILS_EPISODE_MAX_LIMIT: int = 1000
+    
+    # Parsing
+    PARSE_WORKERS: int = 0  # worker processes for movie/TV detail pages, 0 parses them in threads
+    
+    # Metrics
+    METRICS_ENABLED: bool = True  # serve /metrics and record per-route request latency
+    
+    # Tracing
+    TRACING_ENABLED: bool = True  # per-stage timings in a Server-Timing response header
+    TRACE_LOG_SAMPLE_RATE: float = 0.0  # fraction of requests logged as JSON trace lines
+    TRACE_LOG_SLOW_MS: float = 2000  # always log requests slower than this, 0 disables
+    
     # Rate Limiting
-    RATE_LIMIT_REQUESTS: int = 100
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS: int = 100  # per client, also the burst size
     RATE_LIMIT_WINDOW: int = 60  # seconds
+    RATE_LIMIT_ROUTES: Dict[str, int] = {  # path prefix -> stricter per-client limit per window
+        "/api/batch": 20,
+        "/episode": 30,
+    }
+    RATE_LIMIT_CLIENTS: Dict[str, int] = {}  # client address -> its own limit, 0 for unlimited
+    RATE_LIMIT_EXEMPT: List[str] = ["/api/health", "/metrics"]
+    RATE_LIMIT_TRUST_FORWARDED: bool = False  # identify clients by X-Forwarded-For (only behind a proxy)
+    RATE_LIMIT_MAX_CLIENTS: int = 200000  # least recently seen clients are dropped beyond this
+    RATE_LIMIT_SWEEP_INTERVAL: float = 10.0  # seconds between sweeps of idle clients
     
     # Logging Configuration
     LOG_LEVEL: str = "INFO"
@@ -6,37 +6,109 @@ import requests
 import json
 
 from requests.api import request
+from upstream import fetch, fetch_text
+from parsing import run_parse, make_soup, LAST_EPISODES, CardSchema, Field
+
 def bsoup(text):
     soup = BeautifulSoup(text,'lxml')
     return soup
 
 base_url = 'https://gogoanime.ai/'
 
+SEARCH_ITEM = CardSchema({
+    "title": Field('a', attr='title'),
+    "slug": Field('a', attr='href', transform=lambda href: href.split('/')[-1]),
+    "thumbnail": Field('img', attr='src'),
+})
+
+def parse_search(text):
+    soup = make_soup(text, LAST_EPISODES)
+    search_items = soup.find('div',attrs = {'class':'last_episodes'}).find_all('li')
+    return SEARCH_ITEM.extract_all(search_items)
+
+def parse_details(text):
+    """Extract anime information from a category page, or None if it has none"""
+    soup = bsoup(text)
+    anime_info = soup.find('div', attrs={"class": "anime_info_body_bg"})
+    if not anime_info:
+        return None
+
+    title = anime_info.h1.text if anime_info.h1 else "Unknown Title"
+    thumbnail = anime_info.img.get('src') if anime_info.img else ""
+
+    episode_page = soup.find('ul', attrs={"id": "episode_page"})
+    ep_end = episode_page.find('li').a.get("ep_end") if episode_page else "1"
+
+    desc_info = anime_info.find_all('p', attrs={"class": "type"})
+
+    # Safely extract information with defaults
+    anime_type = desc_info[0].text.replace('\n', '').strip().replace('Type: ', '') if len(desc_info) > 0 else "Unknown"
+    desc = desc_info[1].text.replace('\n', '').strip().replace('Plot Summary: ', '') if len(desc_info) > 1 else "No description available"
+    genre = desc_info[2].text.replace('\n', '').strip().replace('Genre: ', '') if len(desc_info) > 2 else "Unknown"
+    released = desc_info[3].text.replace('\n', '').strip().replace('Released: ', '') if len(desc_info) > 3 else "Unknown"
+    status = desc_info[4].text.replace('\n', '').strip().replace('Status: ', '') if len(desc_info) > 4 else "Unknown"
+    other_name = desc_info[5].text.replace('\n', '').strip().replace('Other name: ', '') if len(desc_info) > 5 else ""
+
+    return {
+        "title": title,
+        "thumbnail": thumbnail,
+        "type": anime_type,
+        "summary": desc,
+        "genre": genre,
+        "release_year": released,
+        "status": status,
+        "other_name": other_name,
+        "total_episodes": ep_end,
+    }
+
+def parse_episode_servers(text):
+    """Return the data-video value of every streaming server link, or None if the page has no server list"""
+    soup = bsoup(text)
+    links_div = soup.find('div', attrs={"class": "anime_muti_link"})
+    if not links_div:
+        return None
+    return [x.get('data-video') for x in links_div.find_all('a')]
+
+def gogo_ajax_url(url):
+    return 'https:'+  url.replace('streaming','ajax').replace('load','ajax')
+
 def search_anime(text):
     search_url = f'{base_url}/search.html?keyword={text}'
     html = requests.get(search_url)
-    soup = bsoup(html.text)
-    search_items = soup.find('div',attrs = {'class':'last_episodes'}).find_all('li')
-    data = [{
-        "title": x.a.get('title'),
-        "slug": x.a.get('href').split('/')[-1],
-        "thumbnail": x.img.get('src')
-    } for x in search_items]
-    return data
+    return parse_search(html.text)
+
+async def search_anime_async(text):
+    search_url = f'{base_url}/search.html?keyword={text}'
+    html = await fetch_text(search_url)
+    return await run_parse(parse_search, html)
 
 def gogo_play(url):
-    url = 'https:'+  url.replace('streaming','ajax').replace('load','ajax')
-    html = json.loads(requests.get(url).text)
+    html = json.loads(requests.get(gogo_ajax_url(url)).text)
     return html["source"][0]['file']
 
-def streamsb(slug):    
+async def gogo_play_async(url):
+    response = await fetch(gogo_ajax_url(url))
+    return response.json()["source"][0]['file']
+
+def streamsb_download_url(text):
+    soup = bsoup(text)
+    list = soup.find('table',attrs={"width":"60%"}).find_all('a')[-1].get('onclick').replace('download_video(','').replace(')','').replace("'",'').split(',')
+    return f'https://streamsb.net/dl?op=download_orig&id={list[0]}&mode={list[1]}&hash={list[2]}'
+
+def streamsb_direct_link(text):
+    soup = bsoup(text)
+    return soup.find("a",text="Direct Download Link").get('href')
+
+def streamsb(slug):
     url = f"https://streamsb.net/d/{slug}"
     html = requests.get(url)
-    soup = bsoup(html.text)
-    list = soup.find('table',attrs={"width":"60%"}).find_all('a')[-1].get('onclick').replace('download_video(','').replace(')','').replace("'",'').split(',')
-    url = f'https://streamsb.net/dl?op=download_orig&id={list[0]}&mode={list[1]}&hash={list[2]}'
+    url = streamsb_download_url(html.text)
     print(url)
     html = requests.get(url)
-    soup = bsoup(html.text)
-    link = soup.find("a",text="Direct Download Link").get('href')
-    return link
\ No newline at end of file
+    return streamsb_direct_link(html.text)
+
+async def streamsb_async(slug):
+    html = await fetch_text(f"https://streamsb.net/d/{slug}")
+    url = await run_parse(streamsb_download_url, html)
+    html = await fetch_text(url)
+    return await run_parse(streamsb_direct_link, html)
@@ -1,8 +1,8 @@
 """
 Pydantic models for API request/response validation
 """
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, HttpUrl
+from typing import List, Optional, Dict, Any, Literal
+from pydantic import BaseModel, Field, HttpUrl, model_validator
 
 class MovieBase(BaseModel):
     """Base movie model"""
@@ -76,4 +76,56 @@ class ErrorResponse(BaseModel):
     """Error response model"""
     error: str = Field(..., description="Error type")
     detail: str = Field(..., description="Error details")
-    timestamp: Optional[float] = Field(None, description="Error timestamp")
\ No newline at end of file
+    timestamp: Optional[float] = Field(None, description="Error timestamp")
+
+# Parameters each batch item type needs
+BATCH_ITEM_PARAMS = {
+    "movies": ("page",),
+    "tv_shows": ("page",),
+    "top_imdb_movies": ("page",),
+    "top_imdb_tv": ("page",),
+    "movie": ("id",),
+    "tv": ("id",),
+    "home": (),
+    "anime_search": ("name",),
+    "anime_details": ("slug",),
+    "episode": ("slug", "ep"),
+}
+
+class BatchItem(BaseModel):
+    """One lookup inside a batch request"""
+    type: Literal[
+        "movies", "tv_shows", "top_imdb_movies", "top_imdb_tv", "movie", "tv",
+        "home", "anime_search", "anime_details", "episode"
+    ] = Field(..., description="Kind of lookup, named after the matching endpoint")
+    page: Optional[int] = Field(None, ge=1, description="Page number for catalog lookups")
+    id: Optional[str] = Field(None, min_length=1, description="Movie or TV show ID")
+    name: Optional[str] = Field(None, min_length=1, description="Anime name to search for")
+    slug: Optional[str] = Field(None, min_length=1, description="Anime slug identifier")
+    ep: Optional[int] = Field(None, ge=1, description="Episode number")
+
+    @model_validator(mode="after")
+    def check_params(self) -> "BatchItem":
+        missing = [name for name in BATCH_ITEM_PARAMS[self.type] if getattr(self, name) is None]
+        if missing:
+            raise ValueError(f"'{self.type}' lookups require {', '.join(missing)}")
+        return self
+
+class BatchRequest(BaseModel):
+    """Batch of lookups served in one round trip"""
+    requests: List[BatchItem] = Field(..., min_length=1, description="Lookups to run")
+
+class BatchItemResult(BaseModel):
+    """Outcome of one batch item, in request order"""
+    type: str = Field(..., description="Lookup type")
+    status: int = Field(..., description="HTTP status the matching endpoint would have returned")
+    data: Any = Field(None, description="Response data on success")
+    cached: Optional[bool] = Field(None, description="Whether data was served from cache")
+    stale: Optional[bool] = Field(None, description="Present when expired data was served")
+    error: Optional[str] = Field(None, description="Error detail on failure")
+
+class BatchResponse(BaseModel):
+    """Batch endpoint response"""
+    results: List[BatchItemResult] = Field(..., description="One result per requested item")
+    succeeded: int = Field(..., description="Number of items that returned data")
+    failed: int = Field(..., description="Number of items that failed")
@@ -0,0 +1,191 @@
+"""
+Helpers for running the HTML parsers
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from metrics import PARSE_DURATION
+from tracing import span
+
+try:
+    import lxml  # noqa: F401
+    PARSER_BACKEND = "lxml"
+except ImportError:  # several times slower, but always available
+    PARSER_BACKEND = "html.parser"
+
+logger = logging.getLogger(__name__)
+
+
+def make_soup(markup: Any, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """Parse markup with the fastest installed backend, keeping only the parse_only subtrees"""
+    return BeautifulSoup(markup, PARSER_BACKEND, parse_only=parse_only)
+
+
+def _home_blocks(name: str, attrs: Dict[str, Any]) -> bool:
+    if name != "div":
+        return False
+    if attrs.get("id") in HOME_SECTION_IDS:
+        return True
+    classes = attrs.get("class") or ""
+    if isinstance(classes, str):
+        classes = classes.split()
+    return "film_list-wrap" in classes
+
+
+# Strainers for the listing pages: only the matched elements and their
+# descendants are turned into tags, the rest of the page is skipped
+CARDS = SoupStrainer("div", class_="flw-item")
+LAST_EPISODES = SoupStrainer("div", class_="last_episodes")
+ITEMS = SoupStrainer("ul", class_="items")
+HOME_SECTION_IDS = {"trending-movies", "trending-tv", "popular-movies", "popular-tv"}
+HOME_BLOCKS = SoupStrainer(_home_blocks)
+
+
+class Field:
+    """One value of a card: the nth descendant matching tag and classes, as text or an attribute"""
+
+    def __init__(
+        self,
+        tag: str,
+        classes: Iterable[str] = (),
+        attr: Optional[str] = None,
+        nth: int = 0,
+        transform: Optional[Callable[[str], Any]] = None,
+    ):
+        self.tag = tag
+        self.classes = frozenset([classes] if isinstance(classes, str) else classes)
+        self.attr = attr
+        self.nth = nth
+        self.transform = transform
+
+    def value(self, node: Any) -> Any:
+        value = node.get(self.attr, "") if self.attr else node.get_text()
+        return self.transform(value) if self.transform else value
+
+
+class CardSchema:
+    """Extracts a dict of fields from each card in one pass over its descendants
+
+    Fields are compiled into a lookup by tag name, so every element of a card
+    is inspected once however many fields there are, and the walk stops as
+    soon as all fields are found. Fields sharing a selector share its match
+    count, so nth picks between them. Missing fields come back as "".
+    """
+
+    def __init__(self, fields: Dict[str, Field]):
+        self.fields = fields
+        # (tag, required classes) -> {nth: [field names]}
+        selectors: Dict[Tuple[str, FrozenSet[str]], Dict[int, List[str]]] = {}
+        for name, field in fields.items():
+            selectors.setdefault((field.tag, field.classes), {}).setdefault(field.nth, []).append(name)
+        # tag -> [(selector index, required classes, {nth: [field names]})]
+        self._by_tag: Dict[str, List[Tuple[int, FrozenSet[str], Dict[int, List[str]]]]] = {}
+        for index, ((tag, classes), by_nth) in enumerate(selectors.items()):
+            self._by_tag.setdefault(tag, []).append((index, classes, by_nth))
+        self._selector_count = len(selectors)
+
+    def only(self, *names: str) -> "CardSchema":
+        """A schema with a subset of the fields, in the given order"""
+        return CardSchema({name: self.fields[name] for name in names})
+
+    def extract(self, card: Any) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        counts = [0] * self._selector_count
+        remaining = len(self.fields)
+        by_tag = self._by_tag
+        for node in card.descendants:
+            selectors = by_tag.get(node.name)
+            if selectors is None:
+                continue
+            classes = node.get("class") or ()
+            for index, required, by_nth in selectors:
+                if required and not required.issubset(classes):
+                    continue
+                names = by_nth.get(counts[index])
+                counts[index] += 1
+                if names:
+                    for name in names:
+                        values[name] = self.fields[name].value(node)
+                    remaining -= len(names)
+            if not remaining:
+                break
+        return {name: values.get(name, "") for name in self.fields}
+
+    def extract_all(self, cards: Iterable[Any]) -> List[Dict[str, Any]]:
+        return [self.extract(card) for card in cards]
+
+
+async def run_parse(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a CPU-bound parse function off the event loop"""
+    start = time.perf_counter()
+    try:
+        with span("parse"):
+            return await asyncio.to_thread(func, *args)
+    finally:
+        PARSE_DURATION.observe(time.perf_counter() - start, func.__name__, "thread")
+
+
+# Parse worker processes
+#
+# Threads keep the event loop free but still share one GIL, so large detail
+# pages can be handed to worker processes instead. Workers receive the raw
+# page bytes and send back the plain data the parse function returns.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_tasks = 0
+
+
+def start_parse_pool(workers: int) -> Optional[ProcessPoolExecutor]:
+    """Start the parse worker processes, or leave heavy parses on threads when workers is 0"""
+    global _pool, _pool_workers
+    shutdown_parse_pool()
+    if workers > 0:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_parse_pool() -> None:
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _pool_workers = 0
+
+
+def parse_pool_stats() -> Dict[str, Any]:
+    return {
+        "executor": "process" if _pool is not None else "thread",
+        "workers": _pool_workers,
+        "tasks": _pool_tasks,
+    }
+
+
+async def run_parse_heavy(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a parse of a large page in a worker process when the pool is running, else in a thread
+
+    func must be a module-level function so it can be sent to the workers.
+    """
+    global _pool_tasks
+    if _pool is None:
+        return await run_parse(func, *args)
+    _pool_tasks += 1
+    start = time.perf_counter()
+    try:
+        with span("parse"):
+            result = await asyncio.get_running_loop().run_in_executor(_pool, func, *args)
+        PARSE_DURATION.observe(time.perf_counter() - start, func.__name__, "process")
+        return result
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); replace the pool and parse here this time
+        logger.warning("Parse worker pool broke, restarting it")
+        start_parse_pool(_pool_workers)
+        return await run_parse(func, *args)
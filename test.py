@@ -1,15 +1,56 @@
 """
 Comprehensive test suite for Movies & Anime API
 """
+import json
+import time
+import socket
 import pytest
 import asyncio
 import httpx
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from api import app
+import api
+import upstream
+from bs4 import BeautifulSoup
+import MoviesApi
+import parsing
+from parsing import CardSchema, Field
+from MoviesApi import AsyncHomeMoviesApi, parse_movie_list, parse_tv_list, parse_tv_section, parse_homepage
+from utils import SingleFlight, SingleFlightBusy, RateLimiter, RateLimitMiddleware, rate_limiter, route_rate_limiters
+from warmer import CacheWarmer
+from catalog import CatalogCrawler, CatalogIndex
+import metrics
+import tracing
+from cache import content_hash, dumps, CacheEngine, MemoryBackend, RedisBackend, TieredBackend, DiskStore, PersistentBackend
+from benchmarks.redis_standin import RedisStandIn
+from benchmarks.stub_upstream import StubUpstream, fixture_for, load_fixture
 
 # Test client
 client = TestClient(app)
 
+def fixture_upstream(request):
+    """Mock transport handler serving recorded pages for upstream URLs"""
+    name = fixture_for(str(request.url))
+    if name is None:
+        return httpx.Response(404, text="Not found")
+    return httpx.Response(200, text=load_fixture(name))
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Start every test with fresh rate limit buckets for the test client"""
+    for limiter in (rate_limiter, *route_rate_limiters.values()):
+        limiter.buckets.clear()
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Route every upstream fetch to the recorded fixtures and start with an empty cache"""
+    mock_client = upstream.UpstreamClient(transport=httpx.MockTransport(fixture_upstream))
+    monkeypatch.setattr(upstream, "get_client", lambda: mock_client)
+    asyncio.run(api.cache.clear())
+    yield mock_client
+    asyncio.run(api.cache.clear())
+
 class TestMoviesAPI:
     """Test cases for movies endpoints"""
     
@@ -117,6 +158,1157 @@ class TestErrorHandling:
         response = client.get("/api/tv/")
         assert response.status_code == 404  # Not found
 
+class TestOfflineScraping:
+    """Test cases for the async scraping layer against recorded pages"""
+    
+    def test_async_api_matches_parser(self, offline):
+        """Test the awaitable scrapers return the same data as the parsers"""
+        movies = asyncio.run(AsyncHomeMoviesApi.Movies(1))
+        assert movies == parse_movie_list(load_fixture("lookmovies_movies.html"))
+        assert len(movies) == 32
+        trending = asyncio.run(AsyncHomeMoviesApi.trendingTV())
+        assert trending == parse_tv_section(load_fixture("lookmovies_home.html"), "trending-tv")
+    
+    def test_movies_route(self, offline):
+        """Test movies route is served from the async scraper"""
+        response = client.get("/api/movies/1")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["page"] == 1
+        assert len(data["data"]) == 32
+    
+    def test_trending_movies_route(self, offline):
+        """Test trending movies route works inside the running event loop"""
+        response = client.get("/api/trending_movies")
+        assert response.status_code == 200
+        assert len(response.json()["data"]) == 24
+    
+    def test_details_route(self, offline):
+        """Test anime details are parsed off the event loop and list one range of episodes"""
+        response = client.get("/details?slug=naruto")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["title"] == "Naruto"
+        assert data["total_episodes"] == "220"
+        assert data["ep_end"] == 220
+        assert data["episode_url_template"] == "http://testserver/episode?slug=naruto&ep={ep}"
+        assert len(data["episodes"]) == api.settings.DETAILS_EPISODE_LIMIT
+        
+        data = client.get("/details?slug=naruto&offset=200&limit=50").json()["data"]
+        assert data["episodes"][0] == {"episode_201": "http://testserver/episode?slug=naruto&ep=201"}
+        assert len(data["episodes"]) == 20
+        assert "episodes" not in asyncio.run(api.get_cached_data("anime_details_naruto"))
+        assert client.get("/details?slug=naruto&limit=0").status_code == 422
+    
+    def test_episode_route(self, offline):
+        """Test episode stream links are resolved from the first three servers"""
+        response = client.get("/episode?slug=naruto&ep=1")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["total_servers"] == 3
+        assert data["stream_links"][0]["server"] == "GGA"
+    
+    def test_episode_servers_resolve_concurrently(self, monkeypatch):
+        """Test servers are resolved in parallel, with min_links, servers=all and the per-server timeout"""
+        delays = {"MTgxNzQ0": 0.3, "MTgxNzQ1": 0.1, "MTgxNzQ2": 0.2, "MTgxNzQ5": 5}
+        
+        async def slow_ajax(request):
+            await asyncio.sleep(delays.get(request.url.params.get("id"), 0))
+            return fixture_upstream(request)
+        
+        mock_client = upstream.UpstreamClient(transport=httpx.MockTransport(slow_ajax))
+        monkeypatch.setattr(upstream, "get_client", lambda: mock_client)
+        monkeypatch.setattr(api.settings, "EPISODE_SERVER_TIMEOUT", 0.5)
+        asyncio.run(api.cache.clear())
+        
+        start = time.perf_counter()
+        response = client.get("/episode?slug=naruto&ep=1")
+        assert time.perf_counter() - start < 0.55
+        assert [link["server"] for link in response.json()["data"]["stream_links"]] == ["GGA", "Server_2", "Server_3"]
+        
+        start = time.perf_counter()
+        response = client.get("/episode?slug=naruto&ep=1&min_links=1")
+        assert time.perf_counter() - start < 0.25
+        assert [link["server"] for link in response.json()["data"]["stream_links"]] == ["Server_2"]
+        
+        data = client.get("/episode?slug=naruto&ep=1&servers=all").json()["data"]
+        assert data["total_servers"] == 5  # the sixth server times out
+        assert client.get("/episode?slug=naruto&ep=1&servers=none").status_code == 422
+        asyncio.run(api.cache.clear())
+    
+    def test_strained_parse_matches_full_document(self, monkeypatch):
+        """Test parsing only the needed subtrees gives the same data as parsing whole pages"""
+        pages = {
+            "movies": parse_movie_list(load_fixture("lookmovies_movies.html")),
+            "tv": parse_tv_list(load_fixture("lookmovies_tv.html")),
+            "home": parse_homepage(load_fixture("lookmovies_home.html")),
+        }
+        monkeypatch.setattr(MoviesApi, "make_soup", lambda markup, parse_only=None: BeautifulSoup(markup, "html.parser"))
+        assert pages["movies"] == parse_movie_list(load_fixture("lookmovies_movies.html"))
+        assert pages["tv"] == parse_tv_list(load_fixture("lookmovies_tv.html"))
+        assert pages["home"] == parse_homepage(load_fixture("lookmovies_home.html"))
+
+class TestParsePool:
+    """Test cases for parsing detail pages in worker processes"""
+    
+    def test_worker_parse_matches_thread_parse(self):
+        """Test a detail page parsed in a worker process returns the same data"""
+        page = load_fixture("lookmovies_tv_detail.html").encode()
+        parsing.start_parse_pool(1)
+        try:
+            result = asyncio.run(parsing.run_parse_heavy(MoviesApi.parse_tv_details, page))
+            stats = parsing.parse_pool_stats()
+        finally:
+            parsing.shutdown_parse_pool()
+        assert result == MoviesApi.parse_tv_details(page)
+        assert stats == {"executor": "process", "workers": 1, "tasks": stats["tasks"]}
+        assert parsing.parse_pool_stats()["executor"] == "thread"
+
+class TestCardSchema:
+    """Test cases for declarative card extraction"""
+    
+    def test_fields_nth_and_missing(self):
+        """Test fields sharing a selector are picked by position and missing fields come back empty"""
+        schema = CardSchema({
+            "season": Field("span", "fdi-item"),
+            "eps": Field("span", "fdi-item", nth=1),
+            "type": Field("span", ("float-right", "fdi-type")),
+            "url": Field("a", attr="href", transform=lambda href: f"https://example.com{href}"),
+            "rating": Field("span", "rating"),
+        })
+        card = BeautifulSoup(
+            '<div><a href="/tv/1">x</a><span class="fdi-item">SS 2</span>'
+            '<span class="fdi-item">EPS 8</span><span class="float-right fdi-type">TV</span></div>',
+            "html.parser",
+        ).div
+        assert schema.extract(card) == {
+            "season": "SS 2", "eps": "EPS 8", "type": "TV", "url": "https://example.com/tv/1", "rating": "",
+        }
+        assert list(schema.only("url", "type").extract(card)) == ["url", "type"]
+
+class TestCacheWarmer:
+    """Test cases for the background cache warmer"""
+    
+    def test_refreshes_due_hot_keys_within_budget(self):
+        """Test only keys near expiry are refreshed, hot keys are ranked by hits and concurrency is capped"""
+        ages = {"home_snapshot": 290, "movies_page_1": 10, "movies_page_7": 295, "movies_page_9": None}
+        active = {"now": 0, "peak": 0}
+        
+        async def refresh(key):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            if key == "movies_page_9":
+                raise RuntimeError("upstream down")
+        
+        async def age_of(key):
+            return ages.get(key)
+        
+        async def run():
+            warmer = CacheWarmer(
+                refresh, age_of, accepts=lambda key: not key.startswith("anime_details_"), ttl=300,
+                keys=["home_snapshot", "movies_page_1"], max_keys=4, refresh_ahead=30, concurrency=1, spacing=0,
+            )
+            for key, hits in (("movies_page_7", 5), ("movies_page_9", 3), ("movies_page_8", 1), ("anime_details_x", 9)):
+                for _ in range(hits):
+                    warmer.record_hit(key)
+            hot = warmer.hot_keys()
+            started = await warmer.tick()
+            await warmer.wait()
+            return hot, started, warmer.stats()
+        
+        hot, started, stats = asyncio.run(run())
+        assert hot == ["home_snapshot", "movies_page_1", "movies_page_7", "movies_page_9"]
+        assert started == ["home_snapshot", "movies_page_7", "movies_page_9"]
+        assert active["peak"] == 1
+        refreshes = {r["key"]: r for r in stats["recent"]}
+        assert refreshes["home_snapshot"]["ok"] is True
+        assert refreshes["movies_page_9"] == {**refreshes["movies_page_9"], "ok": False, "error": "upstream down"}
+        assert all(r["duration_ms"] >= 10 for r in refreshes.values())
+    
+    def test_failing_keys_back_off(self, monkeypatch):
+        """Test a failing key waits exponentially longer between refreshes and is dropped after repeated failures"""
+        now = {"t": 1000.0}
+        monkeypatch.setattr(time, "time", lambda: now["t"])
+        attempts = []
+        
+        async def refresh(key):
+            attempts.append((key, now["t"]))
+            raise RuntimeError("404")
+        
+        async def age_of(key):
+            return None
+        
+        async def run():
+            warmer = CacheWarmer(
+                refresh, age_of, accepts=lambda key: True, ttl=300, keys=["home_snapshot"],
+                interval=5, spacing=0, max_backoff=40, max_failures=4,
+            )
+            warmer.record_hit("movies_page_404")
+            for _ in range(40):
+                await warmer.tick()
+                await warmer.wait()
+                now["t"] += 5
+            return warmer
+        
+        warmer = asyncio.run(run())
+        times = [t - 1000 for key, t in attempts if key == "movies_page_404"]
+        assert times == [0, 5, 15, 35]
+        assert [t - 1000 for key, t in attempts if key == "home_snapshot"] == [0, 5, 15, 35, 75, 115, 155, 195]
+        assert "movies_page_404" not in warmer.hot_keys() and warmer.stats()["dropped_keys"] == 1
+    
+    def test_warms_configured_keys(self, offline, monkeypatch):
+        """Test a tick fills the configured keys through the endpoint loaders"""
+        monkeypatch.setattr(api.warmer, "spacing", 0)
+        
+        async def run():
+            await api.warmer.tick()
+            await api.warmer.wait()
+        
+        asyncio.run(run())
+        assert asyncio.run(api.get_cached_data("movies_page_1")) == parse_movie_list(load_fixture("lookmovies_movies.html"))
+        assert asyncio.run(api.get_cached_data("home_snapshot"))["trending_movies"]
+        assert api.item_for_key("anime_details_naruto").slug == "naruto"
+        keys = [k["key"] for k in client.get("/api/warmer/stats").json()["keys"]]
+        assert keys[:len(api.settings.WARMER_KEYS)] == api.settings.WARMER_KEYS
+
+class TestBatch:
+    """Test cases for the batch endpoint"""
+    
+    def test_batch_mixed_items(self, offline, monkeypatch):
+        """Test items run together, share fetches and report their own errors"""
+        def upstream_with_missing(request):
+            if "missing" in str(request.url):
+                return httpx.Response(404, text="Not found")
+            return fixture_upstream(request)
+        
+        mock_client = upstream.UpstreamClient(transport=httpx.MockTransport(upstream_with_missing))
+        monkeypatch.setattr(upstream, "get_client", lambda: mock_client)
+        response = client.post("/api/batch", json={"requests": [
+            {"type": "movies", "page": 1},
+            {"type": "movies", "page": 1},
+            {"type": "tv", "id": "watch-broken-63333"},
+            {"type": "anime_details", "slug": "missing"},
+            {"type": "episode", "slug": "naruto", "ep": 1},
+        ]})
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["status"] for r in body["results"]] == [200, 200, 200, 404, 200]
+        assert body["succeeded"] == 4 and body["failed"] == 1
+        assert body["results"][0]["data"] == body["results"][1]["data"]
+        assert "error" in body["results"][3] and "data" not in body["results"][3]
+        # one catalog page, one TV page, one category page, one episode page and three servers
+        assert mock_client.requests == 7
+    
+    def test_batch_validation(self):
+        """Test items missing their parameters and oversized batches are rejected"""
+        assert client.post("/api/batch", json={"requests": [{"type": "episode", "slug": "naruto"}]}).status_code == 422
+        assert client.post("/api/batch", json={"requests": []}).status_code == 422
+        items = [{"type": "movies", "page": 1}] * (api.settings.BATCH_MAX_ITEMS + 1)
+        assert client.post("/api/batch", json={"requests": items}).status_code == 413
+
+class TestCatalogStream:
+    """Test cases for the NDJSON catalog streams"""
+    
+    def test_streams_pages_as_ndjson(self, offline):
+        """Test every item of the range is streamed with its page, followed by a summary line"""
+        expected = parse_movie_list(load_fixture("lookmovies_movies.html"))
+        response = client.get("/api/movies/stream?from=2&to=4&concurrency=2")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[-1] == {"done": True, "pages": 3, "items": 3 * len(expected), "errors": 0}
+        assert sorted({line["page"] for line in lines[:-1]}) == [2, 3, 4]
+        assert [line["data"] for line in lines if line.get("page") == 3] == expected
+        assert client.get("/api/movies/3").json()["cached"] is True
+        
+        assert json.loads(client.get("/api/top-imdb/tv-shows/stream?to=1").text.splitlines()[-1])["items"] > 0
+        assert client.get("/api/tv-shows/stream?from=5&to=2").status_code == 400
+        assert client.get(f"/api/movies/stream?to={api.settings.STREAM_MAX_PAGES + 1}").status_code == 400
+    
+    def test_stream_is_not_counted_as_hits(self, offline):
+        """Test streamed pages do not feed the warmer's hot-key ranking"""
+        hits = dict(api.warmer.hits)
+        response = client.get("/api/movies/stream?from=20&to=25")
+        assert json.loads(response.text.splitlines()[-1])["errors"] == 0
+        assert api.warmer.hits == hits
+    
+    def test_close_cancels_outstanding_fetches(self, monkeypatch):
+        """Test closing a stream cancels the page fetches it still had running"""
+        state = {"started": 0, "cancelled": 0}
+        
+        async def slow_upstream(request):
+            if "page=1" in str(request.url):
+                return fixture_upstream(request)
+            state["started"] += 1
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                state["cancelled"] += 1
+                raise
+        
+        slow_client = upstream.UpstreamClient(transport=httpx.MockTransport(slow_upstream))
+        monkeypatch.setattr(upstream, "get_client", lambda: slow_client)
+        asyncio.run(api.cache.clear())
+        
+        async def run():
+            stream = api.stream_catalog("movies", 1, 10, 3)
+            first = await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0.05)
+            return first
+        
+        first = asyncio.run(run())
+        assert json.loads(first.splitlines()[0])["page"] == 1
+        assert state["started"] >= 2 and state["cancelled"] == state["started"]
+        assert api.inflight.in_flight() == 0
+        asyncio.run(api.cache.clear())
+
+class TestCatalogIndex:
+    """Test cases for the local catalog index and its crawler"""
+    
+    def test_search_filters_and_sorts_indexed_pages(self, offline):
+        """Test catalog pages loaded through the API are searchable without upstream requests"""
+        api.catalog_index.clear()
+        movies = parse_movie_list(load_fixture("lookmovies_movies.html"))
+        assert client.get("/api/movies/1").status_code == 200
+        assert client.get("/api/tv-shows/1").status_code == 200
+        assert api.catalog_index.stats()["catalogs"]["movies"] == {"items": len(movies), "pages": 1}
+        
+        data = client.get("/api/catalog/search?q=BROK&sort=title&limit=100").json()
+        assert data["total"] == len(data["data"]) > 0
+        titles = [item["title"] for item in data["data"]]
+        assert all("brok" in title.lower() for title in titles) and titles == sorted(titles, key=str.lower)
+        
+        data = client.get("/api/catalog/search?type=movie&year_from=1990&year_to=2005&sort=-year").json()
+        years = [int(item["year"]) for item in data["data"]]
+        assert data["total"] == sum(1 for m in movies if 1990 <= int(m["year"]) <= 2005)
+        assert years == sorted(years, reverse=True)
+        
+        data = client.get("/api/catalog/search?catalog=movies&limit=5&offset=2").json()
+        assert data["data"] == movies[2:7] and data["total"] == len(movies)
+        assert client.get("/api/catalog/search?sort=position").status_code == 400
+        assert client.get("/api/catalog/search?catalog=anime").status_code == 400
+    
+    def test_unchanged_page_is_only_marked_seen(self):
+        """Test re-indexing an identical page keeps its items alive without rewriting them"""
+        index = CatalogIndex()
+        tv = parse_tv_list(load_fixture("lookmovies_tv.html"))
+        assert index.index_page("tv_shows", 1, tv, now=100.0) is True
+        assert index.index_page("tv_shows", 1, tv, now=200.0) is False
+        assert index.prune(150.0) == 0
+        
+        moved = [{**tv[0], "title": "Renamed Show"}] + tv[1:]
+        assert index.index_page("tv_shows", 2, moved[:1], now=300.0) is True
+        assert index.search(q="Renamed")[0] == 1 and index.search(q="Broken", type="TV")[0] < len(tv)
+        assert index.search(catalog="tv_shows", sort="position", limit=1)[1][0]["title"] == tv[1]["title"]
+        assert index.prune(250.0) == len(tv) - 1
+        assert index.count() == 1
+        index.close()
+    
+    def test_crawler_indexes_until_the_last_page(self, offline):
+        """Test a crawl pass indexes each catalog and stops at its first missing page"""
+        api.catalog_index.clear()
+        crawled = []
+        
+        async def crawl(catalog, page):
+            crawled.append((catalog, page))
+            if page == 3:
+                return None
+            return await api.crawl_catalog_page(catalog, page)
+        
+        crawler = CatalogCrawler(crawl, api.prune_catalog, catalogs=["movies", "top_imdb_tv"], max_pages=5, spacing=0)
+        result = asyncio.run(crawler.run_pass())
+        assert result["pages"] == {"movies": 2, "top_imdb_tv": 2}
+        assert crawled == [("movies", 1), ("movies", 2), ("movies", 3), ("top_imdb_tv", 1), ("top_imdb_tv", 2), ("top_imdb_tv", 3)]
+        assert crawler.stats()["pages_crawled"] == 4 and crawler.errors == 0
+        stats = api.catalog_index.stats()
+        assert stats["catalogs"]["movies"]["items"] == len(parse_movie_list(load_fixture("lookmovies_movies.html")))
+        assert stats["catalogs"]["top_imdb_tv"]["items"] > 0
+        assert client.get("/api/catalog/stats").json()["index"]["items"] == stats["items"]
+
+class TestHomeSnapshot:
+    """Test cases for the shared homepage snapshot"""
+    
+    SECTION_ROUTES = [
+        "/api/trending_movies", "/api/trending_tv", "/api/popular_movies",
+        "/api/popular_tv", "/api/latest_movies", "/api/latest_tv",
+    ]
+    
+    def test_sections_share_one_fetch(self, offline):
+        """Test a cold dashboard loading every section fetches the homepage once"""
+        async def load_dashboard():
+            async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
+                return await asyncio.gather(*[ac.get(route) for route in self.SECTION_ROUTES])
+        
+        responses = asyncio.run(load_dashboard())
+        assert all(r.status_code == 200 for r in responses)
+        assert offline.requests == 1
+        home = load_fixture("lookmovies_home.html")
+        assert responses[3].json()["data"] == parse_tv_section(home, "popular-tv")
+        assert responses[5].json()["data"] == parse_tv_section(home, 5)
+    
+    def test_home_endpoint(self, offline):
+        """Test the combined endpoint returns all six sections"""
+        response = client.get("/api/home")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert set(data) == {"trending_movies", "trending_tv", "popular_movies",
+                             "popular_tv", "latest_movies", "latest_tv"}
+        assert client.get("/api/latest_movies").json()["cached"] is True
+    
+    def test_missing_section_is_empty(self):
+        """Test a homepage with fewer section blocks only empties the sections it lacks"""
+        home = load_fixture("lookmovies_home.html")
+        wraps = home.split('<div class="film_list-wrap">')
+        trimmed = '<div class="film_list-wrap">'.join(wraps[:5])
+        snapshot = parse_homepage(trimmed)
+        assert snapshot["latest_movies"] == snapshot["latest_tv"] == []
+        assert snapshot["trending_movies"] == parse_homepage(home)["trending_movies"] != []
+        assert parse_tv_section(trimmed, 5) == []
+
+class TestCoalescing:
+    """Test cases for single-flight coalescing of cache misses"""
+    
+    def test_concurrent_misses_share_one_fetch(self, offline):
+        """Test concurrent requests for an expired key trigger one upstream scrape"""
+        before = api.inflight.stats().get("movies", {"fetches": 0, "coalesced": 0})
+        
+        async def burst():
+            async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
+                return await asyncio.gather(*[ac.get("/api/movies/3") for _ in range(10)])
+        
+        responses = asyncio.run(burst())
+        assert all(r.status_code == 200 for r in responses)
+        assert offline.requests == 1
+        after = api.inflight.stats()["movies"]
+        assert after["fetches"] - before["fetches"] == 1
+        assert after["coalesced"] - before["coalesced"] == 9
+    
+    def test_errors_propagate_to_waiters(self):
+        """Test every waiter receives the leader's exception"""
+        flight = SingleFlight()
+        
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+        
+        async def run():
+            return await asyncio.gather(*[flight.do("key", failing) for _ in range(5)], return_exceptions=True)
+        
+        results = asyncio.run(run())
+        assert all(isinstance(r, ValueError) for r in results)
+        assert flight.in_flight() == 0
+    
+    def test_waiter_cap(self):
+        """Test callers beyond the waiter cap are rejected"""
+        flight = SingleFlight(max_waiters=2)
+        
+        async def slow():
+            await asyncio.sleep(0.01)
+            return "done"
+        
+        async def run():
+            return await asyncio.gather(*[flight.do("key", slow) for _ in range(5)], return_exceptions=True)
+        
+        results = asyncio.run(run())
+        assert results.count("done") == 3
+        assert sum(isinstance(r, SingleFlightBusy) for r in results) == 2
+
+class TestStaleCache:
+    """Test cases for stale-while-revalidate and stale-if-error serving"""
+    
+    OLD_DATA = [{"title": "Old Movie", "id": "1"}]
+    
+    def age_entry(self, key, seconds_past_ttl):
+        stored_at = time.time() - api.CACHE_TTL - seconds_past_ttl
+        asyncio.run(api.cache.set(key, self.OLD_DATA, stored_at=stored_at))
+    
+    def test_stale_while_revalidate(self, offline):
+        """Test an expired entry is served immediately and refreshed in the background"""
+        self.age_entry("movies_page_1", 10)
+        
+        async def run():
+            async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
+                response = await ac.get("/api/movies/1")
+                await asyncio.gather(*api._background_refreshes)
+                return response
+        
+        response = asyncio.run(run())
+        assert response.status_code == 200
+        assert response.json() == {"data": self.OLD_DATA, "cached": True, "stale": True}
+        assert asyncio.run(api.get_cached_data("movies_page_1")) == parse_movie_list(load_fixture("lookmovies_movies.html"))
+    
+    def test_stale_if_error(self, monkeypatch):
+        """Test stale data is served when the upstream scrape fails"""
+        failing = upstream.UpstreamClient(transport=httpx.MockTransport(lambda request: httpx.Response(502, text="Bad gateway")))
+        monkeypatch.setattr(upstream, "get_client", lambda: failing)
+        asyncio.run(api.cache.clear())
+        self.age_entry("tv_shows_page_1", api.settings.CACHE_STALE_WHILE_REVALIDATE + 10)
+        
+        response = client.get("/api/tv-shows/1")
+        assert response.status_code == 200
+        assert response.json()["stale"] is True
+        assert response.json()["data"] == self.OLD_DATA
+        
+        self.age_entry("tv_shows_page_1", api.settings.CACHE_STALE_IF_ERROR + 10)
+        assert client.get("/api/tv-shows/1").status_code == 404
+        asyncio.run(api.cache.clear())
+
+class TestConditionalGet:
+    """Test cases for ETag revalidation and Cache-Control headers"""
+    
+    def test_not_modified(self, offline):
+        """Test a repeated request with the cached entry's ETag is answered with an empty 304"""
+        fresh = client.get("/api/movies/1")
+        assert fresh.headers["etag"].endswith('-f"')
+        assert "max-age=300," in fresh.headers["cache-control"]
+        
+        cached = client.get("/api/movies/1", headers={"Accept-Encoding": "identity"})
+        etag = cached.headers["etag"]
+        assert etag.endswith('-c"') and etag[1:-3] == fresh.headers["etag"][1:-3]
+        
+        revalidated = client.get("/api/movies/1", headers={"If-None-Match": f'"other", W/{etag}', "Accept-Encoding": "identity"})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b""
+        assert revalidated.headers["etag"] == etag
+        assert client.get("/api/movies/1", headers={"If-None-Match": '"other"'}).status_code == 200
+        
+        client.get("/api/trending_movies")
+        section = client.get("/api/trending_movies")
+        assert client.get("/api/trending_movies", headers={"If-None-Match": section.headers["etag"]}).status_code == 304
+    
+    def test_cache_control_follows_remaining_ttl(self, offline):
+        """Test max-age counts down with the entry's age and drops to zero once it is stale"""
+        data = [{"title": "Old Movie", "id": "1"}]
+        asyncio.run(api.cache.set("movies_page_2", data, stored_at=time.time() - 100))
+        response = client.get("/api/movies/2")
+        assert response.headers["etag"] == f'"{content_hash(dumps(data))}-c"'
+        assert 199 <= int(response.headers["cache-control"].split("max-age=")[1].split(",")[0]) <= 200
+        
+        asyncio.run(api.cache.set("movies_page_3", data, stored_at=time.time() - api.CACHE_TTL - 100))
+        response = client.get("/api/movies/3")
+        assert response.headers["etag"].endswith('-s"')
+        assert "max-age=0, stale-while-revalidate=49" in response.headers["cache-control"]
+    
+    def test_prepared_body_encodings(self, offline):
+        """Test cache hits are sent from the entry's prepared body in the negotiated content coding"""
+        expected = client.get("/api/movies/1").json()["data"]
+        entry = asyncio.run(api.cache.get_entry("movies_page_1"))
+        assert entry.size > len(entry.body.identity) + len(entry.body.encoded["gzip"])
+        
+        for accept, coding in (("identity", None), ("gzip, deflate, br", "br"), ("br;q=0, gzip", "gzip"), ("*", "br")):
+            response = client.get("/api/movies/1", headers={"Accept-Encoding": accept})
+            assert response.headers.get("content-encoding") == coding
+            assert response.headers["vary"] == "Accept-Encoding"
+            assert response.json() == {"data": expected, "cached": True}
+            assert response.headers["etag"].endswith(f'-c-{coding}"' if coding else '-c"')
+        
+        br_etag = client.get("/api/movies/1", headers={"Accept-Encoding": "br"}).headers["etag"]
+        assert client.get("/api/movies/1", headers={"Accept-Encoding": "identity", "If-None-Match": br_etag}).status_code == 200
+        identity = client.get("/api/movies/1", headers={"Accept-Encoding": "identity"})
+        assert identity.content == b'{"data":' + dumps(expected) + b',"cached":true}'
+    
+    def test_digest_matches_across_backends(self, redis_server, tmp_path):
+        """Test the memory, shared and disk tiers give an entry the same content hash"""
+        value = [{"title": "Movie", "id": "7"}]
+        
+        async def run():
+            memory = MemoryBackend(60)
+            shared = RedisBackend(redis_server.url, ttl=60, prefix="test:")
+            disk = DiskStore(str(tmp_path / "cache.db"))
+            await memory.set("movies_page_1", value)
+            await shared.set("movies_page_1", value)
+            disk.set("movies_page_1", dumps(value), time.time(), time.time() + 60)
+            entries = [await memory.get_entry("movies_page_1"), await shared.get_entry("movies_page_1"), disk.get("movies_page_1")]
+            await shared.clear()
+            await shared.close()
+            return [entry.digest for entry in entries]
+        
+        assert asyncio.run(run()) == [content_hash(dumps(value))] * 3
+
+class TestCacheEngine:
+    """Test cases for the bounded response cache"""
+    
+    def test_lru_eviction_by_bytes(self):
+        """Test least recently used entries are evicted to stay within the byte budget"""
+        engine = CacheEngine(ttl=60, max_bytes=100)
+        engine.set("a", "x" * 40)
+        engine.set("b", "y" * 40)
+        assert engine.get("a") == "x" * 40
+        engine.set("c", "z" * 40)
+        assert "b" not in engine
+        assert "a" in engine and "c" in engine
+        assert engine.stats()["bytes"] == 80
+        assert engine.stats()["evictions"] == 1
+        assert engine.set("big", "w" * 101) is False
+    
+    def test_sweep_expires_entries(self):
+        """Test the sweeper drops entries once their TTL has passed"""
+        engine = CacheEngine(ttl=60)
+        engine.set("short", 1, ttl=2)
+        engine.set("long", 2)
+        assert engine.sweep(time.time() + 5) == 1
+        assert "short" not in engine
+        assert engine.get("long") == 2
+        assert engine.sweep(time.time() + 120) == 1
+        assert len(engine) == 0 and engine.bytes == 0
+
+@pytest.fixture(scope="module")
+def redis_server():
+    """In-process Redis stand-in shared by the shared-cache tests"""
+    server = RedisStandIn().start()
+    yield server
+    server.stop()
+
+class TestSharedCache:
+    """Test cases for the Redis and tiered cache backends"""
+    
+    def test_redis_round_trip(self, redis_server):
+        """Test entries keep their value and age through the shared store"""
+        async def run():
+            backend = RedisBackend(redis_server.url, ttl=60, prefix="test:")
+            await backend.set("movies_page_1", [{"title": "Movie"}], stored_at=time.time() - 10)
+            entry = await backend.get_entry("movies_page_1")
+            missing = await backend.get_entry("movies_page_2")
+            cleared = await backend.clear()
+            await backend.close()
+            return entry, missing, cleared
+        
+        entry, missing, cleared = asyncio.run(run())
+        assert entry.value == [{"title": "Movie"}]
+        assert 10 <= entry.age < 11
+        assert missing is None
+        assert cleared == 1
+    
+    def test_tiered_workers_share_entries(self, redis_server):
+        """Test an entry cached by one worker is served to another from L2 and then from its L1"""
+        async def run():
+            workers = [TieredBackend(MemoryBackend(60), RedisBackend(redis_server.url, 60, prefix="test:"), l1_ttl=30) for _ in range(2)]
+            await workers[0].set("movies_page_1", [{"title": "Movie"}])
+            first = await workers[1].get_entry("movies_page_1")
+            second = await workers[1].get_entry("movies_page_1")
+            stats = await workers[1].stats()
+            await workers[0].clear()
+            for worker in workers:
+                await worker.close()
+            return first, second, stats
+        
+        first, second, stats = asyncio.run(run())
+        assert first.value == second.value == [{"title": "Movie"}]
+        assert stats["l2"]["hits"] == 1
+        assert stats["l1"]["hits"] == 1
+    
+    def test_old_entry_is_served_from_l1(self, redis_server):
+        """Test L1 freshness counts from the last L2 check, not from when the entry was first stored"""
+        async def run():
+            worker = TieredBackend(MemoryBackend(600), RedisBackend(redis_server.url, 600, prefix="old:"), l1_ttl=30)
+            await worker.set("movies_page_1", [{"title": "Movie"}], stored_at=time.time() - 60)
+            before = redis_server.commands
+            for _ in range(100):
+                assert (await worker.get_entry("movies_page_1")).value == [{"title": "Movie"}]
+            during = redis_server.commands - before
+            worker.l1.engine.get_entry("movies_page_1").checked_at -= 31
+            await worker.get_entry("movies_page_1")
+            await worker.get_entry("movies_page_1")
+            after = redis_server.commands - before - during
+            await worker.clear()
+            await worker.close()
+            return during, after
+        
+        assert asyncio.run(run()) == (0, 1)
+    
+    def test_unreachable_store_is_a_miss(self):
+        """Test a dead Redis server degrades to cache misses instead of errors"""
+        async def run():
+            backend = RedisBackend("redis://127.0.0.1:1/0", ttl=60)
+            await backend.set("movies_page_1", [])
+            return await backend.get_entry("movies_page_1"), backend.errors
+        
+        entry, errors = asyncio.run(run())
+        assert entry is None
+        assert errors == 2
+
+class TestDiskCache:
+    """Test cases for the persistent disk cache tier"""
+    
+    PREFIXES = ("movies_page_", "movie_details_")
+    
+    def test_warm_restart(self, tmp_path):
+        """Test persisted entries survive a restart with their original age"""
+        path = str(tmp_path / "cache.db")
+        
+        async def first_run():
+            backend = PersistentBackend(MemoryBackend(600), DiskStore(path), 600, self.PREFIXES)
+            await backend.set("movies_page_1", [{"title": "Movie"}], stored_at=time.time() - 100)
+            await backend.set("anime_search_naruto", [{"title": "Naruto"}])
+            await backend.close()
+        
+        async def second_run():
+            backend = PersistentBackend(MemoryBackend(600), DiskStore(path), 600, self.PREFIXES)
+            entries = [await backend.get_entry(key) for key in ("movies_page_1", "movies_page_1", "anime_search_naruto")]
+            stats = await backend.stats()
+            await backend.close()
+            return entries, stats
+        
+        asyncio.run(first_run())
+        (restored, again, not_persisted), stats = asyncio.run(second_run())
+        assert restored.value == [{"title": "Movie"}]
+        assert 100 <= restored.age < 101
+        assert again.value == restored.value
+        assert not_persisted is None
+        assert stats["disk"]["hits"] == 1
+    
+    def test_expiry_and_compaction(self, tmp_path):
+        """Test expired rows are never served and are removed by compaction"""
+        store = DiskStore(str(tmp_path / "cache.db"), max_entries=2)
+        now = time.time()
+        store.set_many([
+            ("movies_page_1", b"[1]", now - 20, now - 10),
+            ("movies_page_2", b"[2]", now, now + 10),
+            ("movies_page_3", b"[3]", now, now + 20),
+            ("movies_page_4", b"[4]", now, now + 30),
+        ])
+        assert store.get("movies_page_1") is None
+        assert store.compact() == 2
+        assert store.get("movies_page_2") is None
+        assert store.get("movies_page_4").value == [4]
+        assert store.count() == 2
+        store.close()
+
+class TestUpstreamClient:
+    """Test cases for the pooled upstream client"""
+    
+    def test_per_host_limit(self):
+        """Test concurrent requests to one site never exceed its connection cap"""
+        active = {"now": 0, "peak": 0}
+        
+        async def slow_upstream(request):
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+            await asyncio.sleep(0.01)
+            active["now"] -= 1
+            return httpx.Response(200, text="ok")
+        
+        async def run():
+            pooled = upstream.UpstreamClient(transport=httpx.MockTransport(slow_upstream))
+            pooled.host_limits = {"lookmoviess.com": 2}
+            await asyncio.gather(*[pooled.get(f"https://www.lookmoviess.com/movies?page={i}") for i in range(6)])
+            stats = pooled.stats()
+            await pooled.aclose()
+            return stats
+        
+        stats = asyncio.run(run())
+        assert active["peak"] == 2
+        assert stats["requests"] == 6
+        assert stats["hosts"]["lookmoviess.com"] == {"limit": 2, "in_flight": 0}
+    
+    def test_dns_cache(self):
+        """Test repeated lookups are answered from the DNS cache"""
+        backend = upstream.DNSCacheBackend(ttl=60)
+        first = asyncio.run(backend._resolve("localhost", 80))
+        second = asyncio.run(backend._resolve("localhost", 80))
+        assert first == second
+        assert (backend.hits, backend.misses) == (1, 1)
+    
+    def test_transport_reuses_connections(self):
+        """Test the DNS-caching transport keeps connections alive and raises httpx errors"""
+        async def serve(reader, writer):
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        
+        async def run():
+            server = await asyncio.start_server(serve, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            dns = upstream.DNSCacheBackend(ttl=60)
+            transport = upstream.UpstreamTransport(httpx.Limits(max_connections=4), False, dns)
+            closed = socket.socket()
+            closed.bind(("127.0.0.1", 0))  # bound but not listening, so connections are refused
+            async with httpx.AsyncClient(transport=transport) as http:
+                bodies = [(await http.get(f"http://localhost:{port}/")).text for _ in range(3)]
+                server.close()
+                await server.wait_closed()
+                with pytest.raises(httpx.ConnectError):
+                    await http.get(f"http://localhost:{closed.getsockname()[1]}/")
+            closed.close()
+            return bodies, dns.connections_opened, len(transport.connections)
+        
+        bodies, opened, open_now = asyncio.run(run())
+        assert bodies == ["ok"] * 3
+        assert opened == 1
+        assert open_now == 0
+    
+    def test_stats_endpoint(self, offline):
+        """Test pool statistics are exposed"""
+        response = client.get("/api/upstream/stats")
+        assert response.status_code == 200
+        assert "pool" in response.json()
+
+class TestMetrics:
+    """Test cases for the Prometheus metrics"""
+    
+    def test_histogram_buckets(self):
+        """Test observations land in cumulative buckets with sum and count"""
+        histogram = metrics.Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/a")
+        lines = histogram.render().splitlines()
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 2' in lines
+        assert 'test_seconds_bucket{route="/a",le="1"} 3' in lines
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 4' in lines
+        assert 'test_seconds_sum{route="/a"} 3.65' in lines
+        assert 'test_seconds_count{route="/a"} 4' in lines
+    
+    def test_request_metrics(self, offline):
+        """Test route, cache, upstream and parse metrics are recorded and exposed"""
+        misses = metrics.CACHE_REQUESTS.get("movies", "miss")
+        hits = metrics.CACHE_REQUESTS.get("movies", "hit")
+        requests = metrics.HTTP_REQUEST_DURATION.count("GET", "/api/movies/{page}")
+        fetches = metrics.UPSTREAM_RESPONSES.get("lookmoviess.com", "200")
+        parses = metrics.PARSE_DURATION.count("parse_movie_list", "thread")
+        
+        assert client.get("/api/movies/1").status_code == 200
+        assert client.get("/api/movies/1").status_code == 200
+        
+        assert metrics.CACHE_REQUESTS.get("movies", "miss") == misses + 1
+        assert metrics.CACHE_REQUESTS.get("movies", "hit") == hits + 1
+        assert metrics.HTTP_REQUEST_DURATION.count("GET", "/api/movies/{page}") == requests + 2
+        assert metrics.UPSTREAM_RESPONSES.get("lookmoviess.com", "200") == fetches + 1
+        assert metrics.PARSE_DURATION.count("parse_movie_list", "thread") == parses + 1
+        assert metrics.UPSTREAM_IN_FLIGHT.get("lookmoviess.com") == 0
+        
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert 'http_requests_total{method="GET",route="/api/movies/{page}",status="200"}' in response.text
+        assert 'cache_requests_total{prefix="movies",result="hit"}' in response.text
+
+class TestTracing:
+    """Test cases for per-stage request timings"""
+    
+    def test_server_timing_header(self, offline):
+        """Test a scraped response reports its stages and a cached one skips fetch and parse"""
+        response = client.get("/api/movies/1")
+        stages = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+        for stage in ("cache", "fetch", "parse", "cache_write", "serialize", "app"):
+            assert stage in stages
+        
+        cached = client.get("/api/movies/1").headers["server-timing"]
+        assert "fetch" not in cached and "parse" not in cached
+        assert "serialize;dur=" in cached
+    
+    def test_sampled_trace_log(self, caplog):
+        """Test sampled requests are logged as one JSON line with their spans"""
+        traced = FastAPI()
+        traced.router.route_class = tracing.TracedRoute
+        traced.add_middleware(tracing.TracingMiddleware, sample_rate=1.0)
+        
+        @traced.get("/items/{item_id}")
+        async def item(item_id: int):
+            with tracing.span("parse"):
+                await asyncio.sleep(0.01)
+            return {"id": item_id}
+        
+        with caplog.at_level("INFO", logger="tracing"):
+            response = TestClient(traced).get("/items/3")
+        assert response.json() == {"id": 3}
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record["route"] == "/items/{item_id}"
+        assert record["status"] == 200
+        assert record["spans"]["parse"]["count"] == 1
+        assert record["spans"]["parse"]["ms"] >= 10
+
+class TestRateLimiter:
+    """Test cases for the token-bucket rate limiter"""
+    
+    def test_token_bucket(self):
+        """Test a client can burst to the limit, then refills at limit per window"""
+        limiter = RateLimiter(max_requests=2, window_seconds=10)
+        assert limiter.check("a", now=0).remaining == 1
+        assert limiter.check("a", now=0).remaining == 0
+        rejected = limiter.check("a", now=1)
+        assert not rejected.allowed
+        assert rejected.retry_after == pytest.approx(4)
+        assert limiter.check("b", now=1).allowed
+        assert limiter.check("a", now=5).allowed
+        assert not limiter.check("a", now=5).allowed
+    
+    def test_client_overrides_and_sweep(self):
+        """Test per-client limits and that sweeping drops only idle clients"""
+        limiter = RateLimiter(max_requests=1, window_seconds=10, limits={"trusted": 0, "partner": 3})
+        assert all(limiter.check("trusted", now=0).allowed for _ in range(5))
+        assert [limiter.check("partner", now=0).allowed for _ in range(4)] == [True, True, True, False]
+        limiter.check("idle", now=1)
+        limiter.check("active", now=9)
+        assert limiter.sweep(now=12) == 2
+        assert list(limiter.buckets) == ["active"]
+    
+    def test_middleware_headers(self):
+        """Test RateLimit headers, the tighter route limit and 429 with Retry-After"""
+        limited = FastAPI()
+        limited.add_middleware(
+            RateLimitMiddleware,
+            limiter=RateLimiter(max_requests=5, window_seconds=60),
+            route_limiters={"/api/batch": RateLimiter(max_requests=1, window_seconds=60)},
+            exempt=["/api/health"],
+        )
+        
+        @limited.get("/api/movies")
+        async def movies():
+            return {"ok": True}
+        
+        @limited.get("/api/batch")
+        async def batch():
+            return {"ok": True}
+        
+        @limited.get("/api/health")
+        async def health():
+            return {"ok": True}
+        
+        limited_client = TestClient(limited)
+        response = limited_client.get("/api/movies")
+        assert response.headers["ratelimit-limit"] == "5"
+        assert response.headers["ratelimit-remaining"] == "4"
+        
+        assert limited_client.get("/api/batch").headers["ratelimit-limit"] == "1"
+        response = limited_client.get("/api/batch")
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "60"
+        assert response.json()["error"] == "Rate limit exceeded"
+        
+        health = limited_client.get("/api/health")
+        assert health.status_code == 200
+        assert "ratelimit-limit" not in health.headers
+    
+    def test_route_rejection_keeps_global_tokens(self):
+        """Test a request rejected by a route limit does not use up the client's global allowance"""
+        limiter = RateLimiter(max_requests=3, window_seconds=60)
+        limited = FastAPI()
+        limited.add_middleware(
+            RateLimitMiddleware,
+            limiter=limiter,
+            route_limiters={"/api/batch": RateLimiter(max_requests=1, window_seconds=60)},
+        )
+        
+        @limited.get("/api/{name}")
+        async def endpoint(name: str):
+            return {"ok": True}
+        
+        limited_client = TestClient(limited)
+        assert limited_client.get("/api/batch").status_code == 200
+        assert [limited_client.get("/api/batch").status_code for _ in range(5)] == [429] * 5
+        assert [limited_client.get("/api/movies").status_code for _ in range(3)] == [200, 200, 429]
+        assert limiter.allowed == 3
+
+class TestUpstreamGuard:
+    """Test cases for the per-host circuit breaker and adaptive concurrency limit"""
+    
+    def test_breaker_opens_and_probes(self):
+        """Test the circuit opens on failures, refuses fetches, then closes after a good probe"""
+        async def run():
+            guard = upstream.HostGuard("example.com", max_limit=4, window=4, min_requests=4, open_seconds=0.05)
+            for _ in range(4):
+                guard.release(await guard.acquire(), True, 0.01)
+            assert guard.state == guard.OPEN
+            with pytest.raises(upstream.UpstreamUnavailable) as refused:
+                await guard.acquire()
+            assert refused.value.reason == "circuit_open"
+            
+            await asyncio.sleep(0.06)
+            assert await guard.acquire() is True
+            with pytest.raises(upstream.UpstreamUnavailable):
+                await guard.acquire()
+            guard.release(True, False, 0.01)
+            assert guard.state == guard.CLOSED
+            assert guard.trips == 1
+        
+        asyncio.run(run())
+    
+    def test_adaptive_limit(self):
+        """Test failures halve the limit once per second and successes grow it back"""
+        async def run():
+            guard = upstream.HostGuard("example.com", max_limit=8, breaker=False, slow_seconds=1.0)
+            guard.release(await guard.acquire(), True, 0.01)
+            assert int(guard.limit) == 4
+            guard.release(await guard.acquire(), False, 2.0)  # slow, but within a second of the last cut
+            assert int(guard.limit) == 4
+            for _ in range(30):  # about one step per limit's worth of successes
+                guard.release(await guard.acquire(), False, 0.01)
+            assert int(guard.limit) == 8
+            
+            guard.limit = 1.0
+            first = await guard.acquire()
+            queued = asyncio.ensure_future(guard.acquire())
+            await asyncio.sleep(0)
+            assert guard.stats()["queued"] == 1
+            guard.release(first, False, 0.01)
+            await queued
+            assert guard.in_flight == 1
+        
+        asyncio.run(run())
+    
+    def test_failing_host_fails_fast(self, monkeypatch):
+        """Test a failing host stops being contacted and the API answers 503 with Retry-After"""
+        calls = {"count": 0}
+        
+        def failing_upstream(request):
+            calls["count"] += 1
+            return httpx.Response(502, text="Bad gateway")
+        
+        monkeypatch.setattr(upstream.settings, "UPSTREAM_BREAKER_MIN_REQUESTS", 3)
+        failing_client = upstream.UpstreamClient(transport=httpx.MockTransport(failing_upstream))
+        monkeypatch.setattr(upstream, "get_client", lambda: failing_client)
+        asyncio.run(api.cache.clear())
+        
+        for page in range(1, 6):
+            client.get(f"/api/movies/{page}")
+        assert calls["count"] == 3
+        response = client.get("/api/movies/9")
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) > 0
+        assert failing_client.stats()["guards"]["lookmoviess.com"]["state"] == "open"
+        assert metrics.UPSTREAM_CIRCUIT_STATE.get("lookmoviess.com") == 2
+
+class TestRevalidation:
+    """Test cases for conditional refreshes of cached upstream pages"""
+    
+    def test_conditional_fetch(self):
+        """Test validators are sent on a conditional fetch and a 304 or an identical body raise NotModified"""
+        page = {"body": "v1", "etag": True}
+        seen = []
+        
+        def handler(request):
+            seen.append({k: request.headers.get(k) for k in ("if-none-match", "if-modified-since")})
+            if page["etag"] and request.headers.get("if-none-match") == f'"{page["body"]}"':
+                return httpx.Response(304)
+            headers = {"ETag": f'"{page["body"]}"', "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"} if page["etag"] else {}
+            return httpx.Response(200, text=page["body"], headers=headers)
+        
+        async def run():
+            mock_client = upstream.UpstreamClient(transport=httpx.MockTransport(handler))
+            url = "https://lookmoviess.com/movies?page=1"
+            with upstream.revalidation(False) as validators:
+                await mock_client.get(url)
+            assert mock_client.validators == {}
+            validators.commit()
+            with upstream.revalidation(True) as validators:
+                with pytest.raises(upstream.NotModified) as not_modified:
+                    await mock_client.get(url)
+                assert not_modified.value.reason == "not_modified"
+                page.update(body="v2", etag=False)
+                assert (await mock_client.get(url)).text == "v2"
+                validators.commit()
+                with pytest.raises(upstream.NotModified) as unchanged:
+                    await mock_client.get(url)
+                assert unchanged.value.reason == "unchanged"
+            await mock_client.get(url)
+            await mock_client.aclose()
+            return mock_client.stats()["revalidation"]
+        
+        stats = asyncio.run(run())
+        assert seen[0] == seen[-1] == {"if-none-match": None, "if-modified-since": None}
+        assert seen[1] == {"if-none-match": '"v1"', "if-modified-since": "Mon, 05 Oct 2026 10:00:00 GMT"}
+        assert stats == {"not_modified": 1, "unchanged": 1, "changed": 1, "validators": 1}
+    
+    def test_unchanged_page_only_extends_ttl(self, offline):
+        """Test refreshing an expired entry whose page is unchanged skips parsing and restarts its TTL"""
+        client.get("/api/movies/1")
+        digest = asyncio.run(api.cache.get_entry("movies_page_1")).digest
+        asyncio.run(api.cache.touch("movies_page_1", time.time() - api.CACHE_TTL - 10))
+        parses = metrics.PARSE_DURATION.count("parse_movie_list", "thread")
+        
+        async def run():
+            async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
+                response = await ac.get("/api/movies/1")
+                await asyncio.gather(*api._background_refreshes)
+                return response
+        
+        assert asyncio.run(run()).json()["stale"] is True
+        entry = asyncio.run(api.cache.get_entry("movies_page_1"))
+        assert entry.age < 5 and entry.digest == digest
+        assert metrics.PARSE_DURATION.count("parse_movie_list", "thread") == parses
+        assert offline.revalidations["unchanged"] == 1
+        assert client.get("/api/movies/1").json()["cached"] is True
+    
+    def test_failed_parse_is_not_unchanged(self, monkeypatch):
+        """Test a body that failed to parse is parsed again, not served as an unchanged fresh entry"""
+        page = {"body": load_fixture("lookmovies_movies.html")}
+        mock_client = upstream.UpstreamClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, text=page["body"])))
+        monkeypatch.setattr(upstream, "get_client", lambda: mock_client)
+        parse = MoviesApi.parse_movie_list
+        
+        def strict_parse(r):
+            if "<!-- redesign -->" in r:
+                raise ValueError("markup changed")
+            return parse(r)
+        
+        monkeypatch.setattr(MoviesApi, "parse_movie_list", strict_parse)
+        asyncio.run(api.cache.clear())
+        assert client.get("/api/movies/1").json()["cached"] is False
+        page["body"] += "<!-- redesign -->"
+        for _ in range(2):
+            asyncio.run(api.cache.touch("movies_page_1", time.time() - api.CACHE_TTL - api.settings.CACHE_STALE_WHILE_REVALIDATE - 10))
+            data = client.get("/api/movies/1").json()
+            assert data["cached"] is True and data["stale"] is True
+        assert mock_client.revalidations == {"not_modified": 0, "unchanged": 0, "changed": 2}
+        asyncio.run(api.cache.clear())
+    
+    def test_touch_backends(self, redis_server, tmp_path):
+        """Test every cache backend restarts an entry's age in place and reports missing keys"""
+        async def run():
+            backends = [
+                MemoryBackend(600),
+                RedisBackend(redis_server.url, 600, prefix="touch:"),
+                TieredBackend(MemoryBackend(600), RedisBackend(redis_server.url, 600, prefix="tiered:"), l1_ttl=30),
+                PersistentBackend(MemoryBackend(600), DiskStore(str(tmp_path / "cache.db")), 600, ("movies_page_",)),
+            ]
+            results = []
+            for backend in backends:
+                await backend.set("movies_page_1", [{"title": "Movie"}], stored_at=time.time() - 500)
+                touched = await backend.touch("movies_page_1")
+                entry = await backend.get_entry("movies_page_1")
+                results.append((touched, entry.value, entry.age < 1, await backend.touch("movies_page_2")))
+                await backend.clear()
+                await backend.close()
+            return results
+        
+        assert asyncio.run(run()) == [(True, [{"title": "Movie"}], True, False)] * 4
+
+class TestStubUpstream:
+    """Test cases for the load-test fixture server and the upstream override"""
+    
+    def test_override_routes_to_stub(self, monkeypatch):
+        """Test upstream requests reach the stub with the original host preserved"""
+        stub = StubUpstream().start()
+        monkeypatch.setattr(upstream.settings, "UPSTREAM_OVERRIDE", stub.url)
+        
+        async def run():
+            pooled = upstream.UpstreamClient()
+            try:
+                return await pooled.get("https://lookmoviess.com/movies?page=1")
+            finally:
+                await pooled.aclose()
+        
+        try:
+            response = asyncio.run(run())
+        finally:
+            stub.stop()
+        assert response.status_code == 200
+        assert response.text == load_fixture("lookmovies_movies.html")
+        assert stub.requests == 1
+    
+    def test_error_injection(self):
+        """Test the stub answers with 502 at the configured error rate"""
+        stub = StubUpstream(error_rate=1.0).start()
+        try:
+            response = httpx.get(f"{stub.url}/movies?page=1", headers={"X-Upstream-Host": "lookmoviess.com"})
+        finally:
+            stub.stop()
+        assert response.status_code == 502
+        assert stub.errors == 1
+
 # Performance and load testing
 class TestPerformance:
     """Performance test cases"""
@@ -0,0 +1,161 @@
+"""
+Per-request stage timings, reported in a Server-Timing header and sampled trace logs
+"""
+import contextvars
+import functools
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger("tracing")
+
+
+class Trace:
+    """Stage durations of one request, summed per stage name
+
+    Stages that run several times (one fetch per streaming server, say) or
+    concurrently are added together, so a stage can exceed the request time.
+    """
+
+    __slots__ = ("spans", "handler_done")
+
+    def __init__(self):
+        self.spans: Dict[str, List[float]] = {}  # name -> [seconds, count]
+        self.handler_done: Optional[float] = None
+
+    def add(self, name: str, seconds: float) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, (seconds, _) in self.spans.items())
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: {"ms": round(seconds * 1000, 2), "count": count} for name, (seconds, count) in self.spans.items()}
+
+
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("trace", default=None)
+
+
+def current() -> Optional[Trace]:
+    """The trace of the request being served, or None outside a traced request"""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time a block as a stage of the current request; does nothing outside one"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - start)
+
+
+# httpcore trace events -> stage; connect covers DNS, TCP and TLS
+_CONNECTION_STAGES = {"connection.connect_tcp": "connect", "connection.start_tls": "connect"}
+
+
+def upstream_trace_hook(trace: Trace) -> Callable[[str, Dict[str, Any]], Any]:
+    """httpcore trace extension splitting a fetch into connect, ttfb and download"""
+    started: Dict[str, float] = {}
+
+    async def hook(event: str, info: Dict[str, Any]) -> None:
+        name, _, phase = event.rpartition(".")
+        stage = name.partition(".")[2]
+        now = time.perf_counter()
+        if phase == "started":
+            started[name] = now
+            if stage == "send_request_headers":
+                started["ttfb"] = now
+        elif name in started:
+            begin = started.pop(name)
+            if name in _CONNECTION_STAGES:
+                trace.add("connect", now - begin)
+            elif stage == "receive_response_headers" and "ttfb" in started:
+                trace.add("ttfb", now - started.pop("ttfb"))
+            elif stage == "receive_response_body":
+                trace.add("download", now - begin)
+
+    return hook
+
+
+class TracedRoute(APIRoute):
+    """Route that marks when its endpoint returns, so the middleware can time serialization"""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        @functools.wraps(endpoint)
+        async def traced(*args: Any, **kw: Any) -> Any:
+            result = await endpoint(*args, **kw)
+            trace = _current.get()
+            if trace is not None:
+                trace.handler_done = time.perf_counter()
+            return result
+
+        super().__init__(path, traced, **kwargs)
+
+
+class TracingMiddleware:
+    """ASGI middleware collecting a Trace per request
+
+    The stage totals go out in a Server-Timing header, with "serialize" (endpoint
+    return to response start) and "app" (request start to response start). A
+    sample of requests, plus every request slower than slow_ms, is also logged as
+    one JSON line.
+    """
+
+    def __init__(self, app, sample_rate: float = 0.0, slow_ms: float = 0.0):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = _current.set(trace)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                status = message["status"]
+                if trace.handler_done is not None:
+                    trace.add("serialize", now - trace.handler_done)
+                trace.add("app", now - start)
+                headers = [*message.get("headers", []), (b"server-timing", trace.server_timing().encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            duration_ms = (time.perf_counter() - start) * 1000
+            if (self.slow_ms and duration_ms >= self.slow_ms) or random.random() < self.sample_rate:
+                route = getattr(scope.get("route"), "path", None)
+                logger.info(json.dumps({
+                    "event": "request_trace",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": route,
+                    "status": status,
+                    "duration_ms": round(duration_ms, 2),
+                    "spans": trace.summary(),
+                }))
@@ -0,0 +1,681 @@
+"""
+Shared asynchronous HTTP client for upstream scraping
+"""
+import asyncio
+import contextvars
+import hashlib
+import ipaddress
+import logging
+import socket
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+
+from config import settings
+from metrics import (
+    UPSTREAM_CIRCUIT_STATE, UPSTREAM_CONCURRENCY_LIMIT, UPSTREAM_DURATION, UPSTREAM_IN_FLIGHT,
+    UPSTREAM_QUEUED, UPSTREAM_REJECTED, UPSTREAM_RESPONSES, UPSTREAM_REVALIDATIONS,
+)
+import tracing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:97.0) Gecko/20100101 Firefox/97.0",
+}
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
+ACCEPT_ENCODING = "gzip, deflate, br" if BROTLI_AVAILABLE else "gzip, deflate"
+
+
+class DNSCacheBackend(httpcore.AsyncNetworkBackend):
+    """Network backend that caches resolved addresses and counts new connections"""
+
+    def __init__(self, ttl: int = 300):
+        self.ttl = ttl
+        self._backend = httpcore.AnyIOBackend()
+        self._addresses: Dict[Tuple[str, int], Tuple[List[str], float]] = {}
+        self._pending: Dict[Tuple[str, int], "asyncio.Future[List[str]]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.connections_opened = 0
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        key = (host, port)
+        entry = self._addresses.get(key)
+        if entry and entry[1] > time.monotonic():
+            self.hits += 1
+            return entry[0]
+
+        # Connections opened together share a single lookup
+        pending = self._pending.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            with tracing.span("dns"):
+                infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            addresses = list(dict.fromkeys(info[4][0] for info in infos))
+            self._addresses[key] = (addresses, time.monotonic() + self.ttl)
+            future.set_result(addresses)
+            return addresses
+        except OSError as e:
+            error = httpcore.ConnectError(str(e))
+            future.set_exception(error)
+            future.exception()  # waiters re-raise it; avoid the unretrieved warning
+            raise error from e
+        finally:
+            del self._pending[key]
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        addresses = await self._resolve(host, port)
+        last_error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                stream = await self._backend.connect_tcp(
+                    address, port, timeout=timeout,
+                    local_address=local_address, socket_options=socket_options,
+                )
+                self.connections_opened += 1
+                return stream
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                last_error = e
+        # Drop the entry so the next attempt re-resolves
+        self._addresses.pop((host, port), None)
+        raise last_error or httpcore.ConnectError(f"No addresses for {host}")
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+    def clear(self) -> None:
+        self._addresses.clear()
+
+
+# httpcore errors and the httpx errors raised for them, most specific first
+HTTPCORE_ERRORS = [
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+]
+
+
+@contextmanager
+def httpx_errors() -> Iterator[None]:
+    """Re-raise httpcore errors as the httpx errors callers catch"""
+    try:
+        yield
+    except Exception as e:
+        for core_error, error in HTTPCORE_ERRORS:
+            if isinstance(e, core_error):
+                raise error(str(e)) from e
+        raise
+
+
+class UpstreamResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream: AsyncIterable[bytes]):
+        self.stream = stream
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with httpx_errors():
+            async for chunk in self.stream:
+                yield chunk
+
+    async def aclose(self) -> None:
+        if hasattr(self.stream, "aclose"):
+            await self.stream.aclose()
+
+
+class UpstreamTransport(httpx.AsyncBaseTransport):
+    """HTTP transport over a connection pool that resolves hosts through a DNS cache
+
+    httpx.AsyncHTTPTransport cannot take a network backend, so the pool is
+    built here and requests and responses are translated to and from httpcore.
+    """
+
+    def __init__(self, limits: httpx.Limits, http2: bool, dns_backend: DNSCacheBackend):
+        self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(http2=http2),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=dns_backend,
+        )
+
+    @property
+    def connections(self) -> List[httpcore.AsyncConnectionInterface]:
+        return self.pool.connections
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with httpx_errors():
+            response = await self.pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=UpstreamResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        await self.pool.aclose()
+
+
+class UpstreamUnavailable(httpx.TransportError):
+    """A fetch refused without contacting the host: its circuit is open or its queue is full"""
+
+    def __init__(self, message: str, host: str, reason: str, retry_after: float):
+        super().__init__(message)
+        self.host = host
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class HostGuard:
+    """Circuit breaker and adaptive (AIMD) concurrency limit for one upstream host
+
+    The breaker tracks the last `window` outcomes. Once at least min_requests
+    are recorded and the share of failures (transport errors, timeouts, 5xx and
+    429) reaches failure_ratio, it opens: fetches fail immediately for
+    open_seconds, then a single probe is let through and its outcome closes or
+    reopens the circuit.
+
+    The concurrency limit starts at max_limit. Each fast success raises it by
+    1/limit, so it grows by about one per limit's worth of requests. A failure
+    or a response slower than slow_seconds halves it, at most once per
+    second, down to min_limit. Fetches over the limit wait in a queue of at
+    most max_queue, and beyond that they are refused.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, host: str, max_limit: int, min_limit: int = 1, window: int = 20, min_requests: int = 10,
+                 failure_ratio: float = 0.5, open_seconds: float = 30.0, slow_seconds: float = 5.0,
+                 max_queue: int = 100, breaker: bool = True):
+        self.host = host
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.limit = float(max_limit)
+        self.min_requests = min_requests
+        self.failure_ratio = failure_ratio
+        self.open_seconds = open_seconds
+        self.slow_seconds = slow_seconds
+        self.max_queue = max_queue
+        self.breaker = breaker
+        self.in_flight = 0
+        self._waiters: "Deque[asyncio.Future[None]]" = deque()
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True for a failure
+        self._failures = 0
+        self._last_decrease = 0.0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        UPSTREAM_CONCURRENCY_LIMIT.set(host, value=max_limit)
+        UPSTREAM_CIRCUIT_STATE.set(host, value=0)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        UPSTREAM_CIRCUIT_STATE.set(self.host, value=self.STATE_VALUES[state])
+
+    def _refuse(self, reason: str, retry_after: float) -> UpstreamUnavailable:
+        UPSTREAM_REJECTED.inc(self.host, reason)
+        if reason == "queue_full":
+            return UpstreamUnavailable(f"Too many requests queued for {self.host}", self.host, reason, retry_after)
+        return UpstreamUnavailable(f"{self.host} is failing, not contacting it for now", self.host, reason, retry_after)
+
+    def _check_circuit(self, now: float) -> bool:
+        """Raise if the circuit refuses the fetch; True when the fetch is the half-open probe"""
+        if self.state == self.OPEN:
+            remaining = self.open_seconds - (now - self.opened_at)
+            if remaining > 0:
+                raise self._refuse("circuit_open", remaining)
+            self._set_state(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self.probing:
+                raise self._refuse("circuit_open", 1.0)
+            self.probing = True
+            return True
+        return False
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; returns whether this fetch is the probe of a half-open circuit"""
+        probe = self._check_circuit(time.monotonic()) if self.breaker else False
+        try:
+            if self.in_flight < int(self.limit) and not self._waiters:
+                self.in_flight += 1
+                return probe
+            if len(self._waiters) >= self.max_queue:
+                raise self._refuse("queue_full", 1.0)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            UPSTREAM_QUEUED.inc(self.host)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release_slot()  # the slot was handed over just as we were cancelled
+                else:
+                    self._waiters.remove(waiter)
+                raise
+            finally:
+                UPSTREAM_QUEUED.dec(self.host)
+            if self.state == self.OPEN:
+                # The circuit opened while this fetch was queued
+                self._release_slot()
+                raise self._refuse("circuit_open", self.open_seconds)
+            return probe
+        except BaseException:
+            if probe:
+                self.probing = False
+            raise
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def release(self, probe: bool, failed: Optional[bool], elapsed: float) -> None:
+        """Free the slot and record the outcome; failed is None when the fetch was cancelled"""
+        if failed is None:
+            if probe:
+                self.probing = False
+        else:
+            now = time.monotonic()
+            self._adjust_limit(failed or elapsed >= self.slow_seconds, now)
+            if self.breaker:
+                self._record(failed, probe, now)
+        self._release_slot()
+
+    def _adjust_limit(self, congested: bool, now: float) -> None:
+        if congested:
+            if now - self._last_decrease < 1.0:
+                return
+            self._last_decrease = now
+            self.limit = max(self.min_limit, self.limit / 2)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        UPSTREAM_CONCURRENCY_LIMIT.set(self.host, value=int(self.limit))
+
+    def _record(self, failed: bool, probe: bool, now: float) -> None:
+        if probe:
+            self.probing = False
+            if failed:
+                self._open(now)
+            else:
+                self._set_state(self.CLOSED)
+                logger.info(f"Circuit for {self.host} closed")
+            return
+        if self.state != self.CLOSED:
+            return
+        if len(self._outcomes) == self._outcomes.maxlen:
+            self._failures -= self._outcomes[0]
+        self._outcomes.append(failed)
+        self._failures += failed
+        if len(self._outcomes) >= self.min_requests and self._failures / len(self._outcomes) >= self.failure_ratio:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self._set_state(self.OPEN)
+        self.opened_at = now
+        self.trips += 1
+        self._outcomes.clear()
+        self._failures = 0
+        logger.warning(f"Circuit for {self.host} opened for {self.open_seconds:g}s after repeated upstream failures")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "recent_failures": self._failures,
+            "recent_requests": len(self._outcomes),
+            "trips": self.trips,
+        }
+
+
+class NotModified(Exception):
+    """Raised by a conditional fetch when the page is unchanged since it was last fetched"""
+
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"{url} not modified ({reason})")
+        self.url = url
+        self.reason = reason
+
+
+class Validator(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    body_hash: bytes
+
+
+class Revalidation:
+    """Validators of the pages fetched inside one revalidation() block
+
+    They are only saved by commit(), which the caller runs once what the pages
+    were parsed into has been stored. A page whose parse fails is therefore
+    never treated as unchanged on the next refresh.
+    """
+
+    def __init__(self, conditional: bool):
+        self.conditional = conditional
+        self.pending: List[Tuple["UpstreamClient", str, Validator]] = []
+
+    def commit(self) -> None:
+        for client, url, validator in self.pending:
+            client._remember(url, validator)
+        self.pending.clear()
+
+
+# None outside revalidation(); otherwise the block's pending validators
+_revalidating: contextvars.ContextVar[Optional[Revalidation]] = contextvars.ContextVar("revalidating", default=None)
+
+
+@contextmanager
+def revalidation(conditional: bool) -> Iterator[Revalidation]:
+    """Collect the validators of pages fetched in this block; with conditional, also check them
+
+    A conditional fetch sends If-None-Match/If-Modified-Since, and raises
+    NotModified on a 304 or on a body identical to the last one, so only use it
+    where the caller still has what the page was parsed into. The validators
+    collected are discarded unless the caller commits them.
+    """
+    state = Revalidation(conditional)
+    token = _revalidating.set(state)
+    try:
+        yield state
+    finally:
+        _revalidating.reset(token)
+
+
+class UpstreamClient:
+    """Pooled HTTP client shared by every upstream scraper"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.http2 = settings.UPSTREAM_HTTP2 and HTTP2_AVAILABLE
+        if settings.UPSTREAM_HTTP2 and not HTTP2_AVAILABLE:
+            logger.info("HTTP/2 requested for upstream client but 'h2' is not installed, using HTTP/1.1")
+
+        self.dns = DNSCacheBackend(ttl=settings.UPSTREAM_DNS_TTL)
+        if transport is None:
+            limits = httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+            )
+            transport = UpstreamTransport(limits, self.http2, self.dns)
+        self.transport = transport
+
+        self.client = httpx.AsyncClient(
+            headers={**DEFAULT_HEADERS, "Accept-Encoding": ACCEPT_ENCODING},
+            timeout=settings.REQUEST_TIMEOUT,
+            follow_redirects=True,
+            transport=transport,
+        )
+        self.host_limits = dict(settings.UPSTREAM_HOST_LIMITS)
+        # Send every request to a single base URL instead (used by load tests against a stub)
+        self.override = settings.UPSTREAM_OVERRIDE.rstrip("/")
+        self._guards: Dict[str, HostGuard] = {}
+        self._in_flight: Dict[str, int] = {}
+        self.validators: "OrderedDict[str, Validator]" = OrderedDict()
+        self.max_validators = settings.UPSTREAM_VALIDATORS_MAX
+        self.revalidations = {"not_modified": 0, "unchanged": 0, "changed": 0}
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def is_closed(self) -> bool:
+        return self.client.is_closed
+
+    def _host_key(self, host: str) -> Optional[str]:
+        # Limits are configured per site, so subdomains share their parent's cap
+        for key in self.host_limits:
+            if host == key or host.endswith("." + key):
+                return key
+        return None
+
+    def _guard(self, key: str) -> HostGuard:
+        guard = self._guards.get(key)
+        if guard is None:
+            guard = self._guards[key] = HostGuard(
+                key,
+                max_limit=self.host_limits.get(key, settings.UPSTREAM_DEFAULT_HOST_LIMIT),
+                min_limit=settings.UPSTREAM_MIN_HOST_LIMIT,
+                window=settings.UPSTREAM_BREAKER_WINDOW,
+                min_requests=settings.UPSTREAM_BREAKER_MIN_REQUESTS,
+                failure_ratio=settings.UPSTREAM_BREAKER_FAILURE_RATIO,
+                open_seconds=settings.UPSTREAM_BREAKER_OPEN_SECONDS,
+                slow_seconds=settings.UPSTREAM_SLOW_SECONDS,
+                max_queue=settings.UPSTREAM_MAX_QUEUE,
+                breaker=settings.UPSTREAM_BREAKER_ENABLED,
+            )
+        return guard
+
+    def _remember(self, url: str, validator: Validator) -> None:
+        self.validators[url] = validator
+        self.validators.move_to_end(url)
+        while len(self.validators) > self.max_validators:
+            self.validators.popitem(last=False)
+
+    def _revalidated(self, url: str, result: str) -> None:
+        self.revalidations[result] += 1
+        host = urlsplit(url).hostname or ""
+        UPSTREAM_REVALIDATIONS.inc(self._host_key(host) or host, result)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET an upstream URL through its host's circuit breaker and adaptive concurrency limit
+
+        Raises UpstreamUnavailable without contacting the host when its circuit
+        is open or too many fetches are already queued for it, and NotModified
+        for an unchanged page inside a conditional revalidation().
+        """
+        state = _revalidating.get()
+        if state is None:
+            return await self._get(url, **kwargs)
+        known = self.validators.get(url) if state.conditional else None
+        if known is not None:
+            headers = dict(kwargs.get("headers") or {})
+            if known.etag:
+                headers["If-None-Match"] = known.etag
+            if known.last_modified:
+                headers["If-Modified-Since"] = known.last_modified
+            kwargs["headers"] = headers
+        response = await self._get(url, **kwargs)
+        if response.status_code == 304 and known is not None:
+            self.validators.move_to_end(url)
+            self._revalidated(url, "not_modified")
+            raise NotModified(url, "not_modified")
+        if response.status_code == 200:
+            body_hash = hashlib.blake2b(response.content, digest_size=16).digest()
+            state.pending.append(
+                (self, url, Validator(response.headers.get("etag"), response.headers.get("last-modified"), body_hash))
+            )
+            if known is not None:
+                # Servers that ignore the conditional headers still send the same bytes
+                unchanged = body_hash == known.body_hash
+                self._revalidated(url, "unchanged" if unchanged else "changed")
+                if unchanged:
+                    raise NotModified(url, "unchanged")
+        return response
+
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        key = self._host_key(host) or host
+        if self.override:
+            url = self.override + (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "X-Upstream-Host": host}
+        trace = tracing.current()
+        if trace is not None:
+            kwargs["extensions"] = {**(kwargs.get("extensions") or {}), "trace": tracing.upstream_trace_hook(trace)}
+        guard = self._guard(key)
+        start = time.perf_counter()
+        with tracing.span("fetch"):
+            with tracing.span("upstream_wait"):
+                probe = await guard.acquire()
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            self.requests += 1
+            UPSTREAM_IN_FLIGHT.inc(key)
+            fetch_start = time.perf_counter()
+            status = "error"
+            failed: Optional[bool] = None
+            try:
+                response = await self.client.get(url, **kwargs)
+                status = str(response.status_code)
+                failed = response.status_code >= 500 or response.status_code == 429
+                return response
+            except httpx.HTTPError as e:
+                self.errors += 1
+                status = type(e).__name__
+                failed = True
+                raise
+            except asyncio.CancelledError:
+                status = "cancelled"
+                raise
+            finally:
+                guard.release(probe, failed, time.perf_counter() - fetch_start)
+                self._in_flight[key] -= 1
+                UPSTREAM_IN_FLIGHT.dec(key)
+                UPSTREAM_DURATION.observe(time.perf_counter() - start, key)
+                UPSTREAM_RESPONSES.inc(key, status)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection pool statistics used to size the pool"""
+        connections = getattr(self.transport, "connections", [])
+        idle = sum(1 for c in connections if c.is_idle())
+        opened = self.dns.connections_opened
+        reused = max(self.requests - opened, 0)
+        return {
+            "http2": self.http2,
+            "accept_encoding": ACCEPT_ENCODING,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": opened,
+            "open_connections": len(connections),
+            "idle_connections": idle,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            "dns_cache": {"hits": self.dns.hits, "misses": self.dns.misses},
+            "hosts": {
+                key: {"limit": limit, "in_flight": self._in_flight.get(key, 0)}
+                for key, limit in self.host_limits.items()
+            },
+            "guards": {key: guard.stats() for key, guard in self._guards.items()},
+            "revalidation": {**self.revalidations, "validators": len(self.validators)},
+        }
+
+
+_client: Optional[UpstreamClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> UpstreamClient:
+    """Return the shared client, creating one for the running event loop if needed"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = UpstreamClient()
+        _client_loop = loop
+    return _client
+
+
+async def start_client() -> UpstreamClient:
+    """Open the shared client for the application lifespan"""
+    return get_client()
+
+
+async def close_client() -> None:
+    """Close the shared client if one is open"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def client_stats() -> Dict[str, Any]:
+    """Pool statistics of the shared client, empty if none is open"""
+    if _client is None or _client.is_closed:
+        return {}
+    return _client.stats()
+
+
+async def fetch(url: str, **kwargs) -> httpx.Response:
+    """Fetch an upstream URL on the shared client"""
+    return await get_client().get(url, **kwargs)
+
+
+async def fetch_text(url: str, **kwargs) -> str:
+    """Fetch an upstream URL and return the decoded body"""
+    response = await fetch(url, **kwargs)
+    return response.text
+
+
+async def fetch_bytes(url: str, **kwargs) -> bytes:
+    """Fetch an upstream URL and return the raw body"""
+    response = await fetch(url, **kwargs)
+    return response.content
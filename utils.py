@@ -2,84 +2,275 @@
 Utility functions for the Movies & Anime API
 """
 import time
+import math
 import hashlib
 import logging
-from typing import Optional, Dict, Any, Callable
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Iterable, List, NamedTuple
 from functools import wraps
 import asyncio
-import aiohttp
+import httpx
 from config import settings
+from cache import CacheEngine, dumps
+import upstream
 
 logger = logging.getLogger(__name__)
 
+class RateDecision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float  # seconds until the client's bucket is full again
+    retry_after: float  # seconds until the next request would be allowed, 0 when allowed
+
 class RateLimiter:
-    """Simple rate limiter implementation"""
+    """Token-bucket rate limiter
+    
+    Each client may burst up to max_requests and regains max_requests tokens
+    per window_seconds. Buckets are kept in least-recently-used order, so a
+    check is O(1) and sweep() drops idle clients from the front without
+    scanning the rest. limits overrides max_requests for given clients, with 0
+    meaning unlimited.
+    """
     
-    def __init__(self, max_requests: int = 100, window_seconds: int = 60):
+    def __init__(self, max_requests: int = 100, window_seconds: int = 60,
+                 max_clients: int = 200000, limits: Optional[Dict[str, int]] = None):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests = {}
+        self.max_clients = max_clients
+        self.limits = dict(limits or {})
+        self.buckets: "OrderedDict[str, List[float]]" = OrderedDict()  # identifier -> [tokens, updated_at]
+        self.allowed = 0
+        self.rejected = 0
+        self.swept = 0
+    
+    def check(self, identifier: str, now: Optional[float] = None) -> RateDecision:
+        """Take a token for a request from identifier and report whether it is allowed"""
+        limit = self.limits.get(identifier, self.max_requests)
+        if limit <= 0:
+            return RateDecision(True, 0, 0, 0.0, 0.0)
+        now = time.monotonic() if now is None else now
+        rate = limit / self.window_seconds
+        bucket = self.buckets.get(identifier)
+        if bucket is None:
+            bucket = self.buckets[identifier] = [float(limit), now]
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(identifier)
+            bucket[0] = min(limit, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            self.allowed += 1
+            return RateDecision(True, limit, int(bucket[0]), (limit - bucket[0]) / rate, 0.0)
+        self.rejected += 1
+        return RateDecision(False, limit, 0, (limit - bucket[0]) / rate, (1 - bucket[0]) / rate)
+    
+    def refund(self, identifier: str) -> None:
+        """Give back the token taken by an allowed check, e.g. when another limit rejected the request"""
+        bucket = self.buckets.get(identifier)
+        if bucket is not None:
+            bucket[0] = min(self.limits.get(identifier, self.max_requests), bucket[0] + 1)
+            self.allowed -= 1
     
     def is_allowed(self, identifier: str) -> bool:
         """Check if request is allowed for given identifier"""
-        current_time = time.time()
-        
-        # Clean old entries
-        self.requests = {
-            k: v for k, v in self.requests.items() 
-            if current_time - v['first_request'] < self.window_seconds
+        return self.check(identifier).allowed
+    
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Drop clients idle for a whole window; their buckets have refilled, so nothing is lost"""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        while self.buckets:
+            bucket = next(iter(self.buckets.values()))
+            if now - bucket[1] < self.window_seconds:
+                break
+            self.buckets.popitem(last=False)
+            removed += 1
+        self.swept += removed
+        return removed
+    
+    async def run_sweeper(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.max_requests,
+            "window_seconds": self.window_seconds,
+            "clients": len(self.buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "swept": self.swept,
         }
+
+class RateLimitMiddleware:
+    """ASGI middleware applying a per-client limit and stricter per-route limits
+    
+    Route limits are keyed by path prefix. Every response carries RateLimit-Limit,
+    RateLimit-Remaining and RateLimit-Reset for the tightest limit that applied;
+    rejected requests get 429 with Retry-After. A rejected request costs no
+    tokens: the limits that had already allowed it are refunded.
+    """
+    
+    def __init__(self, app, limiter: RateLimiter, route_limiters: Optional[Dict[str, RateLimiter]] = None,
+                 exempt: Iterable[str] = (), trust_forwarded: bool = False):
+        self.app = app
+        self.limiter = limiter
+        self.route_limiters = list((route_limiters or {}).items())
+        self.exempt = set(exempt)
+        self.trust_forwarded = trust_forwarded
+    
+    def client_id(self, scope) -> str:
+        if self.trust_forwarded:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    return value.decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        client = self.client_id(scope)
+        decision = self.limiter.check(client)
+        taken = [self.limiter] if decision.allowed and decision.limit else []
+        for prefix, limiter in self.route_limiters:
+            if not decision.allowed:
+                break
+            if scope["path"].startswith(prefix):
+                route_decision = limiter.check(client)
+                if not route_decision.allowed:
+                    for previous in taken:
+                        previous.refund(client)
+                    decision = route_decision
+                elif route_decision.limit:
+                    taken.append(limiter)
+                    if decision.limit == 0 or route_decision.remaining < decision.remaining:
+                        decision = route_decision
+        if decision.limit == 0:
+            await self.app(scope, receive, send)
+            return
         
-        if identifier not in self.requests:
-            self.requests[identifier] = {
-                'count': 1,
-                'first_request': current_time
-            }
-            return True
+        headers = [
+            (b"ratelimit-limit", str(decision.limit).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(decision.reset)).encode()),
+        ]
+        if not decision.allowed:
+            retry_after = str(math.ceil(decision.retry_after))
+            body = dumps({"error": "Rate limit exceeded", "detail": f"Retry in {retry_after} seconds"})
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", retry_after.encode()),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
         
-        if self.requests[identifier]['count'] < self.max_requests:
-            self.requests[identifier]['count'] += 1
-            return True
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *headers]}
+            await send(message)
         
-        return False
+        await self.app(scope, receive, send_with_headers)
 
 class CacheManager:
     """Enhanced cache manager with TTL and size limits"""
     
-    def __init__(self, ttl: int = 300, max_size: int = 1000):
+    def __init__(self, ttl: int = 300, max_size: int = 1000, max_bytes: Optional[int] = None):
         self.ttl = ttl
         self.max_size = max_size
-        self.cache = {}
+        self.cache = CacheEngine(ttl=ttl, max_entries=max_size, max_bytes=max_bytes)
     
     def get(self, key: str) -> Optional[Any]:
         """Get data from cache if not expired"""
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.ttl:
-                return data
-            else:
-                del self.cache[key]
-        return None
+        return self.cache.get(key)
     
     def set(self, key: str, data: Any) -> None:
-        """Set data in cache with timestamp"""
-        # Remove oldest entries if cache is full
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.cache.keys(), key=lambda k: self.cache[k][1])
-            del self.cache[oldest_key]
-        
-        self.cache[key] = (data, time.time())
+        """Set data in cache, evicting the least recently used entry if full"""
+        self.cache.set(key, data)
     
     def clear(self) -> int:
         """Clear all cache entries and return count"""
-        count = len(self.cache)
-        self.cache.clear()
-        return count
+        return self.cache.clear()
     
     def size(self) -> int:
         """Get current cache size"""
         return len(self.cache)
 
+class SingleFlightBusy(Exception):
+    """Raised when too many callers are already waiting on an in-flight call"""
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call"""
+    
+    def __init__(self, max_waiters: int = 1000):
+        self.max_waiters = max_waiters
+        self.calls = {}
+        self.leaders = {}
+        self.coalesced = {}
+    
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]], label: str = "default") -> Any:
+        """Run func for key, or wait for the call already running for it"""
+        call = self.calls.get(key)
+        if call is not None and call["task"].get_loop() is asyncio.get_running_loop():
+            if call["waiters"] >= self.max_waiters:
+                raise SingleFlightBusy(f"Too many requests waiting for {key}")
+            call["waiters"] += 1
+            call["callers"] += 1
+            self.coalesced[label] = self.coalesced.get(label, 0) + 1
+            try:
+                # Shielded so a disconnecting waiter does not cancel the shared call
+                return await asyncio.shield(call["task"])
+            finally:
+                call["waiters"] -= 1
+                call["callers"] -= 1
+        
+        task = asyncio.ensure_future(func())
+        call = {"task": task, "waiters": 0, "callers": 1}
+        self.calls[key] = call
+        self.leaders[label] = self.leaders.get(label, 0) + 1
+        task.add_done_callback(lambda t: self._finish(key, call))
+        try:
+            return await asyncio.shield(task)
+        finally:
+            call["callers"] -= 1
+    
+    def cancel_abandoned(self, key: str) -> bool:
+        """Cancel the call for key if nobody is awaiting it any more, returning whether it was cancelled"""
+        call = self.calls.get(key)
+        if call is None or call["callers"] > 0:
+            return False
+        call["task"].cancel()
+        return True
+    
+    def _finish(self, key: str, call: Dict[str, Any]) -> None:
+        if self.calls.get(key) is call:
+            del self.calls[key]
+        task = call["task"]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+    
+    def in_flight(self) -> int:
+        """Number of calls currently running"""
+        return len(self.calls)
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Upstream calls made and requests coalesced onto them, per label"""
+        return {
+            label: {"fetches": self.leaders.get(label, 0), "coalesced": self.coalesced.get(label, 0)}
+            for label in sorted(set(self.leaders) | set(self.coalesced))
+        }
+
 def generate_cache_key(*args, **kwargs) -> str:
     """Generate a cache key from arguments"""
     key_string = f"{args}_{kwargs}"
@@ -108,17 +299,15 @@ def retry_on_failure(max_retries: int = 3, delay: float = 1.0):
     return decorator
 
 async def fetch_with_timeout(url: str, timeout: int = 10) -> str:
-    """Fetch URL content with timeout"""
-    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                return await response.text()
-            else:
-                raise aiohttp.ClientResponseError(
-                    request_info=response.request_info,
-                    history=response.history,
-                    status=response.status
-                )
+    """Fetch URL content with timeout on the shared upstream client"""
+    response = await upstream.fetch(url, timeout=timeout)
+    if response.status_code == 200:
+        return response.text
+    raise httpx.HTTPStatusError(
+        f"Unexpected status {response.status_code} for {url}",
+        request=response.request,
+        response=response
+    )
 
 def sanitize_string(text: str) -> str:
     """Sanitize string by removing unwanted characters"""
@@ -164,9 +353,22 @@ def extract_year(year_str: str) -> Optional[int]:
 # Global instances
 rate_limiter = RateLimiter(
     max_requests=settings.RATE_LIMIT_REQUESTS,
-    window_seconds=settings.RATE_LIMIT_WINDOW
+    window_seconds=settings.RATE_LIMIT_WINDOW,
+    max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+    limits=settings.RATE_LIMIT_CLIENTS
 )
 
+# Clients configured as unlimited are exempt from the route limits too
+route_rate_limiters = {
+    prefix: RateLimiter(
+        max_requests=limit,
+        window_seconds=settings.RATE_LIMIT_WINDOW,
+        max_clients=settings.RATE_LIMIT_MAX_CLIENTS,
+        limits={client: 0 for client, client_limit in settings.RATE_LIMIT_CLIENTS.items() if client_limit <= 0}
+    )
+    for prefix, limit in settings.RATE_LIMIT_ROUTES.items()
+}
+
 cache_manager = CacheManager(
     ttl=settings.CACHE_TTL,
     max_size=settings.MAX_CACHE_SIZE
@@ -0,0 +1,184 @@
+"""
+Background cache warmer with refresh-ahead scheduling
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """Keeps hot cache keys fresh by refreshing them shortly before they expire
+
+    The hot set is the configured keys plus the most requested keys seen
+    through record_hit, up to max_keys. Every interval the scheduler checks
+    each key's age, and keys within refresh_ahead seconds of the TTL (or not
+    cached at all) are refreshed. Refreshes start at least spacing seconds
+    apart and at most concurrency run at once, so a tick never bursts
+    upstream.
+
+    A key whose refresh fails is not retried for interval seconds, doubling
+    with each consecutive failure up to max_backoff. After max_failures in a
+    row a requested key is forgotten; configured keys stay, retried every
+    max_backoff.
+    """
+
+    HIT_DECAY_INTERVAL = 600.0  # hit counts are halved this often so rankings follow current traffic
+
+    def __init__(
+        self,
+        refresh: Callable[[str], Awaitable[Any]],
+        age_of: Callable[[str], Awaitable[Optional[float]]],
+        accepts: Callable[[str], bool],
+        ttl: float,
+        keys: Iterable[str] = (),
+        max_keys: int = 50,
+        refresh_ahead: float = 30.0,
+        interval: float = 5.0,
+        concurrency: int = 2,
+        spacing: float = 0.5,
+        max_backoff: float = 600.0,
+        max_failures: int = 5,
+    ):
+        self.refresh = refresh
+        self.age_of = age_of
+        self.accepts = accepts
+        self.ttl = ttl
+        self.keys = [key for key in keys if accepts(key)]
+        self.max_keys = max_keys
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self.spacing = spacing
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self.hits: Dict[str, float] = {}
+        # key -> {"count": consecutive failures, "retry_at": time before which it is not refreshed}
+        self.failures: Dict[str, Dict[str, float]] = {}
+        self.dropped = 0
+        self._budget = asyncio.Semaphore(concurrency)
+        self.concurrency = concurrency
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._last_decay = time.time()
+        self.last_refresh: Dict[str, Dict[str, Any]] = {}
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=100)
+        self.ticks = 0
+
+    def record_hit(self, key: str) -> None:
+        """Count a request for a cache key"""
+        self.hits[key] = self.hits.get(key, 0) + 1
+        if len(self.hits) > self.max_keys * 20:
+            # Forget the long tail so the counter stays bounded
+            keep = sorted(self.hits, key=self.hits.get, reverse=True)[:self.max_keys * 10]
+            self.hits = {k: self.hits[k] for k in keep}
+
+    def _decay(self, now: float) -> None:
+        if now - self._last_decay >= self.HIT_DECAY_INTERVAL:
+            self.hits = {k: v / 2 for k, v in self.hits.items() if v >= 1}
+            # Failure records outlive their backoff by one max_backoff, then the key starts over
+            self.failures = {k: v for k, v in self.failures.items() if v["retry_at"] + self.max_backoff > now}
+            self._last_decay = now
+
+    def hot_keys(self) -> List[str]:
+        """Configured keys first, then the most requested keys, up to max_keys"""
+        hot = list(dict.fromkeys(self.keys))
+        ranked = sorted((k for k in self.hits if k not in hot and self.accepts(k)), key=self.hits.get, reverse=True)
+        return (hot + ranked)[:self.max_keys]
+
+    async def due_keys(self) -> List[str]:
+        due = []
+        now = time.time()
+        for key in self.hot_keys():
+            if key in self._running:
+                continue
+            failure = self.failures.get(key)
+            if failure is not None and failure["retry_at"] > now:
+                continue
+            age = await self.age_of(key)
+            if age is None or age >= self.ttl - self.refresh_ahead:
+                due.append(key)
+        return due
+
+    async def _refresh(self, key: str) -> None:
+        async with self._budget:
+            started = time.time()
+            record = {"key": key, "started_at": started}
+            try:
+                await self.refresh(key)
+                record["ok"] = True
+                self.failures.pop(key, None)
+            except Exception as e:
+                record["ok"] = False
+                record["error"] = str(e) or type(e).__name__
+                logger.warning(f"Warming {key} failed: {record['error']}")
+                self._failed(key)
+            finally:
+                self._running.discard(key)
+            record["duration_ms"] = round((time.time() - started) * 1000, 1)
+            self.last_refresh[key] = record
+            self.recent.append(record)
+
+    def _failed(self, key: str) -> None:
+        failure = self.failures.setdefault(key, {"count": 0, "retry_at": 0.0})
+        failure["count"] += 1
+        backoff = min(self.interval * 2 ** (failure["count"] - 1), self.max_backoff)
+        if failure["count"] >= self.max_failures:
+            backoff = self.max_backoff
+            if self.hits.pop(key, None) is not None:
+                self.dropped += 1
+                logger.warning(f"Stopped warming {key} after {failure['count']} failed refreshes")
+        failure["retry_at"] = time.time() + backoff
+
+    async def tick(self) -> List[str]:
+        """Start refreshes for every due key, spaced out, and return the keys started"""
+        self.ticks += 1
+        self._decay(time.time())
+        due = await self.due_keys()
+        for i, key in enumerate(due):
+            if i:
+                await asyncio.sleep(self.spacing)
+            self._running.add(key)
+            task = asyncio.ensure_future(self._refresh(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return due
+
+    async def run(self) -> None:
+        """Run the scheduler until cancelled"""
+        try:
+            while True:
+                try:
+                    await self.tick()
+                except Exception as e:
+                    logger.error(f"Cache warmer tick failed: {str(e)}")
+                await asyncio.sleep(self.interval)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+
+    async def wait(self) -> None:
+        """Wait for the refreshes started so far"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ticks": self.ticks,
+            "concurrency": self.concurrency,
+            "refreshing": sorted(self._running),
+            "keys": [
+                {
+                    "key": key,
+                    "hits": round(self.hits.get(key, 0), 1),
+                    "last_refresh": self.last_refresh.get(key),
+                    "failures": self.failures.get(key),
+                }
+                for key in self.hot_keys()
+            ],
+            "backing_off": len(self.failures),
+            "dropped_keys": self.dropped,
+            "recent": list(self.recent)[-20:],
+        }